@@ -0,0 +1,66 @@
+"""Compares exporting the subjects, contributors and affiliations of
+an articles table one object at a time with the explode based exporters
+of SwepubDataframe
+
+Run from the repository root with
+python -m benchmarks.benchmark_dataframe_export"""
+
+import logging
+import time
+
+import pandas as pd  # type: ignore
+
+import config
+from benchmarks.synthetic import synthetic_lines
+from models.swepub.article import SwepubArticle
+from models.swepub.dataframe import SwepubDataframe
+
+# We don't want to benchmark Wikidata
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+count = 100000
+# Building one dataframe per subject is too slow to run on all articles
+loop_count = 1000
+articles = [SwepubArticle(raw_data=line) for line in synthetic_lines(count)]
+swepub_dataframe = SwepubDataframe(
+    dataframe=pd.DataFrame(
+        dict(
+            id=[article.id for article in articles],
+            contributors=[article.contributors for article in articles],
+            subjects=[article.subjects for article in articles],
+        )
+    )
+)
+
+start = time.perf_counter()
+pd.concat(
+    [
+        subject.export_dataframe()
+        for article in articles[:loop_count]
+        for subject in article.subjects
+    ],
+    ignore_index=True,
+)
+loop_duration = (time.perf_counter() - start) * count / loop_count
+print(
+    f"one dataframe per subject: {loop_duration:.1f}s for {count} articles "
+    f"(extrapolated from {loop_count})"
+)
+
+# The normalized rows of the parquet output are the reference
+expected = {"subjects": 0, "contributors": 0, "affiliations": 0}
+for article in articles:
+    for table, rows in article.export_normalized_rows().items():
+        if table in expected:
+            expected[table] += len(rows)
+print(f"{'table':>14} {'seconds':>8} {'rows':>8} {'same':>5}")
+for table in expected:
+    start = time.perf_counter()
+    df = getattr(swepub_dataframe, table)()
+    duration = time.perf_counter() - start
+    print(
+        f"{table:>14} {duration:>8.2f} {len(df):>8} "
+        f"{str(len(df) == expected[table]):>5}"
+    )
@@ -0,0 +1,98 @@
+"""Compares a full extraction of a changed dump with a delta extraction
+that only parses the new and changed records
+
+Run from the repository root with
+python -m benchmarks.benchmark_delta_extraction"""
+
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+
+import config
+from benchmarks.synthetic import synthetic_record
+from models.delta_extractor import DeltaExtractor
+from models.extractor import Extractor
+
+# We don't want to benchmark Wikidata
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+count = 50000
+# Roughly what changes between two weekly dumps
+changed_every_x_record = 100
+
+
+def write_dump(path: str, numbers, changed=()):
+    with gzip.open(path, "wb") as f:
+        for number in numbers:
+            record = synthetic_record(number)
+            if number in changed:
+                record["master"]["instanceOf"]["hasTitle"] = [
+                    {"@type": "Title", "mainTitle": f"Changed title {number}"}
+                ]
+            f.write(json.dumps(record).encode() + b"\n")
+
+
+def settings(directory: str, output_format: str, prefix: str):
+    """The full and the delta extraction write to their own files"""
+    return dict(
+        output_format=output_format,
+        stop_line_number=2 * count,
+        show_progress_every_x_line=10 * count,
+        metrics_filename=None,
+        **{
+            f"{table}_{extension}_filename": os.path.join(
+                directory, f"{prefix}_{table}.{extension}"
+            )
+            for table in ("article", "contributors", "affiliations", "subjects")
+            for extension in ("pickle", "parquet")
+        },
+    )
+
+
+durations = []
+with tempfile.TemporaryDirectory() as directory:
+    old_path = os.path.join(directory, "old.jsonl.gz")
+    new_path = os.path.join(directory, "new.jsonl.gz")
+    write_dump(old_path, range(1, count + 1))
+    # Some records are deleted, some changed and some added
+    write_dump(
+        new_path,
+        [
+            number
+            for number in range(1, count + 1)
+            if number % (2 * changed_every_x_record) != 0
+        ]
+        + list(range(count + 1, count + 1 + count // changed_every_x_record)),
+        changed=set(range(1, count + 1, changed_every_x_record)),
+    )
+    for output_format in ("pickle", "parquet"):
+        manifest_filename = os.path.join(directory, f"{output_format}.manifest.npy")
+        DeltaExtractor(
+            swepub_deduplicated_zipfile_path=old_path,
+            manifest_filename=manifest_filename,
+            **settings(directory, output_format, "delta"),
+        ).extract()
+
+        start = time.perf_counter()
+        Extractor(
+            swepub_deduplicated_zipfile_path=new_path,
+            **settings(directory, output_format, "full"),
+        ).extract()
+        full_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        DeltaExtractor(
+            swepub_deduplicated_zipfile_path=new_path,
+            manifest_filename=manifest_filename,
+            **settings(directory, output_format, "delta"),
+        ).extract()
+        delta_duration = time.perf_counter() - start
+        durations.append((output_format, full_duration, delta_duration))
+print(f"\n{count} records, {'format':>8} {'full':>7} {'delta':>7}")
+for output_format, full_duration, delta_duration in durations:
+    print(f"{output_format:>8} {full_duration:>6.1f}s {delta_duration:>6.1f}s")
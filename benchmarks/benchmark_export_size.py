@@ -0,0 +1,53 @@
+"""Compares the peak memory and pickle size of the article exports
+
+Run from the repository root with
+python -m benchmarks.benchmark_export_size"""
+
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+import config
+from benchmarks.synthetic import write_zipfile
+from models.extractor import Extractor
+
+# We don't want to benchmark Wikidata
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+count = 10000
+exports = [
+    ("objects with raw data", False, True),
+    ("objects", False, False),
+    ("flat", True, False),
+]
+
+with tempfile.TemporaryDirectory() as directory:
+    zipfile_path = os.path.join(directory, "swepub.zip")
+    write_zipfile(zipfile_path, count)
+    print(f"{'export':>22} {'duration':>10} {'peak memory':>12} {'pickle size':>12}")
+    for name, flat_export, keep_raw_data in exports:
+        config.keep_raw_data = keep_raw_data
+        pickle_filename = os.path.join(directory, "articles.pkl.gz")
+        extractor = Extractor(
+            swepub_deduplicated_zipfile_path=zipfile_path,
+            article_pickle_filename=pickle_filename,
+            start_line_number=1,
+            stop_line_number=count,
+            metrics_filename=None,
+            flat_export=flat_export,
+        )
+        tracemalloc.start()
+        start = time.perf_counter()
+        extractor.extract()
+        duration = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = os.path.getsize(pickle_filename)
+        print(
+            f"{name:>22} {duration:>9.2f}s {peak / 2**20:>10.1f}MB "
+            f"{size / 2**20:>10.2f}MB"
+        )
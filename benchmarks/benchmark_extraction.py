@@ -0,0 +1,62 @@
+"""Shows how the extraction time grows with the number of lines
+
+Run from the repository root with
+python -m benchmarks.benchmark_extraction"""
+
+import logging
+import os
+import tempfile
+import time
+
+import config
+from benchmarks.synthetic import write_zipfile
+from models.extractor import Extractor
+
+# We don't want to benchmark Wikidata
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+line_counts = [1000, 2000, 4000, 8000, 16000]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        zipfile_path = os.path.join(directory, "swepub.zip")
+        write_zipfile(zipfile_path, max(line_counts))
+        print(f"{'lines':>8} {'duration':>10} {'ms per 1000 lines':>18}")
+        for count in line_counts:
+            extractor = Extractor(
+                swepub_deduplicated_zipfile_path=zipfile_path,
+                article_pickle_filename=os.path.join(directory, "articles.pkl.gz"),
+                start_line_number=1,
+                stop_line_number=count,
+                metrics_filename=None,
+            )
+            start = time.perf_counter()
+            extractor.extract()
+            duration = time.perf_counter() - start
+            print(f"{count:>8} {duration:>9.2f}s {duration * 1e6 / count:>18.1f}")
+
+        number_of_workers = os.cpu_count() or 1
+        if number_of_workers > 1:
+            count = max(line_counts)
+            print(f"\nParallel extraction of {count} lines")
+            for workers in [1, number_of_workers]:
+                extractor = Extractor(
+                    swepub_deduplicated_zipfile_path=zipfile_path,
+                    article_pickle_filename=os.path.join(directory, "articles.pkl.gz"),
+                    start_line_number=1,
+                    stop_line_number=count,
+                    metrics_filename=None,
+                    number_of_workers=workers,
+                )
+                start = time.perf_counter()
+                extractor.extract()
+                duration = time.perf_counter() - start
+                print(f"{workers:>3} worker(s) {duration:>9.2f}s")
+
+
+# The workers of the parallel extraction import this module again
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compares reading the dump line by line in the parsing thread with
+decompressing it in background threads, with and without parsing
+
+Run from the repository root with
+python -m benchmarks.benchmark_input_readers"""
+
+import gzip
+import logging
+import os
+import tempfile
+import time
+import zipfile
+
+import config
+from benchmarks.synthetic import synthetic_lines
+from models.input_readers import input_reader_for, read_chunks
+from models.swepub.article import SwepubArticle
+
+# We don't want to benchmark Wikidata
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+count = 100000
+# Parsing is much slower than reading so we parse fewer lines
+parse_count = 10000
+number_of_members = 4
+
+
+def serial_lines(path: str):
+    """Reads like the extractor did before the input readers"""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as z:
+            for member in z.namelist():
+                with z.open(member) as f:
+                    yield from f
+    else:
+        with gzip.open(path) as f:
+            yield from f
+
+
+def background_lines(path: str):
+    for chunk in read_chunks(input_reader_for(path)):
+        yield from chunk.lines
+
+
+def write_inputs(directory: str, lines):
+    zip_path = os.path.join(directory, "swepub.zip")
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        size = len(lines) // number_of_members
+        for number in range(number_of_members):
+            z.writestr(
+                f"swepub{number}.jsonl",
+                b"".join(lines[number * size : (number + 1) * size]),
+            )
+    gzip_path = os.path.join(directory, "swepub.jsonl.gz")
+    with gzip.open(gzip_path, "wb") as f:
+        f.writelines(lines)
+    return zip_path, gzip_path
+
+
+with tempfile.TemporaryDirectory() as directory:
+    lines = synthetic_lines(count)
+    paths = write_inputs(directory, lines)
+    print(f"{'input':>16} {'lines':>7} {'parse':>6} {'serial':>8} {'background':>11}")
+    for path in paths:
+        for parse, number_of_lines in [(False, count), (True, parse_count)]:
+            durations = []
+            for iterate in (serial_lines, background_lines):
+                start = time.perf_counter()
+                for line_number, line in enumerate(iterate(path), start=1):
+                    if parse:
+                        SwepubArticle(raw_data=line)
+                    if line_number == number_of_lines:
+                        break
+                durations.append(time.perf_counter() - start)
+            print(
+                f"{os.path.basename(path):>16} {number_of_lines:>7} {str(parse):>6} "
+                f"{durations[0]:>7.2f}s {durations[1]:>10.2f}s"
+            )
@@ -0,0 +1,24 @@
+"""Compares the installed JSON backends on a fixed sample of lines
+
+Run from the repository root with
+python -m benchmarks.benchmark_json_decoding"""
+
+import time
+
+from benchmarks.synthetic import synthetic_lines
+from helpers.json_decoding import backends
+
+count = 20000
+repetitions = 5
+lines = synthetic_lines(count)
+print(f"Decoding {count} lines {repetitions} times")
+print(f"{'backend':>8} {'best duration':>14} {'us per line':>12}")
+for name, decode in backends.items():
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        for line in lines:
+            decode(line)
+        durations.append(time.perf_counter() - start)
+    best = min(durations)
+    print(f"{name:>8} {best:>13.3f}s {best * 1e6 / count:>12.2f}")
@@ -0,0 +1,60 @@
+"""Compares detecting the language of every abstract while parsing
+with the batched detection stage, with an empty and a full cache
+
+Run from the repository root with
+python -m benchmarks.benchmark_language_detection"""
+
+import logging
+import os
+import random
+import tempfile
+import time
+
+import config
+from helpers import caching
+from models.language_detection import (
+    LanguageDetector,
+    detect_language_of,
+    detector_backends,
+)
+
+logging.basicConfig(level=logging.ERROR)
+
+count = 5000
+# Every fifth abstract is a duplicate like in the dump
+duplicates = count // 5
+random.seed(0)
+words = dict(
+    eng="the results of this study show that our method is better than".split(),
+    swe="resultaten av denna studie visar att vår metod är bättre än".split(),
+    ger="die ergebnisse dieser studie zeigen dass unsere methode besser ist".split(),
+)
+abstracts = [
+    " ".join(random.choices(words[language], k=40))
+    for language in random.choices(list(words), k=count - duplicates)
+]
+abstracts += abstracts[:duplicates]
+
+start = time.perf_counter()
+for abstract in abstracts:
+    detect_language_of(abstract)
+inline_duration = time.perf_counter() - start
+print(f"{count} abstracts, {os.cpu_count()} cpus")
+print(f"{'detection':>28} {'duration':>9}")
+print(f"{'while parsing':>28} {inline_duration:>8.1f}s")
+with tempfile.TemporaryDirectory() as directory:
+    # Don't touch the cache of the user
+    caching.cache_filename = os.path.join(directory, "cache.sqlite")
+    for backend in detector_backends:
+        for cache in ("empty", "full"):
+            detector = LanguageDetector(
+                backend=backend, number_of_workers=os.cpu_count() or 1
+            )
+            start = time.perf_counter()
+            try:
+                detector.detect(abstracts)
+            except ImportError:
+                print(f"{backend:>16} is not installed")
+                break
+            duration = time.perf_counter() - start
+            print(f"{f'{backend}, {cache} cache':>28} {duration:>8.1f}s")
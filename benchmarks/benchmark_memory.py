@@ -0,0 +1,35 @@
+"""Measures the memory held by parsed articles and their
+subjects, contributors and affiliations
+
+Run from the repository root with
+python -m benchmarks.benchmark_memory"""
+
+import gc
+import logging
+import time
+import tracemalloc
+
+import config
+from benchmarks.synthetic import synthetic_lines
+from models.swepub.article import SwepubArticle
+
+# We don't want to benchmark Wikidata
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+count = 100000
+lines = synthetic_lines(count)
+gc.collect()
+tracemalloc.start()
+start = time.perf_counter()
+articles = [SwepubArticle(raw_data=line) for line in lines]
+duration = time.perf_counter() - start
+gc.collect()
+current, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+print(f"Parsed {count} lines in {duration:.1f}s")
+print(
+    f"held by the articles: {current / 2**20:.1f}MB ({current / count:.0f}B per article)"
+)
+print(f"peak: {peak / 2**20:.1f}MB")
@@ -0,0 +1,40 @@
+"""Compares the per record parsing cost with and without schema decoding
+
+Run from the repository root with
+python -m benchmarks.benchmark_parsing"""
+
+import logging
+import time
+import tracemalloc
+
+import config
+from benchmarks.synthetic import synthetic_lines
+from helpers.json_decoding import backends
+from models.swepub.article import SwepubArticle
+from models.swepub.schema import record_decoder
+
+# We don't want to benchmark Wikidata
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+count = 10000
+lines = synthetic_lines(count)
+variants = [(f"{backend} full", backend, False) for backend in backends]
+if record_decoder is not None:
+    variants.append(("msgspec schema", None, True))
+print(f"Parsing {count} lines")
+print(f"{'decoding':>16} {'us per line':>12} {'allocated per line':>20}")
+for name, backend, schema_decoding in variants:
+    config.json_backend = backend
+    config.schema_decoding = schema_decoding
+    start = time.perf_counter()
+    for line in lines:
+        SwepubArticle(raw_data=line)
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    for line in lines[:1000]:
+        SwepubArticle(raw_data=line)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>16} {duration * 1e6 / count:>12.1f} {peak / 1000:>18.0f}B")
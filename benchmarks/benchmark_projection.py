@@ -0,0 +1,43 @@
+"""Compares parsing every field with parsing a projection of them
+
+Run from the repository root with
+python -m benchmarks.benchmark_projection"""
+
+import logging
+import time
+
+import config
+from benchmarks.synthetic import synthetic_lines
+from models.swepub.article import SwepubArticle
+
+# We don't want to benchmark Wikidata
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+count = 10000
+lines = synthetic_lines(count)
+variants = [
+    ("full", None, False),
+    ("id, doi", ["id", "doi"], False),
+    ("id, doi, subjects", ["id", "doi", "subjects"], False),
+    ("lazy, doi read", None, True),
+]
+print(f"Parsing and exporting {count} lines")
+print(f"{'fields':>18} {'us per line':>12} {'speedup':>8}")
+full_duration = None
+for name, fields, lazy in variants:
+    start = time.perf_counter()
+    for line in lines:
+        article = SwepubArticle(raw_data=line, fields=fields, lazy=lazy)
+        if lazy:
+            article.doi
+        else:
+            article.export_dict()
+    duration = time.perf_counter() - start
+    if full_duration is None:
+        full_duration = duration
+    print(
+        f"{name:>18} {duration * 1e6 / count:>12.1f} "
+        f"{full_duration / duration:>7.1f}x"
+    )
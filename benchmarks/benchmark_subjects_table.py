@@ -0,0 +1,68 @@
+"""Compares the subject filters of SwepubArticle with the
+vectorized ones of SwepubSubjectsTable
+
+Run from the repository root with
+python -m benchmarks.benchmark_subjects_table"""
+
+import logging
+import time
+
+import pandas as pd  # type: ignore
+
+import config
+from benchmarks.synthetic import synthetic_lines
+from models.swedish_higher_education_authority import UKACodeLevel
+from models.swepub.article import SwepubArticle
+from models.swepub.subjects_table import SwepubSubjectsTable
+
+# We don't want to benchmark Wikidata
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+count = 20000
+# The table scales linearly, we repeat the articles to get a corpus sized table
+repeat = 50
+articles = [SwepubArticle(raw_data=line) for line in synthetic_lines(count)]
+df = pd.DataFrame(
+    dict(
+        id=[article.id for article in articles],
+        subjects=[article.subjects for article in articles],
+    )
+)
+start = time.perf_counter()
+table = SwepubSubjectsTable.from_articles(df)
+print(
+    f"built a table of {len(table.dataframe)} subjects in {time.perf_counter() - start:.1f}s"
+)
+queries = [
+    ("non_swedish_subjects", ()),
+    ("non_swedish_subjects_non_uka_subjects", ()),
+    ("non_swedish_uka_subjects", ()),
+    ("non_swedish_uka_subjects_with_specific_code_level", (UKACodeLevel.FIVE,)),
+    ("uka_subjects", ()),
+    ("uka_subjects_with_specific_code_level", (UKACodeLevel.THREE,)),
+]
+print(f"{'query':>50} {'loop ms':>9} {'table ms':>9} {'rows':>8} {'same':>5}")
+for name, arguments in queries:
+    start = time.perf_counter()
+    expected = sum(len(getattr(article, name)(*arguments)) for article in articles)
+    loop_duration = time.perf_counter() - start
+    start = time.perf_counter()
+    rows = len(getattr(table, name)(*arguments))
+    table_duration = time.perf_counter() - start
+    print(
+        f"{name:>50} {loop_duration * 1000:>9.1f} {table_duration * 1000:>9.1f} "
+        f"{rows:>8} {str(rows == expected):>5}"
+    )
+big = SwepubSubjectsTable(
+    dataframe=pd.concat([table.dataframe] * repeat, ignore_index=True)
+)
+print(
+    f"\n{len(big.dataframe)} subjects using "
+    f"{big.dataframe.memory_usage(deep=True).sum() / 1e6:.0f}MB"
+)
+for name, arguments in queries:
+    start = time.perf_counter()
+    getattr(big, name)(*arguments)
+    print(f"{name:>50} {(time.perf_counter() - start) * 1000:>9.1f}ms")
@@ -0,0 +1,219 @@
+"""Measures the parse cost per record, the extraction throughput,
+the peak memory and the output size on a synthetic dump and compares
+them with a baseline so regressions show up in CI
+
+Run from the repository root with
+python -m benchmarks.suite --output results.json
+python -m benchmarks.suite --baseline results.json
+
+It exits with 1 if the peak memory or the output size is worse than the
+baseline by more than the tolerance. They are the same on every run of
+the same tree. The timings are the medians of the repeats and are only
+checked with --check-timings, with their own wider tolerance, because they
+vary between runs. Only compare timings with a baseline from the same
+kind of machine"""
+
+import gc
+import json
+import statistics
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import click
+
+import config
+from benchmarks.synthetic import SyntheticGenerator
+from models.extractor import Extractor
+from models.swepub.article import SwepubArticle
+
+# We don't want to benchmark Wikidata or need the network
+config.lookup_languages_in_wd = False
+config.lookup_topics_in_wd = False
+logging.basicConfig(level=logging.ERROR)
+
+# Whether a higher value of a result is better
+higher_is_better = dict(
+    parse_us_per_record=False,
+    extraction_lines_per_second=True,
+    peak_memory_bytes_per_record=False,
+    output_bytes_per_record=False,
+)
+# The results that vary between runs of the same tree
+timings = {"parse_us_per_record", "extraction_lines_per_second"}
+
+
+def measure_parsing(lines: List[bytes], repeats: int) -> Dict[str, float]:
+    """The median of the repeats is the least affected by a single slow run"""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for line in lines:
+            SwepubArticle(raw_data=line)
+        durations.append(time.perf_counter() - start)
+    return dict(parse_us_per_record=statistics.median(durations) * 1e6 / len(lines))
+
+
+def measure_memory(lines: List[bytes]) -> Dict[str, float]:
+    """The peak memory of parsing and holding the articles"""
+    gc.collect()
+    tracemalloc.start()
+    articles = [SwepubArticle(raw_data=line) for line in lines]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del articles
+    return dict(peak_memory_bytes_per_record=peak / len(lines))
+
+
+def measure_extraction(
+    generator: SyntheticGenerator, count: int, output_format: str, repeats: int
+) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "swepub.jsonl.gz")
+        generator.write(path, count)
+        extractor = Extractor(
+            swepub_deduplicated_zipfile_path=path,
+            output_format=output_format,
+            stop_line_number=count,
+            metrics_filename=None,
+            show_progress_every_x_seconds=float("inf"),
+            **{
+                f"{table}_{extension}_filename": os.path.join(
+                    directory, f"{table}.{extension}"
+                )
+                for table in ("article", "contributors", "affiliations", "subjects")
+                for extension in ("pickle", "parquet")
+            },
+        )
+        durations = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            extractor.extract()
+            durations.append(time.perf_counter() - start)
+        size = sum(
+            os.path.getsize(filename) for filename in extractor.__filenames__().values()
+        )
+    return dict(
+        extraction_lines_per_second=count / statistics.median(durations),
+        output_bytes_per_record=size / count,
+    )
+
+
+def run(count: int, repeats: int, seed: int) -> Dict[str, Dict[str, float]]:
+    generator = SyntheticGenerator(seed=seed)
+    lines = generator.lines(count)
+    results = {"parse": {**measure_parsing(lines, repeats), **measure_memory(lines)}}
+    output_formats = ["pickle"]
+    try:
+        import pyarrow  # type: ignore
+
+        output_formats.append("parquet")
+    except ImportError:
+        print("pyarrow is not installed, skipping the parquet extraction")
+    for output_format in output_formats:
+        results[f"extraction {output_format}"] = measure_extraction(
+            generator, count, output_format, repeats
+        )
+    return results
+
+
+def regressions(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+    timing_tolerance: Optional[float] = None,
+) -> List[str]:
+    """Returns a message for every result that is worse than the baseline.
+    The timings are only compared with a timing_tolerance"""
+    found = []
+    for name, values in results.items():
+        for key, value in values.items():
+            expected = baseline.get(name, {}).get(key)
+            if expected is None:
+                continue
+            if key in timings:
+                if timing_tolerance is None:
+                    continue
+                allowed = timing_tolerance
+            else:
+                allowed = tolerance
+            if higher_is_better[key]:
+                worse = value < expected / (1 + allowed)
+            else:
+                worse = value > expected * (1 + allowed)
+            if worse:
+                found.append(
+                    f"{name} {key}: {value:.1f}, the baseline is {expected:.1f}"
+                )
+    return found
+
+
+@click.command()
+@click.option("--count", default=5000, show_default=True, help="Number of records")
+@click.option("--repeats", default=5, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False), help="Save the results")
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Results to compare with",
+)
+@click.option(
+    "--tolerance",
+    default=0.05,
+    show_default=True,
+    help="How much worse than the baseline the memory and output size may be",
+)
+@click.option(
+    "--check-timings",
+    is_flag=True,
+    help="Also fail on slower timings, this needs at least 5 repeats",
+)
+@click.option(
+    "--timing-tolerance",
+    default=0.5,
+    show_default=True,
+    help="How much worse than the baseline the median timings may be",
+)
+def main(
+    count: int,
+    repeats: int,
+    seed: int,
+    output: Optional[str],
+    baseline: Optional[str],
+    tolerance: float,
+    check_timings: bool,
+    timing_tolerance: float,
+):
+    if check_timings and repeats < 5:
+        raise click.BadParameter(
+            "at least 5 repeats are needed to check the timings", param_hint="--repeats"
+        )
+    results = run(count=count, repeats=repeats, seed=seed)
+    for name, values in results.items():
+        for key, value in values.items():
+            print(f"{name:>18} {key:>30} {value:>12.1f}")
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+    if baseline is not None:
+        with open(baseline) as f:
+            found = regressions(
+                results,
+                json.load(f),
+                tolerance,
+                timing_tolerance if check_timings else None,
+            )
+        for message in found:
+            print(f"regression: {message}")
+        if len(found) > 0:
+            sys.exit(1)
+        print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
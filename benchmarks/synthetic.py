@@ -0,0 +1,374 @@
+import gzip
+import json
+import random
+import zipfile
+from typing import Any, Dict, List, Optional
+
+import click
+from pydantic import BaseModel
+
+# Synthetic records that follow the structure our models parse.
+# They make it possible to benchmark without the 2GB dump.
+
+uka_codes = [
+    ("10201", "Computer Sciences"),
+    ("102", "Computer and Information Sciences"),
+    ("1", "Natural Sciences"),
+]
+
+
+def synthetic_record(number: int) -> Dict[str, Any]:
+    """Returns one SwePub-like record"""
+    return {
+        # The keys below are in the dump but not parsed by our models
+        "@context": "https://swepub.kb.se/context.jsonld",
+        "meta": {
+            "creationDate": "2021-03-04T12:00:00Z",
+            "assigner": {"@type": "Organization", "code": "kth"},
+            "bibliographicStatus": {"code": "published"},
+        },
+        "master": {
+            "@id": f"https://swepub.kb.se/synthetic/{number}#it",
+            "@type": "Publication",
+            "genreForm": [
+                {
+                    "@id": "https://id.kb.se/term/swepub/output/publication/journal-article"
+                }
+            ],
+            "publication": [{"@type": "Publication", "date": "2021"}],
+            "partOf": [
+                {
+                    "@type": "Work",
+                    "hasTitle": [{"@type": "Title", "mainTitle": "Journal of Tests"}],
+                    "identifiedBy": [{"@type": "ISSN", "value": "1234-5678"}],
+                    "volumeNumber": "12",
+                    "issueNumber": "3",
+                }
+            ],
+            "usageAndAccessPolicy": [{"@type": "AccessPolicy", "label": "gratis"}],
+            "electronicLocator": [
+                {"@type": "Resource", "uri": f"http://example.org/{number}.pdf"}
+            ],
+            "identifiedBy": [
+                {"@type": "URI", "value": f"http://example.org/record/{number}"},
+                {"@type": "DOI", "value": f"10.1234/synthetic.{number}"},
+                {"@type": "ScopusID", "value": f"{2000000 + number}"},
+            ],
+            "instanceOf": {
+                "@type": "Text",
+                "genreForm": [
+                    {"@id": "https://id.kb.se/term/swepub/svep/ref"},
+                    {"@id": "https://id.kb.se/term/swepub/ScientificResearch"},
+                ],
+                "hasNote": [{"@type": "Note", "label": "Synthetic note"}],
+                "summary": [{"label": f"This is the abstract of record {number}."}],
+                "contribution": [
+                    {
+                        "@type": "Contribution",
+                        "role": [{"@id": "http://id.loc.gov/vocabulary/relators/aut"}],
+                        "agent": {
+                            "@type": "Person",
+                            "givenName": "Anna",
+                            "familyName": f"Andersson {number % 100}",
+                            "identifiedBy": [
+                                {"@type": "ORCID", "value": "0000-0002-1825-0097"}
+                            ],
+                        },
+                        "hasAffiliation": [
+                            {
+                                "@type": "Organization",
+                                "name": "Kungliga Tekniska högskolan",
+                                "language": {"code": "swe"},
+                                "identifiedBy": [{"@type": "URI", "value": "kth.se"}],
+                            }
+                        ],
+                    }
+                ],
+                "language": [{"code": "eng"}],
+                "hasTitle": [{"mainTitle": f"A synthetic title {number}"}],
+                "subject": [
+                    {
+                        "@type": "Topic",
+                        # Alternate between the three UKÄ levels and two languages
+                        "code": uka_codes[number % 3][0],
+                        "prefLabel": uka_codes[number % 3][1],
+                        "inScheme": {"code": "uka.se"},
+                        "language": {"code": "swe" if number % 2 == 0 else "eng"},
+                    },
+                    {
+                        "@type": "Topic",
+                        "prefLabel": "benchmarking; synthetic data",
+                        "language": {"code": "eng"},
+                    },
+                ],
+            },
+        },
+    }
+
+
+def synthetic_lines(count: int) -> List[bytes]:
+    return [
+        json.dumps(synthetic_record(number)).encode() + b"\n"
+        for number in range(1, count + 1)
+    ]
+
+
+def write_zipfile(path: str, count: int, member_name: str = "swepub.jsonl"):
+    """Write a zipfile with one JSONL member like the deduplicated dump"""
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr(member_name, b"".join(synthetic_lines(count)))
+
+
+# Words for the generated titles, abstracts and topics
+words = dict(
+    eng="analysis of the effects on learning in health data model method study "
+    "results climate energy patients children design system network".split(),
+    swe="analys av effekter på lärande inom hälsa data modell metod studie "
+    "resultat klimat energi patienter barn design system nätverk".split(),
+)
+generated_uka_codes = [
+    ("1", "Naturvetenskap"),
+    ("102", "Data- och informationsvetenskap"),
+    ("10201", "Datavetenskap"),
+    ("10202", "Systemvetenskap"),
+    ("2", "Teknik"),
+    ("202", "Elektroteknik och elektronik"),
+    ("20205", "Signalbehandling"),
+    ("3", "Medicin och hälsovetenskap"),
+    ("303", "Hälsovetenskap"),
+    ("30301", "Folkhälsovetenskap"),
+    ("5", "Samhällsvetenskap"),
+    ("503", "Utbildningsvetenskap"),
+    ("50301", "Pedagogik"),
+]
+organizations = [
+    ("Kungliga Tekniska högskolan", "kth.se"),
+    ("Uppsala universitet", "uu.se"),
+    ("Lunds universitet", "lu.se"),
+    ("Göteborgs universitet", "gu.se"),
+    ("Karolinska Institutet", "ki.se"),
+    ("Linköpings universitet", "liu.se"),
+]
+
+
+class SyntheticGenerator(BaseModel):
+    """Generates SwePub-like records with a configurable shape.
+
+    The distributions map a number of items to its weight,
+    e.g. {1: 3, 2: 1} gives one item three times as often as two.
+    Every record only depends on the seed and its number
+    so a dump can be generated in any order or in parts"""
+
+    seed: int = 0
+    contributors_per_record: Dict[int, float] = {
+        1: 30,
+        2: 25,
+        3: 20,
+        5: 15,
+        12: 9,
+        60: 1,
+    }
+    affiliations_per_contributor: Dict[int, float] = {0: 10, 1: 70, 2: 20}
+    # The nesting of departments under the organizations
+    subaffiliations_per_affiliation: Dict[int, float] = {0: 60, 1: 35, 2: 5}
+    uka_subjects_per_record: Dict[int, float] = {0: 15, 3: 50, 6: 35}
+    topics_per_record: Dict[int, float] = {0: 40, 1: 30, 2: 30}
+    # Topics with more than one label are joined with "; " and unnested when parsed
+    labels_per_topic: Dict[int, float] = {1: 70, 3: 30}
+    abstracts_per_record: Dict[int, float] = {0: 20, 1: 60, 2: 20}
+    words_per_abstract: Dict[int, float] = {50: 30, 150: 50, 300: 20}
+    titles_per_record: Dict[int, float] = {1: 80, 2: 20}
+    share_with_doi: float = 0.6
+    share_with_orcid: float = 0.3
+    share_in_swedish: float = 0.3
+
+    def __random__(self, number: int) -> random.Random:
+        return random.Random(self.seed * 1000003 + number)
+
+    @staticmethod
+    def __number_of__(rng: random.Random, distribution: Dict[int, float]) -> int:
+        return rng.choices(list(distribution), weights=list(distribution.values()))[0]
+
+    def __text__(self, rng: random.Random, language: str, count: int) -> str:
+        return " ".join(rng.choices(words[language], k=count)).capitalize()
+
+    def __affiliation__(self, rng: random.Random, depth: int = 0) -> Dict[str, Any]:
+        name, domain = rng.choice(organizations)
+        affiliation: Dict[str, Any] = {
+            "@type": "Organization",
+            "name": (
+                name if depth == 0 else f"Institutionen för {rng.choice(words['swe'])}"
+            ),
+            "language": {"code": "swe"},
+            "identifiedBy": [
+                {"@type": "URI", "value": domain},
+                {"@type": "Local", "value": f"{domain}-{rng.randrange(1000)}"},
+            ],
+        }
+        if depth == 0:
+            subaffiliations = [
+                self.__affiliation__(rng, depth=1)
+                for _ in range(
+                    self.__number_of__(rng, self.subaffiliations_per_affiliation)
+                )
+            ]
+            if len(subaffiliations) > 0:
+                affiliation["hasAffiliation"] = subaffiliations
+        return affiliation
+
+    def __contribution__(self, rng: random.Random) -> Dict[str, Any]:
+        agent: Dict[str, Any] = {
+            "@type": "Person",
+            "givenName": rng.choice(["Anna", "Erik", "Maria", "Lars", "Sara", "Johan"]),
+            "familyName": rng.choice(["Andersson", "Johansson", "Karlsson", "Nilsson"]),
+            "identifiedBy": [{"@type": "Local", "value": f"p{rng.randrange(10**6)}"}],
+        }
+        if rng.random() < self.share_with_orcid:
+            agent["identifiedBy"].append(
+                {"@type": "ORCID", "value": f"0000-000{rng.randrange(10)}-1825-0097"}
+            )
+        return {
+            "@type": "Contribution",
+            "role": [{"@id": "http://id.loc.gov/vocabulary/relators/aut"}],
+            "agent": agent,
+            "hasAffiliation": [
+                self.__affiliation__(rng)
+                for _ in range(
+                    self.__number_of__(rng, self.affiliations_per_contributor)
+                )
+            ],
+        }
+
+    def __subjects__(self, rng: random.Random) -> List[Dict[str, Any]]:
+        subjects = []
+        for _ in range(self.__number_of__(rng, self.uka_subjects_per_record)):
+            code, label = rng.choice(generated_uka_codes)
+            subjects.append(
+                {
+                    "@type": "Topic",
+                    "code": code,
+                    "prefLabel": label,
+                    "inScheme": {"code": "uka.se"},
+                    "language": {"code": rng.choice(["swe", "eng"])},
+                }
+            )
+        for _ in range(self.__number_of__(rng, self.topics_per_record)):
+            language = "swe" if rng.random() < self.share_in_swedish else "eng"
+            labels = [
+                self.__text__(rng, language, 2)
+                for _ in range(self.__number_of__(rng, self.labels_per_topic))
+            ]
+            subjects.append(
+                {
+                    "@type": "Topic",
+                    "prefLabel": "; ".join(labels),
+                    "language": {"code": language},
+                }
+            )
+        return subjects
+
+    def record(self, number: int) -> Dict[str, Any]:
+        """Returns the record with this number"""
+        rng = self.__random__(number)
+        language = "swe" if rng.random() < self.share_in_swedish else "eng"
+        identified_by = [
+            {"@type": "URI", "value": f"http://example.org/record/{number}"}
+        ]
+        if rng.random() < self.share_with_doi:
+            identified_by.append(
+                {"@type": "DOI", "value": f"10.1234/synthetic.{self.seed}.{number}"}
+            )
+        if rng.random() < 0.5:
+            identified_by.append({"@type": "ScopusID", "value": f"{2000000 + number}"})
+        if rng.random() < 0.2:
+            identified_by.append({"@type": "PMID", "value": f"{30000000 + number}"})
+        return {
+            "@context": "https://swepub.kb.se/context.jsonld",
+            "meta": {
+                "creationDate": "2021-03-04T12:00:00Z",
+                "assigner": {"@type": "Organization", "code": "kth"},
+            },
+            "master": {
+                "@id": f"https://swepub.kb.se/synthetic/{self.seed}/{number}#it",
+                "@type": "Publication",
+                "publication": [
+                    {"@type": "Publication", "date": str(1990 + number % 33)}
+                ],
+                "identifiedBy": identified_by,
+                "instanceOf": {
+                    "@type": "Text",
+                    "summary": [
+                        {
+                            "label": self.__text__(
+                                rng,
+                                language,
+                                self.__number_of__(rng, self.words_per_abstract),
+                            )
+                        }
+                        for _ in range(
+                            self.__number_of__(rng, self.abstracts_per_record)
+                        )
+                    ],
+                    "contribution": [
+                        self.__contribution__(rng)
+                        for _ in range(
+                            self.__number_of__(rng, self.contributors_per_record)
+                        )
+                    ],
+                    "language": [{"code": language}],
+                    "hasTitle": [
+                        {"@type": "Title", "mainTitle": self.__text__(rng, language, 8)}
+                        for _ in range(self.__number_of__(rng, self.titles_per_record))
+                    ],
+                    "subject": self.__subjects__(rng),
+                },
+            },
+        }
+
+    def lines(self, count: int, start: int = 1) -> List[bytes]:
+        return [
+            json.dumps(self.record(number)).encode() + b"\n"
+            for number in range(start, start + count)
+        ]
+
+    def write(self, path: str, count: int, lines_per_write: int = 10000):
+        """Writes count records to a .zip, .gz or plain JSONL file"""
+        if path.endswith(".zip"):
+            with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+                with z.open("swepub.jsonl", "w") as f:
+                    self.__write_lines__(f, count, lines_per_write)
+        elif path.endswith(".gz"):
+            with gzip.open(path, "wb") as f:
+                self.__write_lines__(f, count, lines_per_write)
+        else:
+            with open(path, "wb") as f:
+                self.__write_lines__(f, count, lines_per_write)
+
+    def __write_lines__(self, f, count: int, lines_per_write: int):
+        for start in range(1, count + 1, lines_per_write):
+            f.writelines(self.lines(min(lines_per_write, count + 1 - start), start))
+
+
+@click.command()
+@click.argument("path", type=click.Path(dir_okay=False))
+@click.option("--count", default=10000, show_default=True)
+@click.option("--seed", type=int, help="Overrides the seed in the settings")
+@click.option(
+    "--settings",
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON with the fields of SyntheticGenerator to change",
+)
+def main(path: str, count: int, seed: Optional[int], settings: Optional[str]):
+    """Write a synthetic dump to PATH, a .zip, .jsonl.gz or .jsonl"""
+    values = {}
+    if settings is not None:
+        with open(settings) as f:
+            values = json.load(f)
+    if seed is not None:
+        values["seed"] = seed
+    SyntheticGenerator(**values).write(path, count)
+    print(f"wrote {count} records to {path}")
+
+
+if __name__ == "__main__":
+    main()
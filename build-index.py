@@ -0,0 +1,29 @@
+import logging
+
+import click
+
+import config
+from models.swepub_index import SwepubIndex
+
+logging.basicConfig(level=config.loglevel)
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.argument("zipfile_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--cache",
+    default="swepub.jsonl",
+    show_default=True,
+    help="Decompressed copy of the dump that the index points into",
+)
+def main(zipfile_path: str, cache: str):
+    """Decompress SwePub and index the line of every article id
+
+    Afterwards SwepubIndex(cache).get_article(id) seeks to the article
+    instead of scanning the dump"""
+    SwepubIndex(cache_path=cache).build(zipfile_path=zipfile_path)
+
+
+if __name__ == "__main__":
+    main()
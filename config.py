@@ -7,12 +7,37 @@ user_agent = f"SwePub2Python/{version} (User:{user})"
 loglevel = logging.WARNING
 stop_line_number = 1000
 start_line_number = 1
+# Parse in this many processes, 1 disables the process pool
+number_of_workers = 1
+# Save the progress to this file every x lines and resume from it
+# after a crash. None disables checkpointing.
+checkpoint_filename = None
+checkpoint_every_x_line = 100000
+# Save the counters and stage timings of an extraction to this JSON file.
+# None disables it.
+metrics_filename = "metrics.json"
+# Write the metrics in the Prometheus text format to this file
+# and/or serve them on this port for scraping. None disables them.
+prometheus_filename = None
+prometheus_port = None
+
+# "orjson", "msgspec" or "json". None picks the fastest one installed.
+json_backend = None
+# Decode only the parts of the records that we parse. This needs msgspec.
+schema_decoding = True
 
 # Settings
 # Note: Parsing of identifiers is always done.
 # The settings below increase the processing time considerably
 # but also extracts more valuable information from the dataset.
 detect_language_of_abstract = False
+# "langdetect", "py3langid" or "lingua", the last two have to be installed.
+# detect-languages.py detects after parsing in batches and caches the results,
+# which is much faster than detect_language_of_abstract.
+language_detection_backend = "langdetect"
+# Makes langdetect return the same language for a text every time.
+# None gives a random sample every time.
+language_detection_seed = 0
 lookup_languages_in_wd = True
 lookup_topics_in_wd = False
 parse_contributors = True
@@ -20,3 +45,5 @@ parse_titles = True
 parse_abstracts = True
 parse_subjects = True
 sleep_after_topic_match = 0  # seconds
+# Keep the raw JSON of every article. This doubles the size of the output.
+keep_raw_data = False
@@ -0,0 +1,39 @@
+import logging
+
+import click
+
+import config
+from models.delta_extractor import DeltaExtractor
+
+logging.basicConfig(level=config.loglevel)
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.argument("zipfile_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--manifest",
+    default="manifest.npy",
+    show_default=True,
+    help="Ids and hashes of the records of the last run",
+)
+@click.option(
+    "--output-format",
+    type=click.Choice(["pickle", "parquet"]),
+    default="pickle",
+    show_default=True,
+)
+def main(zipfile_path: str, manifest: str, output_format: str):
+    """Update the output of the last run to a newer dump of SwePub
+
+    Only new and changed records are parsed. Without a manifest
+    everything is extracted and the manifest is written for the next run"""
+    DeltaExtractor(
+        swepub_deduplicated_zipfile_path=zipfile_path,
+        manifest_filename=manifest,
+        output_format=output_format,
+    ).extract()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import logging
+import os
+
+import click
+import pandas as pd  # type: ignore
+
+import config
+from models.language_detection import LanguageDetector, detector_backends
+
+logging.basicConfig(level=config.loglevel)
+logger = logging.getLogger(__name__)
+
+
+def detect_in_parquet(path: str, detector: LanguageDetector):
+    """Replaces the detected_abstract_language column of the articles table"""
+    # pyarrow is only needed for this output format
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+
+    table = pq.read_table(path)
+    languages = pa.array(
+        detector.detect(table.column("first_abstract").to_pylist()), type=pa.string()
+    )
+    index = table.schema.get_field_index("detected_abstract_language")
+    table = table.set_column(index, table.schema.field(index), languages)
+    temporary_filename = f"{path}.tmp"
+    pq.write_table(table, temporary_filename)
+    os.replace(temporary_filename, path)
+
+
+def detect_in_pickle(path: str, detector: LanguageDetector):
+    articles = pd.read_pickle(path)
+    if "first_abstract" not in articles.columns:
+        raise click.UsageError(f"{path} has no first_abstract column")
+    detector.detect_articles(articles)
+    if "object" in articles.columns:
+        for article, language in zip(
+            articles["object"], articles["detected_abstract_language"]
+        ):
+            article.detected_abstract_language = language
+    articles.to_pickle(path, protocol=5)
+
+
+@click.command()
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--backend",
+    type=click.Choice(list(detector_backends)),
+    default=config.language_detection_backend,
+    show_default=True,
+)
+@click.option("--workers", default=os.cpu_count() or 1, show_default=True)
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option(
+    "--seed",
+    default=config.language_detection_seed,
+    type=int,
+    show_default=True,
+    help="Seed of langdetect, the same text always gets the same language",
+)
+@click.option("--no-cache", is_flag=True, help="Detect every abstract again")
+def main(
+    path: str, backend: str, workers: int, batch_size: int, seed: int, no_cache: bool
+):
+    """Detect the language of the first abstract of every article
+
+    PATH is articles.parquet or the articles pickle. The languages are
+    written to its detected_abstract_language column. They are cached
+    by the text of the abstract so the next run only detects new ones"""
+    detector = LanguageDetector(
+        backend=backend,
+        seed=seed,
+        number_of_workers=workers,
+        batch_size=batch_size,
+        use_cache=not no_cache,
+    )
+    if path.endswith(".parquet"):
+        detect_in_parquet(path, detector)
+    else:
+        detect_in_pickle(path, detector)
+    print(f"saved to {path}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,318 @@
+import json
 import logging
+import os
+import sqlite3
 from os.path import exists
-
-import pandas as pd  # type: ignore
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
-# lookups where inspired by
-# https://stackoverflow.com/questions/24761133/pandas-check-if-row-exists-with-certain-values
+# The cache is a SQLite database with (label, qid) as primary key
+# so lookups and inserts do not depend on the size of the cache.
+# It also holds the results of the topic searches keyed by (label, language)
+# and the queue of matches that wait for review, the detected
+# languages of abstracts keyed by the hash of their text and the
+# language codes that were looked up in Wikidata during extractions.
+# WAL mode lets several worker processes read while one of them writes.
+cache_filename = "cache.sqlite"
+# The old cache was a pickled dataframe. It is imported once if found.
+legacy_cache_filename = "cache.pkl"
+
+# One connection per process because connections must not cross a fork
+connections: Dict[int, sqlite3.Connection] = {}
+
+
+def get_connection() -> sqlite3.Connection:
+    """Returns the connection to the cache for this process"""
+    pid = os.getpid()
+    if pid not in connections:
+        connection = sqlite3.connect(cache_filename, timeout=60, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS approvals ("
+            "label TEXT NOT NULL, "
+            "qid TEXT NOT NULL, "
+            "result INTEGER NOT NULL, "
+            "PRIMARY KEY (label, qid)) WITHOUT ROWID"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS topic_searches ("
+            "label TEXT NOT NULL, "
+            "language TEXT NOT NULL, "
+            "results TEXT NOT NULL, "
+            "PRIMARY KEY (label, language)) WITHOUT ROWID"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS review_queue ("
+            "label TEXT NOT NULL, "
+            "qid TEXT NOT NULL, "
+            "candidate_label TEXT, "
+            "description TEXT, "
+            "occurrences INTEGER NOT NULL, "
+            "PRIMARY KEY (label, qid)) WITHOUT ROWID"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS abstract_languages ("
+            "detector TEXT NOT NULL, "
+            "hash BLOB NOT NULL, "
+            "language TEXT, "
+            "PRIMARY KEY (detector, hash)) WITHOUT ROWID"
+        )
+        # The shipped language table is read-only, codes that are
+        # looked up while extracting are kept here
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS languages ("
+            "code TEXT NOT NULL PRIMARY KEY, "
+            "qid TEXT, "
+            "label TEXT) WITHOUT ROWID"
+        )
+        # The legacy files that were imported, so that they are imported once
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS imports ("
+            "filename TEXT NOT NULL PRIMARY KEY) WITHOUT ROWID"
+        )
+        connections[pid] = connection
+        if exists(legacy_cache_filename):
+            __import_legacy_cache__(connection)
+    return connections[pid]
+
+
+def __import_legacy_cache__(connection: sqlite3.Connection):
+    """Copy the rows of the old pickled cache into the database
+
+    Worker processes that start at the same time all get here.
+    BEGIN IMMEDIATE makes them wait for each other and the row in imports
+    tells the ones that come later that the cache is imported already"""
+    import pandas as pd  # type: ignore
+
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        imported = connection.execute(
+            "SELECT 1 FROM imports WHERE filename = ?", (legacy_cache_filename,)
+        ).fetchone()
+        if imported is None:
+            logger.info(f"Importing the old cache {legacy_cache_filename}")
+            try:
+                df = pd.read_pickle(legacy_cache_filename)
+            except FileNotFoundError:
+                # Renamed by a process that imported it before the imports table
+                df = None
+            if df is not None:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO approvals (label, qid, result) "
+                    "VALUES (?, ?, ?)",
+                    (
+                        (row.label, row.qid, bool(row.result))
+                        for row in df.itertuples(index=False)
+                    ),
+                )
+                connection.execute(
+                    "INSERT INTO imports (filename) VALUES (?)",
+                    (legacy_cache_filename,),
+                )
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+    try:
+        os.rename(legacy_cache_filename, f"{legacy_cache_filename}.imported")
+    except OSError as error:
+        # Another process renamed it first. The imports row keeps us
+        # from importing it again if the rename failed for another reason.
+        logger.debug(f"Could not rename {legacy_cache_filename}: {error}")
 
 
 def read_from_cache(
     label: str = None,
     qid: str = None,
-):
+) -> Optional[bool]:
     """Returns None or result from the cache"""
     if label is None or qid is None:
         raise ValueError("did not get all we need")
     logger.debug("Reading from the cache")
-    if exists("cache.pkl"):
-        df = pd.read_pickle("cache.pkl")
-        # This tests whether any row matches
-        match = ((df["qid"] == qid) & (df["label"] == label)).any()
-        logger.debug(f"match:{match}")
-        if match:
-            # Here we find the row that matches and extract the
-            # result column and extract the value using any()
-            result = df.loc[df["qid"] == qid, "result"].any()
-            logger.debug(f"result:{result}")
-            if result is not None:
-                return result
+    row = (
+        get_connection()
+        .execute(
+            "SELECT result FROM approvals WHERE label = ? AND qid = ?", (label, qid)
+        )
+        .fetchone()
+    )
+    logger.debug(f"row:{row}")
+    if row is not None:
+        return bool(row[0])
 
 
 def add_to_cache(label: str = None, qid: str = None, result: bool = None):
     if label is None or qid is None or result is None:
         raise ValueError("did not get all we need")
     logger.debug("Adding to cache")
-    data = dict(label=label, qid=qid, result=result)
-    if exists("cache.pkl"):
-        df = pd.read_pickle("cache.pkl")
-        # This tests whether any row matches
-        match = ((df["qid"] == qid) & (df["label"] == label)).any()
-        logger.debug(f"match:{match}")
-        if not match:
-            # We only give save the value once for now
-            df = df.append(pd.DataFrame(data=[data]))
-            df.to_pickle("cache.pkl")
-    else:
-        pd.DataFrame(data=[data]).to_pickle("cache.pkl")
+    # We only save the value once for now
+    get_connection().execute(
+        "INSERT OR IGNORE INTO approvals (label, qid, result) VALUES (?, ?, ?)",
+        (label, qid, result),
+    )
+
+
+def read_search_results(label: str, language: str) -> Optional[List[Dict[str, Any]]]:
+    """Returns None or the cached results of searching for the topic"""
+    row = (
+        get_connection()
+        .execute(
+            "SELECT results FROM topic_searches WHERE label = ? AND language = ?",
+            (label, language),
+        )
+        .fetchone()
+    )
+    if row is not None:
+        return json.loads(row[0])
+
+
+def add_search_results(label: str, language: str, results: List[Dict[str, Any]]):
+    get_connection().execute(
+        "INSERT OR REPLACE INTO topic_searches (label, language, results) "
+        "VALUES (?, ?, ?)",
+        (label, language, json.dumps(results)),
+    )
+
+
+def add_many_search_results(rows: Iterable[Tuple[str, str, List[Dict[str, Any]]]]):
+    """Store many results in one transaction"""
+    connection = get_connection()
+    # The connection is in autocommit mode so we begin the transaction ourselves
+    connection.execute("BEGIN")
+    try:
+        connection.executemany(
+            "INSERT OR REPLACE INTO topic_searches (label, language, results) "
+            "VALUES (?, ?, ?)",
+            (
+                (label, language, json.dumps(results))
+                for label, language, results in rows
+            ),
+        )
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def searched_topics() -> Set[Tuple[str, str]]:
+    """Returns the (label, language) pairs that are in the cache"""
+    return set(get_connection().execute("SELECT label, language FROM topic_searches"))
+
+
+def read_abstract_languages(
+    detector: str, hashes: Iterable[bytes]
+) -> Dict[bytes, Optional[str]]:
+    """Returns the cached languages of the abstracts with these hashes.
+    The language is None if the detector could not tell"""
+    connection = get_connection()
+    hashes = list(hashes)
+    found: Dict[bytes, Optional[str]] = {}
+    # SQLite limits the number of parameters of a statement
+    for index in range(0, len(hashes), 500):
+        batch = hashes[index : index + 500]
+        found.update(
+            connection.execute(
+                "SELECT hash, language FROM abstract_languages "
+                f"WHERE detector = ? AND hash IN ({', '.join('?' * len(batch))})",
+                (detector, *batch),
+            )
+        )
+    return found
+
+
+def add_many_abstract_languages(
+    detector: str, rows: Iterable[Tuple[bytes, Optional[str]]]
+):
+    """Store the languages of many abstracts in one transaction"""
+    connection = get_connection()
+    connection.execute("BEGIN")
+    try:
+        connection.executemany(
+            "INSERT OR REPLACE INTO abstract_languages (detector, hash, language) "
+            "VALUES (?, ?, ?)",
+            ((detector, hash, language) for hash, language in rows),
+        )
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def read_language(code: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    """Returns (qid, label) of a code that was looked up before or None"""
+    return (
+        get_connection()
+        .execute("SELECT qid, label FROM languages WHERE code = ?", (code,))
+        .fetchone()
+    )
+
+
+def add_language(code: str, qid: Optional[str], label: Optional[str]):
+    get_connection().execute(
+        "INSERT OR REPLACE INTO languages (code, qid, label) VALUES (?, ?, ?)",
+        (code, qid, label),
+    )
+
+
+def add_many_to_review_queue(
+    matches: Dict[Tuple[str, str], Tuple[Optional[str], Optional[str], int]]
+):
+    """Queue the matches for review in one transaction
+
+    matches maps (label, qid) to (candidate_label, description, occurrences).
+    The occurrences are added to the ones of this extraction run"""
+    connection = get_connection()
+    connection.execute("BEGIN")
+    try:
+        connection.executemany(
+            "INSERT INTO review_queue "
+            "(label, qid, candidate_label, description, occurrences) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (label, qid) DO UPDATE SET "
+            "candidate_label = excluded.candidate_label, "
+            "description = excluded.description, "
+            "occurrences = occurrences + excluded.occurrences",
+            (
+                (label, qid, candidate_label, description, occurrences)
+                for (label, qid), (
+                    candidate_label,
+                    description,
+                    occurrences,
+                ) in matches.items()
+            ),
+        )
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def reset_review_queue_occurrences():
+    """Start counting the occurrences of the queued matches over.
+    Matches that were not seen in the last run keep 0"""
+    get_connection().execute("UPDATE review_queue SET occurrences = 0")
+
+
+def read_review_queue(limit: Optional[int] = None) -> List[Tuple[Any, ...]]:
+    """Returns (label, qid, candidate_label, description, occurrences)
+    of the undecided matches, the most frequent first"""
+    return (
+        get_connection()
+        .execute(
+            "SELECT q.label, q.qid, q.candidate_label, q.description, q.occurrences "
+            "FROM review_queue q "
+            "LEFT JOIN approvals a ON a.label = q.label AND a.qid = q.qid "
+            "WHERE a.result IS NULL "
+            "ORDER BY q.occurrences DESC, q.label "
+            "LIMIT ?",
+            (limit if limit is not None else -1,),
+        )
+        .fetchall()
+    )
+
+
+def remove_from_review_queue(label: str, qid: str):
+    get_connection().execute(
+        "DELETE FROM review_queue WHERE label = ? AND qid = ?", (label, qid)
+    )
@@ -0,0 +1,87 @@
+import re
+from typing import Any, Callable, Dict, Optional
+
+# Normalization makes the identifiers in SwePub and the ones we match
+# against comparable, e.g. "https://doi.org/10.1000/ABC" and "10.1000/abc"
+
+doi_prefix = re.compile(r"^(https?://(dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+handle_prefix = re.compile(r"^(https?://hdl\.handle\.net/|hdl:\s*)", re.IGNORECASE)
+separators = re.compile(r"[\s-]")
+
+
+def normalize_doi(value: str) -> str:
+    # DOIs are case insensitive
+    return doi_prefix.sub("", value.strip()).lower()
+
+
+def normalize_pmid(value: str) -> str:
+    value = value.strip()
+    if value.lower().startswith("pmid:"):
+        value = value[5:].strip()
+    return value.lstrip("0")
+
+
+def normalize_scopusid(value: str) -> str:
+    # Scopus EIDs carry a prefix in front of the id
+    value = value.strip()
+    if value.startswith("2-s2.0-"):
+        value = value[7:]
+    return value
+
+
+def normalize_isbn(value: str) -> str:
+    """Returns the ISBN-13 without separators"""
+    value = separators.sub("", value).upper()
+    if len(value) == 10 and value[:9].isdigit():
+        value = "978" + value[:9]
+        checksum = sum(
+            int(digit) * (1 if position % 2 == 0 else 3)
+            for position, digit in enumerate(value)
+        )
+        value += str((10 - checksum % 10) % 10)
+    return value
+
+
+def normalize_issn(value: str) -> str:
+    return separators.sub("", value).upper()
+
+
+def normalize_isi(value: str) -> str:
+    value = value.strip().upper()
+    if value.startswith("WOS:"):
+        value = value[4:]
+    return value
+
+
+def normalize_hdl(value: str) -> str:
+    return handle_prefix.sub("", value.strip()).lower()
+
+
+# Keyed by the @type of the identifiers in SwePub
+normalizers: Dict[str, Callable[[str], str]] = dict(
+    DOI=normalize_doi,
+    PMID=normalize_pmid,
+    ScopusID=normalize_scopusid,
+    ISBN=normalize_isbn,
+    ISSN=normalize_issn,
+    ISI=normalize_isi,
+    Hdl=normalize_hdl,
+    LibrisNumber=str.strip,
+)
+
+
+def normalize_identifier(identifier_type: str, value: Any) -> Optional[str]:
+    """Returns the normalized value or None if the type is not supported
+    or nothing is left of the value"""
+    normalizer = normalizers.get(identifier_type)
+    if normalizer is None or value is None:
+        return None
+    normalized = normalizer(str(value))
+    if normalized == "":
+        return None
+    return normalized
+
+
+def identifier_key_text(identifier_type: str, normalized_value: str) -> str:
+    """The text that is hashed into the identifier index"""
+    return f"{identifier_type}:{normalized_value}"
@@ -0,0 +1,47 @@
+import json
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# The faster decoders are optional. They decode the bytes
+# that the zipfile yields directly without creating a str first.
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+try:
+    import msgspec  # type: ignore
+except ImportError:
+    msgspec = None
+
+backends: Dict[str, Callable[[bytes], Any]] = dict(json=json.loads)
+if orjson is not None:
+    backends["orjson"] = orjson.loads
+if msgspec is not None:
+    backends["msgspec"] = msgspec.json.Decoder().decode
+
+# The backend used when config.json_backend is None, fastest first
+preferred_backends = ["orjson", "msgspec", "json"]
+
+# orjson.JSONDecodeError is a subclass of json.JSONDecodeError
+DecodeError: Tuple[Type[Exception], ...] = (json.JSONDecodeError,)
+if msgspec is not None:
+    DecodeError += (msgspec.DecodeError,)
+
+
+def get_decoder(backend: Optional[str] = None) -> Callable[[bytes], Any]:
+    """Returns the decode function of the backend.
+    If backend is None the one in config is used or else the fastest installed"""
+    if backend is None:
+        backend = config.json_backend
+    if backend is None:
+        backend = next(name for name in preferred_backends if name in backends)
+    if backend not in backends:
+        raise ValueError(
+            f"JSON backend {backend} is not installed, "
+            f"choose one of {list(backends)}"
+        )
+    return backends[backend]
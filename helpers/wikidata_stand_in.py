@@ -0,0 +1,210 @@
+import json
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+
+# The codes in the VALUES clause of the language query
+values_pattern = re.compile(r"VALUES\s+\?code\s*\{([^}]*)\}")
+
+
+class WikidataStandIn:
+    """A local stand-in for the MediaWiki API and the query service of Wikidata
+
+    It answers wbsearchentities and wbgetentities from a dictionary of
+    items and the ISO 639-2 code queries from a dictionary of languages
+    so that topic matching and language lookups can be tried and
+    benchmarked without the network.
+    Every x request can be refused with 429 to exercise the retries.
+
+    with WikidataStandIn(items) as stand_in:
+        TopicMatcher(api_url=stand_in.api_url).match(topics)"""
+
+    # QID -> dict(label=..., description=..., aliases=[...])
+    items: Dict[str, Dict[str, Any]]
+    # ISO 639-2 code -> QID
+    languages: Dict[str, str]
+    latency_seconds: float
+    refuse_every_x_request: int
+    number_of_requests: int = 0
+    number_of_refused_requests: int = 0
+
+    def __init__(
+        self,
+        items: Optional[Dict[str, Dict[str, Any]]] = None,
+        languages: Optional[Dict[str, str]] = None,
+        latency_seconds: float = 0,
+        refuse_every_x_request: int = 0,
+        port: int = 0,
+    ):
+        self.items = items if items is not None else {}
+        self.languages = languages if languages is not None else {}
+        self.latency_seconds = latency_seconds
+        self.refuse_every_x_request = refuse_every_x_request
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.__handler__())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/w/api.php"
+
+    @property
+    def sparql_endpoint(self) -> str:
+        return f"{self.url}/sparql"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Wikidata stand-in listening on {self.url}")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def search(self, text: str, limit: int) -> Dict[str, Any]:
+        """Returns a wbsearchentities response for the text"""
+        text = text.lower()
+        results = []
+        for qid, item in self.items.items():
+            if item["label"].lower() == text:
+                match = dict(type="label", language="en", text=item["label"])
+            elif any(alias.lower() == text for alias in item.get("aliases", [])):
+                match = dict(type="alias", language="en", text=text)
+            else:
+                continue
+            result = dict(id=qid, label=item["label"], match=match)
+            if "description" in item:
+                result["description"] = item["description"]
+            if "aliases" in item:
+                result["aliases"] = item["aliases"]
+            results.append(result)
+            if len(results) == limit:
+                break
+        return dict(searchinfo=dict(search=text), search=results, success=1)
+
+    def get_entities(self, ids: str) -> Dict[str, Any]:
+        """Returns a wbgetentities response with the English labels"""
+        entities: Dict[str, Any] = {}
+        for qid in ids.split("|"):
+            if qid in self.items:
+                label = self.items[qid]["label"]
+                entities[qid] = dict(
+                    type="item",
+                    id=qid,
+                    labels=dict(en=dict(language="en", value=label)),
+                )
+            else:
+                entities[qid] = dict(id=qid, missing="")
+        return dict(entities=entities, success=1)
+
+    def query_languages(self, query: str) -> Dict[str, Any]:
+        """Returns the items of the codes in the VALUES clause of the query"""
+        match = values_pattern.search(query)
+        codes = re.findall(r'"([^"]*)"', match.group(1)) if match else []
+        bindings = [
+            dict(
+                code=dict(type="literal", value=code),
+                item=dict(
+                    type="uri",
+                    value=f"http://www.wikidata.org/entity/{self.languages[code]}",
+                ),
+            )
+            for code in codes
+            if code in self.languages
+        ]
+        return dict(head=dict(vars=["code", "item"]), results=dict(bindings=bindings))
+
+    def respond(self, path: str, parameters: Dict[str, str]):
+        """Returns the status, headers and body of the response"""
+        if path == "/w/api.php":
+            action = parameters.get("action")
+            if action == "wbsearchentities":
+                return (
+                    200,
+                    {},
+                    self.search(
+                        parameters.get("search", ""), int(parameters.get("limit", 7))
+                    ),
+                )
+            if action == "wbgetentities":
+                return 200, {}, self.get_entities(parameters.get("ids", ""))
+            return (
+                200,
+                {},
+                dict(error=dict(code="badvalue", info=f"unsupported action {action}")),
+            )
+        if path == "/sparql":
+            return 200, {}, self.query_languages(parameters.get("query", ""))
+        return 404, {}, dict(error=dict(code="notfound", info=path))
+
+    def __handler__(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                self.__answer__(url.path, parse_qs(url.query))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode()
+                url = urlparse(self.path)
+                # The parameters can be in the URL, the form or both
+                query = parse_qs(url.query)
+                if self.headers.get("Content-Type", "").startswith(
+                    "application/x-www-form-urlencoded"
+                ):
+                    query.update(parse_qs(body))
+                self.__answer__(url.path, query)
+
+            def __answer__(self, path: str, query: Dict[str, Any]):
+                parameters = {key: values[-1] for key, values in query.items()}
+                with stand_in.lock:
+                    stand_in.number_of_requests += 1
+                    refuse = (
+                        stand_in.refuse_every_x_request > 0
+                        and stand_in.number_of_requests
+                        % stand_in.refuse_every_x_request
+                        == 0
+                    )
+                    if refuse:
+                        stand_in.number_of_refused_requests += 1
+                if stand_in.latency_seconds > 0:
+                    time.sleep(stand_in.latency_seconds)
+                if refuse:
+                    status, headers, body = 429, {"Retry-After": "0"}, {}
+                else:
+                    status, headers, body = stand_in.respond(path, parameters)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
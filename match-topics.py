@@ -0,0 +1,53 @@
+import logging
+
+import click
+import pandas as pd  # type: ignore
+
+import config
+from models.topic_matcher import TopicMatcher, distinct_topics, subjects_from_articles
+
+logging.basicConfig(level=config.loglevel)
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--api-url",
+    default="https://www.wikidata.org/w/api.php",
+    show_default=True,
+    help="MediaWiki API, e.g. a local stand-in",
+)
+@click.option("--concurrency", default=8, show_default=True)
+@click.option("--requests-per-second", default=5.0, show_default=True)
+@click.option("--max-retries", default=5, show_default=True)
+def main(
+    path: str,
+    api_url: str,
+    concurrency: int,
+    requests_per_second: float,
+    max_retries: int,
+):
+    """Search Wikidata for every distinct topic in an extraction
+
+    PATH is subjects.parquet or the articles pickle.
+    The results are cached so that parsing with lookup_topics_in_wd = True
+    only has to ask for approval"""
+    if path.endswith(".parquet"):
+        subjects = pd.read_parquet(
+            path, columns=["label", "language_code", "uka_scheme"]
+        )
+    else:
+        subjects = subjects_from_articles(pd.read_pickle(path))
+    topics = distinct_topics(subjects)
+    print(f"found {len(topics)} distinct topics in {len(subjects)} subjects")
+    TopicMatcher(
+        api_url=api_url,
+        concurrency=concurrency,
+        requests_per_second=requests_per_second,
+        max_retries=max_retries,
+    ).match(topics)
+
+
+if __name__ == "__main__":
+    main()
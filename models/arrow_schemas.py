@@ -0,0 +1,107 @@
+from typing import Dict, List
+
+import pyarrow as pa  # type: ignore
+
+# The tables are linked by the article id.
+# Contributors and affiliations are also linked by contributor_number
+# which is the position of the contributor in the article.
+schemas: Dict[str, pa.Schema] = dict(
+    articles=pa.schema(
+        [
+            ("id", pa.string()),
+            ("doi", pa.string()),
+            ("first_abstract", pa.string()),
+            ("first_title", pa.string()),
+            ("detected_abstract_language", pa.string()),
+            ("hdl", pa.string()),
+            ("isbn", pa.string()),
+            ("isi", pa.string()),
+            ("issn", pa.string()),
+            ("language_codes", pa.list_(pa.string())),
+            ("libris_id", pa.string()),
+            ("number_of_abstracts", pa.int32()),
+            ("number_of_contributors", pa.int32()),
+            ("number_of_language_codes", pa.int32()),
+            ("number_of_titles", pa.int32()),
+            ("patent_number", pa.string()),
+            ("pmid", pa.string()),
+            ("scopusid", pa.string()),
+            ("unknown_local_identifier", pa.string()),
+            ("url", pa.string()),
+        ]
+    ),
+    contributors=pa.schema(
+        [
+            ("id", pa.string()),
+            ("contributor_number", pa.int32()),
+            ("given_name", pa.string()),
+            ("family_name", pa.string()),
+            ("full_name", pa.string()),
+            ("orcid", pa.string()),
+            ("local_identifier", pa.string()),
+        ]
+    ),
+    affiliations=pa.schema(
+        [
+            ("id", pa.string()),
+            ("contributor_number", pa.int32()),
+            ("name", pa.string()),
+            ("local_identifier", pa.string()),
+            ("has_nested_affiliations", pa.bool_()),
+            ("language_code", pa.string()),
+            ("linked_to_person", pa.bool_()),
+            ("url", pa.string()),
+        ]
+    ),
+    subjects=pa.schema(
+        [
+            ("id", pa.string()),
+            ("label", pa.string()),
+            ("language_code", pa.string()),
+            ("language_label", pa.string()),
+            ("language_qid", pa.string()),
+            ("uka_code", pa.int32()),
+            ("uka_code_level", pa.int8()),
+            ("uka_label", pa.string()),
+            ("uka_scheme", pa.bool_()),
+            ("matched_wikidata_qid", pa.string()),
+            ("manually_matched", pa.bool_()),
+        ]
+    ),
+)
+
+
+def __fields_of__(table: str) -> List[pa.Field]:
+    """Returns the fields of a linked table without the link columns"""
+    return [
+        field
+        for field in schemas[table]
+        if field.name not in ("id", "contributor_number")
+    ]
+
+
+# The flat articles table nests the linked tables as list<struct> columns
+# so that every cell holds Arrow data instead of Python objects
+flat_article_schema: pa.Schema = pa.schema(
+    list(schemas["articles"])
+    + [
+        pa.field(
+            "contributors",
+            pa.list_(
+                pa.struct(
+                    __fields_of__("contributors")
+                    + [
+                        pa.field(
+                            "affiliations",
+                            pa.list_(pa.struct(__fields_of__("affiliations"))),
+                        )
+                    ]
+                )
+            ),
+        ),
+        pa.field("subjects", pa.list_(pa.struct(__fields_of__("subjects")))),
+    ]
+)
+flat_article_schema_with_raw_data: pa.Schema = flat_article_schema.append(
+    pa.field("raw_data", pa.string())
+)
@@ -0,0 +1,54 @@
+import logging
+import os
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class ReadPosition(BaseModel):
+    """Where in the zipfile the extraction got to"""
+
+    member: Optional[str] = None
+    # The last line that was read
+    line_number: int = 0
+    # Offset in the decompressed member right after that line
+    uncompressed_offset: int = 0
+    # Number of compressed bytes that were consumed, for information only
+    compressed_offset: Optional[int] = None
+
+
+class Checkpoint(BaseModel):
+    """The position of an extraction and the output parts that were
+    flushed up to it. A restart resumes from here."""
+
+    position: ReadPosition
+    # Every part maps table names to the filename of the part
+    parts: List[Dict[str, str]] = []
+    number_of_lines: int = 0
+    output_format: str
+    flat_export: bool
+    start_line_number: int
+    stop_line_number: int
+    fields: Optional[List[str]] = None
+
+    def save(self, filename: str):
+        """Write the checkpoint atomically so a crash never leaves half of it"""
+        temporary_filename = f"{filename}.tmp"
+        with open(temporary_filename, "w") as f:
+            f.write(self.model_dump_json(indent=2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_filename, filename)
+        logger.info(
+            f"Saved checkpoint at line {self.position.line_number} "
+            f"with {len(self.parts)} parts"
+        )
+
+    @classmethod
+    def load(cls, filename: str) -> Optional["Checkpoint"]:
+        if not os.path.exists(filename):
+            return None
+        with open(filename) as f:
+            return cls.model_validate_json(f.read())
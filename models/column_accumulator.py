@@ -0,0 +1,102 @@
+import logging
+from typing import Any, Dict, List
+
+import pandas as pd  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnAccumulator:
+    """Collects rows into plain per-column lists and turns them into
+    one dataframe per batch instead of one dataframe per row.
+
+    The batches are joined once when to_dataframe() is called
+    which keeps the extraction linear in the number of lines.
+
+    If an Arrow schema is given the batches get Arrow backed
+    columns instead of columns of Python objects"""
+
+    batch_size: int
+    schema: Any = None
+    columns: Dict[str, List[Any]]
+    batches: List[pd.DataFrame]
+    number_of_rows_in_batch: int = 0
+    number_of_rows: int = 0
+
+    def __init__(self, batch_size: int = 10000, schema: Any = None):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_size = batch_size
+        self.schema = schema
+        self.columns = {}
+        self.batches = []
+
+    def add(self, row: Dict[str, Any]):
+        """Add a row in the form of a dictionary with column names as keys"""
+        for key in row:
+            if key not in self.columns:
+                # Backfill columns that appear after the first row
+                self.columns[key] = [None] * self.number_of_rows_in_batch
+        for key, column in self.columns.items():
+            column.append(row.get(key))
+        self.number_of_rows_in_batch += 1
+        self.number_of_rows += 1
+        if self.number_of_rows_in_batch >= self.batch_size:
+            self.flush()
+
+    def add_columns(self, columns: Dict[str, List[Any]]):
+        """Add rows that are already in the form of one list per column.
+        They are merged with the rows before and split into batches of batch_size"""
+        number_of_rows = max((len(column) for column in columns.values()), default=0)
+        if number_of_rows == 0:
+            return
+        for key in columns:
+            if key not in self.columns:
+                # Backfill columns that appear after the first rows
+                self.columns[key] = [None] * self.number_of_rows_in_batch
+        for key, column in self.columns.items():
+            values = columns.get(key)
+            column.extend(values if values is not None else [None] * number_of_rows)
+        self.number_of_rows_in_batch += number_of_rows
+        self.number_of_rows += number_of_rows
+        while self.number_of_rows_in_batch >= self.batch_size:
+            self.__flush_rows__(self.batch_size)
+
+    def __build_batch__(self, columns: Dict[str, List[Any]]) -> pd.DataFrame:
+        if self.schema is None:
+            return pd.DataFrame(data=columns)
+        # pyarrow is only needed when we got a schema
+        import pyarrow as pa  # type: ignore
+
+        return pa.Table.from_pydict(columns, schema=self.schema).to_pandas(
+            types_mapper=pd.ArrowDtype
+        )
+
+    def flush(self):
+        """Turn the collected columns into a dataframe and start a new batch"""
+        if self.number_of_rows_in_batch == 0:
+            return
+        self.__flush_rows__(self.number_of_rows_in_batch)
+
+    def __flush_rows__(self, number_of_rows: int):
+        """Turn the first rows of the collected columns into a dataframe"""
+        logger.debug(f"Flushing a batch of {number_of_rows} rows")
+        self.batches.append(
+            self.__build_batch__(
+                {key: column[:number_of_rows] for key, column in self.columns.items()}
+            )
+        )
+        self.columns = {
+            key: column[number_of_rows:] for key, column in self.columns.items()
+        }
+        self.number_of_rows_in_batch -= number_of_rows
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Join all batches into one dataframe"""
+        self.flush()
+        if len(self.batches) == 0:
+            return pd.DataFrame()
+        elif len(self.batches) == 1:
+            return self.batches[0]
+        else:
+            return pd.concat(self.batches, ignore_index=True)
@@ -0,0 +1,282 @@
+import logging
+import os
+import time
+from array import array
+from hashlib import blake2b
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from helpers.json_decoding import DecodeError
+from models.checkpoint import ReadPosition
+from models.extractor import Extractor
+from models.input_readers import input_reader_for, read_chunks
+from models.swepub.schema import decode_record
+from models.swepub_index import key_of
+
+logger = logging.getLogger(__name__)
+
+# The key of the @id and the hash of the line of every record in a dump,
+# sorted by key and hash
+manifest_dtype = np.dtype([("key", "<u8"), ("hash", "<u8")])
+
+
+def content_hash_of(line: bytes) -> int:
+    """Returns a 64 bit hash of the record on the line"""
+    return int.from_bytes(
+        blake2b(line.rstrip(b"\r\n"), digest_size=8).digest(), "little"
+    )
+
+
+def __in_sorted__(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    """Returns which of the values are in the sorted array"""
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=bool)
+    index = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return sorted_values[index] == values
+
+
+def keys_of_ids(ids: List[Optional[str]]) -> np.ndarray:
+    """Returns the keys of the article ids of an output table, 0 for no id"""
+    return np.fromiter(
+        (key_of(id) if isinstance(id, str) else 0 for id in ids),
+        dtype="<u8",
+        count=len(ids),
+    )
+
+
+class DeltaExtractor(Extractor):
+    """Updates the output of an earlier extraction to a newer dump.
+
+    The @id and a hash of the line of every record are kept in a manifest
+    next to the output. A new dump is scanned without parsing it and
+    compared to the manifest. Only records that are new or changed are
+    parsed. The rows of changed and deleted records are dropped from the
+    output tables and the rows of the parsed records are appended.
+    The first run has no manifest to compare with and extracts everything.
+
+    Parsing with other settings than the earlier extraction
+    gives a mix of both in the output"""
+
+    manifest_filename: str = "manifest.npy"
+    show_progress_every_x_line: int = 100000
+    # The new and changed lines found by the scan.
+    # None reads the whole dump like the Extractor.
+    delta_lines: Optional[List[bytes]] = None
+
+    def extract(self):
+        if self.swepub_deduplicated_zipfile_path is None:
+            raise ValueError("swepub_deduplicated_zipfile_path was None")
+        if self.checkpoint_filename is not None:
+            raise ValueError("checkpointing is not supported for delta extraction")
+        start = time.time()
+        previous = self.__load_manifest__()
+        kept: Dict[int, bytes] = {}
+        manifest, line_numbers = self.__scan__(
+            previous=previous, kept=kept, start=start
+        )
+        if previous is None:
+            print("no manifest from an earlier run, extracting everything", flush=True)
+            super().extract()
+            self.__save_manifest__(manifest)
+            return
+        new_keys = np.unique(manifest["key"])
+        # The line holds the id so the hash alone tells if a record is unchanged.
+        # A key is dirty if the lines with that id differ in any way,
+        # that also covers ids that appear on more than one line.
+        previous_hashes = np.sort(previous["hash"])
+        new_hashes = np.sort(manifest["hash"])
+        changed_keys = np.union1d(
+            manifest["key"][~__in_sorted__(manifest["hash"], previous_hashes)],
+            previous["key"][~__in_sorted__(previous["hash"], new_hashes)],
+        )
+        deleted_keys = np.setdiff1d(changed_keys, new_keys)
+        wanted = line_numbers[__in_sorted__(manifest["key"], changed_keys)]
+        print(
+            f"{len(wanted)} new or changed and {len(deleted_keys)} deleted records "
+            f"of {len(new_keys)}",
+            flush=True,
+        )
+        if len(changed_keys) == 0:
+            print("the output is up to date", flush=True)
+            self.__save_manifest__(manifest)
+            return
+        if len(wanted) > len(kept) or not set(wanted.tolist()) <= kept.keys():
+            # Only happens when an id is on more than one line
+            self.__collect__(set(wanted.tolist()), kept)
+        self.delta_lines = [kept[line_number] for line_number in sorted(wanted)]
+        kept.clear()
+        try:
+            self.__patch__(changed_keys)
+        finally:
+            self.delta_lines = None
+        self.__save_manifest__(manifest)
+        print(f"total duration: {round(time.time() - start)}s", flush=True)
+
+    def __load_manifest__(self) -> Optional[np.ndarray]:
+        if not os.path.exists(self.manifest_filename):
+            return None
+        missing = [
+            filename
+            for filename in self.__filenames__().values()
+            if not os.path.exists(filename)
+        ]
+        if len(missing) > 0:
+            raise ValueError(
+                f"found the manifest {self.manifest_filename} but not the output "
+                f"{missing} of the earlier extraction, delete it to start over"
+            )
+        return np.load(self.manifest_filename)
+
+    def __save_manifest__(self, manifest: np.ndarray):
+        temporary_filename = f"{self.manifest_filename}.tmp.npy"
+        np.save(temporary_filename, manifest)
+        os.replace(temporary_filename, self.manifest_filename)
+
+    def __chunks__(self):
+        return read_chunks(
+            reader=input_reader_for(self.swepub_deduplicated_zipfile_path),
+            stop_line_number=self.stop_line_number,
+            members_in_parallel=self.members_in_parallel,
+            queue_size=self.read_ahead_chunks,
+        )
+
+    def __lines_in_range__(self) -> Iterator[Tuple[int, List[bytes]]]:
+        """Yields the lines between the start and stop line numbers chunk by
+        chunk with the number of the first line, counting across all members"""
+        number = 1
+        for chunk in self.__chunks__():
+            lines = chunk.lines[
+                max(0, self.start_line_number - chunk.first_line_number) :
+            ]
+            if len(lines) > 0:
+                yield number, lines
+                number += len(lines)
+
+    def __scan__(
+        self, previous: Optional[np.ndarray], kept: Dict[int, bytes], start: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the manifest of the dump sorted by key and the line number
+        of every entry. The lines whose hash is not in the previous manifest
+        are kept"""
+        keys = array("Q")
+        hashes = array("Q")
+        numbers = array("Q")
+        previous_hashes = np.sort(previous["hash"]) if previous is not None else None
+        without_id = 0
+        scanned = 0
+        for first_number, lines in self.__lines_in_range__():
+            chunk_hashes = array("Q")
+            chunk_numbers = array("Q")
+            for number, line in enumerate(lines, start=first_number):
+                try:
+                    id = decode_record(line)["master"]["@id"]
+                except (DecodeError, KeyError, TypeError):
+                    without_id += 1
+                    continue
+                keys.append(key_of(id))
+                chunk_hashes.append(content_hash_of(line))
+                chunk_numbers.append(number)
+            hashes.extend(chunk_hashes)
+            numbers.extend(chunk_numbers)
+            if previous_hashes is not None and len(chunk_hashes) > 0:
+                # Checking the whole chunk at once is much faster than every line
+                unseen = ~__in_sorted__(
+                    np.frombuffer(chunk_hashes, dtype="<u8"), previous_hashes
+                )
+                for number in np.frombuffer(chunk_numbers, dtype="<u8")[
+                    unseen
+                ].tolist():
+                    kept[number] = lines[number - first_number]
+            if (scanned + len(lines)) // self.show_progress_every_x_line > (
+                scanned // self.show_progress_every_x_line
+            ):
+                print(
+                    f"scanned:{scanned + len(lines)} "
+                    f"duration:{round(time.time() - start)}s kept:{len(kept)}",
+                    flush=True,
+                )
+            scanned += len(lines)
+        if without_id > 0:
+            logger.error(f"Skipped {without_id} lines without an id")
+        manifest = np.empty(len(keys), dtype=manifest_dtype)
+        manifest["key"] = np.frombuffer(keys, dtype="<u8")
+        manifest["hash"] = np.frombuffer(hashes, dtype="<u8")
+        order = np.lexsort((manifest["hash"], manifest["key"]))
+        return manifest[order], np.frombuffer(numbers, dtype="<u8")[order]
+
+    def __collect__(self, wanted: Set[int], kept: Dict[int, bytes]):
+        for first_number, lines in self.__lines_in_range__():
+            for number, line in enumerate(lines, start=first_number):
+                if number in wanted and number not in kept:
+                    kept[number] = line
+
+    def __iterate_lines__(
+        self,
+        position: ReadPosition,
+        resume_from: Optional[ReadPosition] = None,
+    ) -> Iterator[bytes]:
+        """Yields only the new and changed lines that were found by the scan"""
+        if self.delta_lines is None:
+            yield from super().__iterate_lines__(
+                position=position, resume_from=resume_from
+            )
+        else:
+            yield from self.delta_lines
+
+    def __patch__(self, changed_keys: np.ndarray):
+        """Parses the delta to separate files and patches every table with it"""
+        filenames = self.__filenames__()
+        delta_filenames = {
+            table: self.__delta_filename__(filename)
+            for table, filename in filenames.items()
+        }
+        output = self.__open_output__(filenames=delta_filenames)
+        for columns, _, _ in self.__parse__(export=self.__export__()):
+            output.add_columns(columns)
+        self.__close_output__(output=output, filenames=delta_filenames)
+        for table, filename in filenames.items():
+            if self.output_format == "parquet":
+                self.__patch_parquet__(filename, delta_filenames[table], changed_keys)
+            else:
+                self.__patch_pickle__(filename, delta_filenames[table], changed_keys)
+            os.remove(delta_filenames[table])
+        print(f"patched {list(filenames.values())}", flush=True)
+
+    @staticmethod
+    def __delta_filename__(filename: str) -> str:
+        # Keep the extensions last so pandas infers the compression
+        directory, basename = os.path.split(filename)
+        name, dot, extensions = basename.partition(".")
+        return os.path.join(directory, f"{name}.delta{dot}{extensions}")
+
+    @staticmethod
+    def __patch_pickle__(filename: str, delta_filename: str, changed_keys: np.ndarray):
+        df = pd.read_pickle(filename)
+        keep = ~__in_sorted__(keys_of_ids(df["id"].tolist()), changed_keys)
+        pd.concat(
+            [df[keep], pd.read_pickle(delta_filename)], ignore_index=True
+        ).to_pickle(filename, protocol=5)
+
+    @staticmethod
+    def __patch_parquet__(filename: str, delta_filename: str, changed_keys: np.ndarray):
+        """Copies the row groups without the changed records and then the delta
+        without reading more than one row group at a time"""
+        # pyarrow is only needed for this output format
+        import pyarrow as pa  # type: ignore
+        import pyarrow.parquet as pq  # type: ignore
+
+        temporary_filename = f"{filename}.tmp"
+        old = pq.ParquetFile(filename)
+        delta = pq.ParquetFile(delta_filename)
+        with pq.ParquetWriter(temporary_filename, old.schema_arrow) as writer:
+            for index in range(old.num_row_groups):
+                row_group = old.read_row_group(index)
+                keys = keys_of_ids(row_group.column("id").to_pylist())
+                writer.write_table(
+                    row_group.filter(pa.array(~__in_sorted__(keys, changed_keys)))
+                )
+            for index in range(delta.num_row_groups):
+                writer.write_table(delta.read_row_group(index))
+        os.replace(temporary_filename, filename)
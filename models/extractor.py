@@ -1,13 +1,28 @@
 import logging
+import multiprocessing
 import os
 import time
-import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
 
-import pandas as pd
+import pandas as pd  # type: ignore
 from pydantic import BaseModel
 
 import config
-from models.swepub.article import SwepubArticle
+from helpers.caching import reset_review_queue_occurrences
+from models.checkpoint import Checkpoint, ReadPosition
+from models.column_accumulator import ColumnAccumulator
+from models.input_readers import input_reader_for, read_chunks
+from models.metrics import ProgressReporter, metrics
+from models.review_queue import review_queue
+from models.sharding import (
+    configure_worker,
+    export_settings,
+    parse_shard,
+    parse_shard_in_worker,
+)
+from models.swepub.projection import projection_of
 
 # This script is intended to be run on the WMC Kubernetes cluster
 
@@ -17,11 +32,16 @@ logger = logging.getLogger(__name__)
 class Extractor(BaseModel):
     """
     This class extracts from SwePub unspecified JSON into Python objects
-    and stores them in a dataframe and pickles it to disk
+    and stores them in a dataframe and pickles it to disk.
+    With output_format="parquet" the linked articles, contributors,
+    affiliations and subjects tables are streamed to parquet files instead
 
     The source file is huge. 1.3GB gzipped JSONL
     There are ~1.4M lines in total
 
+    The input can be the zipfile from SwePub, a .jsonl.gz, a .jsonl.zst
+    or a plain JSONL file
+
     Defaults to article_pickle_filename = "swepub.pkl.gz"
     """
 
@@ -30,131 +50,406 @@ class Extractor(BaseModel):
     affiliations_pickle_filename: str = "affiliations.pkl.gz"
     contributors_pickle_filename: str = "contributors.pkl.gz"
     subjects_pickle_filename: str = "subjects.pkl.gz"
+    article_parquet_filename: str = "articles.parquet"
+    affiliations_parquet_filename: str = "affiliations.parquet"
+    contributors_parquet_filename: str = "contributors.parquet"
+    subjects_parquet_filename: str = "subjects.parquet"
+    # Either "pickle" or "parquet"
+    output_format: str = "pickle"
+    # Pickle Arrow backed columns instead of Python objects.
+    # This needs pyarrow.
+    flat_export: bool = False
     stop_line_number: int = config.stop_line_number
     start_line_number: int = config.start_line_number
-    show_progress_every_x_line: int = 10
+    # Print the progress, throughput and time left at most this often
+    show_progress_every_x_seconds: float = 10
+    # Number of articles written as one parquet row group
+    # or joined into one dataframe of the pickle
+    batch_size: int = 10000
+    # More than one worker parses shards of lines in separate processes.
+    number_of_workers: int = config.number_of_workers
+    lines_per_shard: int = 5000
+    # Save a checkpoint every x lines to this file and resume from it
+    # on the next run. The output up to the checkpoint is flushed to part files.
+    checkpoint_filename: Optional[str] = config.checkpoint_filename
+    checkpoint_every_x_line: int = config.checkpoint_every_x_line
+    # Number of members of a zipfile that are decompressed at the same time
+    # and the number of chunks of lines each of them may read ahead
+    members_in_parallel: int = 2
+    read_ahead_chunks: int = 8
+    # Only parse and export these fields of the articles, e.g. ["id", "doi"].
+    # None parses what the parse_* settings in config ask for.
+    fields: Optional[List[str]] = None
+    # The counters and stage timings of the run are saved to this JSON file
+    metrics_filename: Optional[str] = config.metrics_filename
+    # Write the metrics in the Prometheus text format to this file
+    # on every progress report and/or serve them on this port
+    prometheus_filename: Optional[str] = config.prometheus_filename
+    prometheus_port: Optional[int] = config.prometheus_port
 
     def extract(self):
         if self.swepub_deduplicated_zipfile_path is None:
             raise ValueError("swepub_deduplicated_zipfile_path was None")
         if self.start_line_number > self.stop_line_number:
             raise ValueError("cannot begin higher than the stop line number")
+        if self.number_of_workers < 1:
+            raise ValueError("number_of_workers must be at least 1")
+        if self.output_format not in ("pickle", "parquet"):
+            raise ValueError(f"unsupported output format {self.output_format}")
+        # Fail on unknown fields before we start the workers
+        projection = projection_of(self.fields)
+        if self.number_of_workers > 1 and "object" in projection.fields:
+            raise ValueError(
+                "the object field can only be extracted with one worker, "
+                "the workers would have to pickle every article back"
+            )
         logger.info("Beginning extraction")
         start = time.time()
-        articles_df = pd.DataFrame()
-        # subjects_df = pd.DataFrame()
-        # contributors_df = pd.DataFrame()
-        # affiliations_df = pd.DataFrame()
-        # This probably read the whole thing into memory which is not ideal...
-        with zipfile.ZipFile(self.swepub_deduplicated_zipfile_path) as z:
-            for filename in z.namelist():
-                if not os.path.isdir(filename):
-                    # read the file
-                    with z.open(filename) as f:
-                        current_line_number = 1
-                        for line in f:
-                            # print(current_line_number)
-                            # print(line)
-                            if (
-                                current_line_number % self.show_progress_every_x_line
-                                == 0
-                            ):
-                                progress = round(
-                                    (current_line_number - self.start_line_number)
-                                    * 100
-                                    / (self.stop_line_number - self.start_line_number)
-                                )
-                                print(
-                                    f"count:{current_line_number} duration:{round(time.time() - start)}s "
-                                    f"start:{self.start_line_number} stop:{self.stop_line_number} "
-                                    f"progress{progress}%",
-                                    flush=True,
-                                )
-                            if current_line_number >= self.start_line_number:
-                                article: SwepubArticle = SwepubArticle(raw_data=line)
-                                df_article = article.export_dataframe()
-                                # if article.subjects is not None:
-                                #     df_subject = pd.DataFrame()
-                                #     for subject in article.subjects:
-                                #         df_subject = df_subject.append(
-                                #             subject.export_dataframe()
-                                #         )
-                                #     # add article id as index to all rows
-                                #     # https://www.geeksforgeeks.org/add-column-with-constant-value-to-pandas-dataframe/
-                                #     df_subject["id"] = pd.Series(
-                                #         [
-                                #             article.id
-                                #             for x in range(len(df_subject.index))
-                                #         ]
-                                #     )
-                                #     if config.loglevel == logging.DEBUG:
-                                #         print(df_subject.describe())
-                                #         exit()
-                                #     subjects_df = subjects_df.append(df_subject)
-                                # if article.contributors is not None:
-                                #     df_contributors = pd.DataFrame()
-                                #     for contributor in article.contributors:
-                                #         df_contributors = df_contributors.append(
-                                #             contributor.export_dataframe()
-                                #         )
-                                #         if contributor.affiliations is not None:
-                                #             df_affiliations = pd.DataFrame()
-                                #             for affiliation in contributor.affiliations:
-                                #                 df_affiliations = (
-                                #                     df_affiliations.append(
-                                #                         affiliation.export_dataframe()
-                                #                     )
-                                #                 )
-                                #             # add article id as index to all rows
-                                #             # https://www.geeksforgeeks.org/add-column-with-constant-value-to-pandas-dataframe/
-                                #             df_affiliations["id"] = pd.Series(
-                                #                 [
-                                #                     article.id
-                                #                     for x in range(
-                                #                         len(df_affiliations.index)
-                                #                     )
-                                #                 ]
-                                #             )
-                                #             if config.loglevel == logging.DEBUG:
-                                #                 print(df_affiliations.describe())
-                                #                 exit()
-                                #             affiliations_df = affiliations_df.append(
-                                #                 df_affiliations
-                                #             )
-                                #     # add article id as index to all rows
-                                #     # https://www.geeksforgeeks.org/add-column-with-constant-value-to-pandas-dataframe/
-                                #     df_contributors["id"] = pd.Series(
-                                #         [
-                                #             article.id
-                                #             for x in range(len(df_contributors.index))
-                                #         ]
-                                #     )
-                                #     if config.loglevel == logging.DEBUG:
-                                #         print(df_contributors.describe())
-                                #         exit()
-                                #     contributors_df = contributors_df.append(
-                                #         df_contributors
-                                #     )
-                                articles_df = pd.concat(
-                                    [articles_df, df_article], ignore_index=True
-                                )
-                            if current_line_number == self.stop_line_number:
-                                logger.warning("Reached stop line number")
-                                break
-                            current_line_number += 1
-        print(
-            f"starting to save article pickle {self.article_pickle_filename} now",
-            flush=True,
+        # Leave out what earlier extractions in this process collected
+        metrics.take()
+        checkpoint = self.__load_checkpoint__()
+        if config.lookup_topics_in_wd and checkpoint is None:
+            # The queued matches are ranked by how often they occur in this run
+            reset_review_queue_occurrences()
+        export = self.__export__()
+        output = self.__open_output__(
+            part_number=len(checkpoint.parts) if checkpoint is not None else None
         )
-        articles_df.to_pickle(self.article_pickle_filename, protocol=5)
-        print(f"saved to pickle {self.article_pickle_filename}", flush=True)
-        print(
-            f"starting to save subjects pickle {self.article_pickle_filename} now",
-            flush=True,
+        progress = ProgressReporter(
+            total_lines=self.stop_line_number
+            - max(
+                self.start_line_number,
+                checkpoint.position.line_number + 1 if checkpoint is not None else 0,
+            )
+            + 1,
+            interval_seconds=self.show_progress_every_x_seconds,
+            prometheus_filename=self.prometheus_filename,
+            prometheus_port=self.prometheus_port,
+        )
+        lines_since_checkpoint = 0
+        for columns, number_of_lines, position in self.__parse__(
+            export=export,
+            resume_from=checkpoint.position if checkpoint is not None else None,
+        ):
+            build_start = time.perf_counter()
+            output.add_columns(columns)
+            metrics.observe("build", time.perf_counter() - build_start)
+            metrics.count("lines", number_of_lines)
+            progress.update(number_of_lines)
+            lines_since_checkpoint += number_of_lines
+            if (
+                self.checkpoint_filename is not None
+                and lines_since_checkpoint >= self.checkpoint_every_x_line
+            ):
+                checkpoint = self.__save_checkpoint__(
+                    output=output,
+                    checkpoint=checkpoint,
+                    position=position,
+                    number_of_lines=lines_since_checkpoint,
+                )
+                output = self.__open_output__(part_number=len(checkpoint.parts))
+                lines_since_checkpoint = 0
+        self.__finish_output__(output=output, checkpoint=checkpoint)
+        progress.finish(
+            summary_filename=self.metrics_filename,
+            settings=self.model_dump(
+                include={
+                    "swepub_deduplicated_zipfile_path",
+                    "output_format",
+                    "flat_export",
+                    "start_line_number",
+                    "stop_line_number",
+                    "number_of_workers",
+                    "fields",
+                }
+            ),
         )
-        # subjects_df.to_pickle(self.subjects_pickle_filename, protocol=5)
-        # print(f"saved to pickle {self.subjects_pickle_filename}", flush=True)
-        # contributors_df.to_pickle(self.contributors_pickle_filename)
-        # affiliations_df.to_pickle(self.affiliations_pickle_filename)
         end = time.time()
         print(f"total duration: {round(end - start)}s")
+
+    def __iterate_lines__(
+        self,
+        position: ReadPosition,
+        resume_from: Optional[ReadPosition] = None,
+    ) -> Iterator[bytes]:
+        """Yields the lines between the start and stop line numbers
+        and keeps position updated with the line that was yielded last
+
+        The members are decompressed in background threads
+        so decompression overlaps with parsing"""
+        reader = input_reader_for(self.swepub_deduplicated_zipfile_path)
+        member = None
+        for chunk in read_chunks(
+            reader=reader,
+            resume_from=resume_from,
+            stop_line_number=self.stop_line_number,
+            members_in_parallel=self.members_in_parallel,
+            queue_size=self.read_ahead_chunks,
+        ):
+            if chunk.member != member:
+                member = chunk.member
+                position.member = member
+                if resume_from is not None and resume_from.member == member:
+                    print(
+                        f"resumed {member} at line {chunk.first_line_number}",
+                        flush=True,
+                    )
+            uncompressed_offset = chunk.uncompressed_offset
+            for current_line_number, line in enumerate(
+                chunk.lines, start=chunk.first_line_number
+            ):
+                uncompressed_offset += len(line)
+                if current_line_number >= self.start_line_number:
+                    position.line_number = current_line_number
+                    if self.checkpoint_filename is not None:
+                        position.uncompressed_offset = uncompressed_offset
+                        position.compressed_offset = chunk.compressed_offset
+                    yield line
+                if current_line_number == self.stop_line_number:
+                    logger.warning("Reached stop line number")
+
+    def __iterate_shards__(
+        self,
+        position: ReadPosition,
+        resume_from: Optional[ReadPosition] = None,
+    ) -> Iterator[List[bytes]]:
+        """Groups the lines into line range shards"""
+        shard = []
+        for line in self.__iterate_lines__(position=position, resume_from=resume_from):
+            shard.append(line)
+            if len(shard) == self.lines_per_shard:
+                yield shard
+                shard = []
+        if len(shard) > 0:
+            yield shard
+
+    def __parse__(
+        self,
+        export: str,
+        resume_from: Optional[ReadPosition] = None,
+    ) -> Iterator[Tuple[Dict[str, Any], int, ReadPosition]]:
+        """Parses the lines shard by shard and yields the columns of every shard
+        together with its number of lines and the position after it
+
+        With more than one worker the shards are parsed in a pool of worker processes.
+        The workers return one list per column and the batches are
+        yielded in the order of the shards so the result is deterministic"""
+        position = ReadPosition()
+        shards = self.__iterate_shards__(position=position, resume_from=resume_from)
+        # The matches that are queued for review are written once per shard
+        review_queue.collecting = True
+        try:
+            if self.number_of_workers == 1:
+                for shard in shards:
+                    columns = parse_shard(shard, export, fields=self.fields)
+                    review_queue.save()
+                    yield columns, len(shard), position.model_copy()
+                return
+            logger.info(f"Extracting using {self.number_of_workers} worker processes")
+            # The pool starts its workers on demand while the reader threads run.
+            # Forking a process with running threads can deadlock, so the
+            # workers are started by a fork server that has no threads.
+            with ProcessPoolExecutor(
+                max_workers=self.number_of_workers,
+                mp_context=multiprocessing.get_context(
+                    "forkserver"
+                    if "forkserver" in multiprocessing.get_all_start_methods()
+                    else "spawn"
+                ),
+                initializer=configure_worker,
+                initargs=(export_settings(),),
+            ) as executor:
+                # We limit the number of shards in flight to keep memory bounded
+                pending: Deque[Tuple[Future, int, ReadPosition]] = deque()
+                for shard in shards:
+                    pending.append(
+                        (
+                            executor.submit(
+                                parse_shard_in_worker, shard, export, fields=self.fields
+                            ),
+                            len(shard),
+                            position.model_copy(),
+                        )
+                    )
+                    if len(pending) >= 2 * self.number_of_workers:
+                        yield self.__collect_shard__(*pending.popleft())
+                while pending:
+                    yield self.__collect_shard__(*pending.popleft())
+        finally:
+            review_queue.collecting = False
+
+    @staticmethod
+    def __collect_shard__(
+        future: Future, number_of_lines: int, shard_position: ReadPosition
+    ) -> Tuple[Dict[str, Any], int, ReadPosition]:
+        """Adds up the metrics of a shard that a worker parsed
+        and saves the matches it queued for review in one transaction"""
+        columns, shard_metrics, queued_matches = future.result()
+        metrics.merge(shard_metrics)
+        review_queue.merge(queued_matches)
+        review_queue.save()
+        return columns, number_of_lines, shard_position
+
+    def __filenames__(self) -> Dict[str, str]:
+        """Returns the output filename of every table"""
+        if self.output_format == "parquet":
+            return dict(
+                articles=self.article_parquet_filename,
+                contributors=self.contributors_parquet_filename,
+                affiliations=self.affiliations_parquet_filename,
+                subjects=self.subjects_parquet_filename,
+            )
+        else:
+            return dict(articles=self.article_pickle_filename)
+
+    def __part_filenames__(self, part_number: Optional[int]) -> Dict[str, str]:
+        """Returns the filenames of a part or the final filenames if part_number is None"""
+        if part_number is None:
+            return self.__filenames__()
+        parts = {}
+        for table, filename in self.__filenames__().items():
+            # Keep the extensions last so pandas infers the compression
+            directory, basename = os.path.split(filename)
+            name, dot, extensions = basename.partition(".")
+            parts[table] = os.path.join(
+                directory, f"{name}.part{part_number:04d}{dot}{extensions}"
+            )
+        return parts
+
+    def __export__(self) -> str:
+        """Returns the name of the SwepubArticle export that the output needs"""
+        if self.output_format == "parquet":
+            return "normalized"
+        elif self.flat_export:
+            return "flat"
+        else:
+            return "dict"
+
+    def __open_output__(
+        self,
+        part_number: Optional[int] = None,
+        filenames: Optional[Dict[str, str]] = None,
+    ):
+        """Returns a ColumnAccumulator or a SwepubParquetWriter
+        that writes to the filenames of the part or the given filenames"""
+        if self.checkpoint_filename is not None and part_number is None:
+            part_number = 0
+        if self.output_format == "parquet":
+            # pyarrow is only needed for this output format
+            from models.parquet_writer import SwepubParquetWriter
+
+            return SwepubParquetWriter(
+                filenames=(
+                    filenames
+                    if filenames is not None
+                    else self.__part_filenames__(part_number)
+                ),
+                row_group_size=self.batch_size,
+            )
+        if self.flat_export:
+            # pyarrow is only needed for this export
+            from models.arrow_schemas import (
+                flat_article_schema,
+                flat_article_schema_with_raw_data,
+            )
+
+            return ColumnAccumulator(
+                batch_size=self.batch_size,
+                schema=(
+                    flat_article_schema_with_raw_data
+                    if config.keep_raw_data
+                    else flat_article_schema
+                ),
+            )
+        return ColumnAccumulator(batch_size=self.batch_size)
+
+    def __close_output__(self, output, filenames: Dict[str, str]):
+        if self.output_format == "parquet":
+            output.close()
+        else:
+            print(
+                f"starting to save article pickle {filenames['articles']} now",
+                flush=True,
+            )
+            build_start = time.perf_counter()
+            df = output.to_dataframe()
+            write_start = time.perf_counter()
+            metrics.observe("build", write_start - build_start)
+            df.to_pickle(filenames["articles"], protocol=5)
+            metrics.observe("write", time.perf_counter() - write_start)
+            print(f"saved to pickle {filenames['articles']}", flush=True)
+
+    def __load_checkpoint__(self) -> Optional[Checkpoint]:
+        if self.checkpoint_filename is None:
+            return None
+        checkpoint = Checkpoint.load(self.checkpoint_filename)
+        if checkpoint is None:
+            return None
+        if (
+            checkpoint.output_format != self.output_format
+            or checkpoint.flat_export != self.flat_export
+            or checkpoint.start_line_number != self.start_line_number
+            or checkpoint.stop_line_number != self.stop_line_number
+            or checkpoint.fields != self.fields
+        ):
+            raise ValueError(
+                f"the checkpoint {self.checkpoint_filename} belongs to an extraction "
+                f"with other settings, delete it to start over"
+            )
+        print(
+            f"resuming from checkpoint {self.checkpoint_filename} at "
+            f"line {checkpoint.position.line_number} of {checkpoint.position.member}",
+            flush=True,
+        )
+        return checkpoint
+
+    def __save_checkpoint__(
+        self,
+        output,
+        checkpoint: Optional[Checkpoint],
+        position: ReadPosition,
+        number_of_lines: int,
+    ) -> Checkpoint:
+        """Flush the output to a part file and record the position after it"""
+        parts = checkpoint.parts if checkpoint is not None else []
+        filenames = self.__part_filenames__(part_number=len(parts))
+        self.__close_output__(output=output, filenames=filenames)
+        checkpoint = Checkpoint(
+            position=position,
+            parts=parts + [filenames],
+            number_of_lines=number_of_lines
+            + (checkpoint.number_of_lines if checkpoint is not None else 0),
+            output_format=self.output_format,
+            flat_export=self.flat_export,
+            start_line_number=self.start_line_number,
+            stop_line_number=self.stop_line_number,
+            fields=self.fields,
+        )
+        checkpoint.save(self.checkpoint_filename)
+        return checkpoint
+
+    def __finish_output__(self, output, checkpoint: Optional[Checkpoint]):
+        """Write the final output, joining the parts if we checkpointed"""
+        if self.checkpoint_filename is None:
+            self.__close_output__(output=output, filenames=self.__filenames__())
+            return
+        parts = checkpoint.parts if checkpoint is not None else []
+        last_part = self.__part_filenames__(part_number=len(parts))
+        self.__close_output__(output=output, filenames=last_part)
+        parts = parts + [last_part]
+        print(f"joining {len(parts)} parts", flush=True)
+        for table, filename in self.__filenames__().items():
+            part_filenames = [part[table] for part in parts]
+            if self.output_format == "parquet":
+                from models.parquet_writer import join_parquet_files
+
+                join_parquet_files(filenames=part_filenames, filename=filename)
+            else:
+                pd.concat(
+                    [pd.read_pickle(part) for part in part_filenames],
+                    ignore_index=True,
+                ).to_pickle(filename, protocol=5)
+            for part_filename in part_filenames:
+                os.remove(part_filename)
+        os.remove(self.checkpoint_filename)
+        print(f"saved {list(self.__filenames__().values())}", flush=True)
@@ -0,0 +1,292 @@
+import gzip
+import logging
+import queue
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from typing import (
+    IO,
+    Callable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from models.checkpoint import ReadPosition
+from models.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# The decompressed bytes are split into lines in blocks of this size
+default_block_size = 1024 * 1024
+
+
+class InputReader:
+    """Opens the members of a SwePub dump.
+
+    A zipfile can hold many members, the other formats hold one
+    which is named after the file"""
+
+    # The file name endings this reader handles
+    suffixes: Tuple[str, ...] = ()
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def members(self) -> List[str]:
+        return [self.path]
+
+    @contextmanager
+    def open(
+        self, member: str
+    ) -> Iterator[Tuple[IO[bytes], Callable[[], Optional[int]]]]:
+        """Yields the decompressed member and a function that returns
+        how many compressed bytes were consumed so far"""
+        raise NotImplementedError()
+
+
+class ZipReader(InputReader):
+    suffixes = (".zip",)
+
+    def members(self) -> List[str]:
+        with zipfile.ZipFile(self.path) as z:
+            return [name for name in z.namelist() if not name.endswith("/")]
+
+    @contextmanager
+    def open(self, member: str):
+        # Every member gets its own handle so they can be read concurrently
+        with zipfile.ZipFile(self.path) as z, z.open(member) as f:
+
+            def compressed_offset() -> Optional[int]:
+                # zipfile has no public API for this
+                try:
+                    return f._orig_compress_size - f._compress_left
+                except AttributeError:
+                    return None
+
+            yield f, compressed_offset
+
+
+class GzipReader(InputReader):
+    suffixes = (".gz",)
+
+    @contextmanager
+    def open(self, member: str):
+        with open(self.path, "rb") as raw, gzip.GzipFile(fileobj=raw) as f:
+            yield f, raw.tell
+
+
+class ZstdReader(InputReader):
+    suffixes = (".zst", ".zstd")
+
+    @contextmanager
+    def open(self, member: str):
+        # zstandard is only needed for this format
+        import zstandard  # type: ignore
+
+        with open(self.path, "rb") as raw, zstandard.ZstdDecompressor().stream_reader(
+            raw, read_across_frames=True
+        ) as f:
+            yield f, raw.tell
+
+
+class JsonlReader(InputReader):
+    suffixes = (".jsonl", ".json", ".ndjson")
+
+    @contextmanager
+    def open(self, member: str):
+        with open(self.path, "rb") as f:
+            yield f, f.tell
+
+
+readers: List[Type[InputReader]] = [ZipReader, GzipReader, ZstdReader, JsonlReader]
+
+
+def input_reader_for(path: str) -> InputReader:
+    """Returns the reader that handles the file name ending of path.
+    Unknown endings are read as plain JSONL"""
+    for reader in readers:
+        if path.lower().endswith(reader.suffixes):
+            return reader(path)
+    logger.warning(f"Unknown file name ending of {path}, reading it as plain JSONL")
+    return JsonlReader(path)
+
+
+class Chunk(NamedTuple):
+    """Consecutive lines of a member"""
+
+    member: str
+    lines: List[bytes]
+    # The number of the first line in the member
+    first_line_number: int
+    # Offset in the decompressed member of the first line
+    uncompressed_offset: int
+    # Compressed bytes consumed when the chunk was read, for information only
+    compressed_offset: Optional[int]
+
+
+# Marks the end of a member in its queue
+end_of_member = None
+
+
+class MemberDecompressor(threading.Thread):
+    """Decompresses one member in the background and puts chunks
+    of its lines on a bounded queue.
+
+    zlib and zstd release the GIL while they decompress so this overlaps
+    with parsing in the main thread. The queue keeps memory bounded when
+    the parser is slower than the decompression"""
+
+    def __init__(
+        self,
+        reader: InputReader,
+        member: str,
+        stop: threading.Event,
+        queue_size: int,
+        block_size: int,
+        resume_from: Optional[ReadPosition] = None,
+        stop_line_number: Optional[int] = None,
+    ):
+        super().__init__(name=f"decompress {member}", daemon=True)
+        self.reader = reader
+        self.member = member
+        self.stop = stop
+        self.queue: "queue.Queue[Union[Chunk, BaseException, None]]" = queue.Queue(
+            maxsize=queue_size
+        )
+        self.block_size = block_size
+        self.resume_from = resume_from
+        self.stop_line_number = stop_line_number
+
+    def __put__(self, item: Union[Chunk, BaseException, None]) -> bool:
+        """Waits for room in the queue. Returns False if we were stopped"""
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        try:
+            self.__decompress__()
+        except BaseException as e:
+            self.__put__(e)
+        self.__put__(end_of_member)
+
+    def __decompress__(self):
+        line_number = 1
+        offset = 0
+        with self.reader.open(self.member) as (f, compressed_offset):
+            if self.resume_from is not None:
+                # Seeking decompresses the prefix in C without
+                # splitting it into lines
+                f.seek(self.resume_from.uncompressed_offset)
+                line_number = self.resume_from.line_number + 1
+                offset = self.resume_from.uncompressed_offset
+            rest = b""
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                block = f.read(self.block_size)
+                metrics.observe("decompress", time.perf_counter() - start)
+                if not block:
+                    lines = [rest] if rest else []
+                else:
+                    lines = (rest + block).split(b"\n")
+                    rest = lines.pop()
+                    lines = [line + b"\n" for line in lines]
+                if self.stop_line_number is not None:
+                    lines = lines[: max(0, self.stop_line_number - line_number + 1)]
+                if lines:
+                    chunk = Chunk(
+                        member=self.member,
+                        lines=lines,
+                        first_line_number=line_number,
+                        uncompressed_offset=offset,
+                        compressed_offset=compressed_offset(),
+                    )
+                    if not self.__put__(chunk):
+                        return
+                    line_number += len(lines)
+                    offset += sum(map(len, lines))
+                if not block or (
+                    self.stop_line_number is not None
+                    and line_number > self.stop_line_number
+                ):
+                    return
+
+
+def read_chunks(
+    reader: InputReader,
+    resume_from: Optional[ReadPosition] = None,
+    stop_line_number: Optional[int] = None,
+    members_in_parallel: int = 2,
+    queue_size: int = 8,
+    block_size: int = default_block_size,
+) -> Iterator[Chunk]:
+    """Yields the chunks of all members in order.
+
+    Up to members_in_parallel members are decompressed at the same time,
+    each in its own thread with a queue of at most queue_size chunks.
+    Every member stops after stop_line_number lines.
+    When resuming, the members before the one in resume_from are skipped"""
+    if members_in_parallel < 1:
+        raise ValueError("members_in_parallel must be at least 1")
+    if queue_size < 1:
+        raise ValueError("queue_size must be at least 1")
+    members = reader.members()
+    if resume_from is not None and resume_from.member is not None:
+        if resume_from.member not in members:
+            raise ValueError(
+                f"{resume_from.member} to resume from is not in {reader.path}"
+            )
+        skipped = members.index(resume_from.member)
+        for member in members[:skipped]:
+            logger.info(f"Skipping {member} which was already extracted")
+        members = members[skipped:]
+    stop = threading.Event()
+    decompressors: List[MemberDecompressor] = []
+
+    def start_next():
+        member = members[len(decompressors)]
+        decompressor = MemberDecompressor(
+            reader=reader,
+            member=member,
+            stop=stop,
+            queue_size=queue_size,
+            block_size=block_size,
+            resume_from=(
+                resume_from
+                if resume_from is not None and resume_from.member == member
+                else None
+            ),
+            stop_line_number=stop_line_number,
+        )
+        decompressor.start()
+        decompressors.append(decompressor)
+
+    try:
+        for _ in range(min(members_in_parallel, len(members))):
+            start_next()
+        for index in range(len(members)):
+            decompressor = decompressors[index]
+            while True:
+                item = decompressor.queue.get()
+                if item is end_of_member:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+            if len(decompressors) < len(members):
+                start_next()
+    finally:
+        # Also when the consumer stops early
+        stop.set()
+        for decompressor in decompressors:
+            decompressor.join()
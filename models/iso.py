@@ -1,74 +1,144 @@
 import logging
+import threading
+import time
+from typing import Optional
 
-from cache_to_disk import cache_to_disk  # type: ignore
-from wikibaseintegrator import WikibaseIntegrator, wbi_config  # type: ignore
-from wikibaseintegrator.wbi_helpers import execute_sparql_query  # type: ignore
+from wikibaseintegrator import wbi_config  # type: ignore
 
 import config
-from helpers.wdqs import extract_the_first_wikibase_value_from_a_wdqs_result_set
+from helpers.caching import add_language, read_language
+from models.language_registry import language_registry
+from models.language_resolver import LanguageResolver
+from models.metrics import metrics
 
 wbi_config.config["USER_AGENT"] = config.user_agent
 logger = logging.getLogger(__name__)
 
+# Lookups while parsing give up quickly so an offline run doesn't hang
+lookup_max_retries = 2
+lookup_retry_after_seconds = 1
+# Set when a lookup failed, the other codes then use the table
+wikidata_unreachable = threading.Event()
+
 
 class IsoThreeLetterLanguageCode:
-    """Official ISO 639-2 support"""
+    """Official ISO 639-2 support
+
+    There is only one shared immutable object per code and class in a process.
+    The QID and label are taken from the offline language table.
+    With lookup_languages_in_wd Wikidata is asked about the codes that
+    have no QID in it and the answers are kept in the SQLite cache.
+    resolve-languages.py resolves all codes of the dump in a few batched requests"""
 
     code: str = None
-    # We use str instead of LanguageValue here to enable
-    # caching to disk using a decorator
+    # We use str instead of LanguageValue here
     label: str = None
     wikidata_qid: str = None
+    frozen: bool = False
+
+    def __new__(cls, code: str = None):
+        if code is None:
+            # Needed when unpickling objects from before the interning
+            return super().__new__(cls)
+        # Every subclass gets its own dictionary of interned objects
+        instances = cls.__dict__.get("__instances__")
+        if instances is None:
+            instances = {}
+            setattr(cls, "__instances__", instances)
+        instance = instances.get(code)
+        if instance is None:
+            instance = super().__new__(cls)
+            instances[code] = instance
+        return instance
 
     def __init__(self, code: str):
         if code is None:
             raise ValueError("code was None")
+        if self.frozen:
+            # This is an interned object that is already set up
+            return
+        self.code = code
+        entry = language_registry.get(code)
+        if entry is not None and entry[0] is not None:
+            self.wikidata_qid, self.label = entry
+        elif config.lookup_languages_in_wd:
+            # This only happens once per code and process. Afterwards
+            # the code is in the SQLite cache.
+            start = time.perf_counter()
+            self.__lookup_label__(table_label=entry[1] if entry is not None else None)
+            metrics.observe("lookup", time.perf_counter() - start)
+        elif entry is not None and entry[1] is not None:
+            self.label = entry[1]
         else:
-            self.code = code
-            if config.lookup_languages_in_wd:
-                self.__lookup_label__()
-            else:
-                self.label = f"code: {self.code} has not been looked up"
-
-    @cache_to_disk(50)
-    def __run_wdqs_query__(self, code: str = None):
-        """Looks up the code in WD using P219 and SPARQL"""
-        logger.info(f"Running sparql query for code. {code}")
-        return execute_sparql_query(
-            f"""
-            SELECT ?item 
-            WHERE 
-            {{
-              ?item wdt:P219 "{code}".
-            }}
-            """
+            self.label = f"code: {self.code} has not been looked up"
+        self.frozen = True
+
+    def __setattr__(self, key, value):
+        if self.frozen:
+            raise AttributeError(f"language objects are immutable, got {key}")
+        super().__setattr__(key, value)
+
+    def __reduce__(self):
+        return self.__class__.__from_values__, (
+            self.code,
+            self.wikidata_qid,
+            self.label,
         )
 
-    @cache_to_disk(50)
-    def __lookup_label_using_wbi__(self, item: str = None):
-        if item is None:
-            raise ValueError("item was None")
-        wbi = WikibaseIntegrator(login=None)
-        # For now we only get the English label and toss out the rest
-        label = wbi.item.get(item).labels.get("en").value
-        return label
-
-    def __lookup_label__(self):
-        """Calls functions to look up the label using WD"""
+    @classmethod
+    def __from_values__(cls, code: str, wikidata_qid: str, label: str):
+        """Returns the interned object for the code without any lookups"""
+        instance = cls.__new__(cls, code)
+        if not instance.frozen:
+            instance.code = code
+            instance.wikidata_qid = wikidata_qid
+            instance.label = label
+            instance.frozen = True
+        return instance
+
+    def __lookup_label__(self, table_label: Optional[str] = None):
+        """Looks up the QID and label of the code in WD
+
+        The result is kept in the SQLite cache, not in the shipped table,
+        so the next run and the other workers find it there.
+        If Wikidata cannot be reached we use the label of the table
+        and stop asking for the rest of the process"""
         if self.code is None:
             raise ValueError("self.code was None")
-        # First we find the QID of the language by using SPARQL
-        item = None
-        result = self.__run_wdqs_query__(code=self.code)
-        logger.debug(self.__lookup_label_using_wbi__.cache_info())
-        if result is not None:
-            logger.debug(f"wbi result:{result}")
-            self.wikidata_qid = extract_the_first_wikibase_value_from_a_wdqs_result_set(
-                json=result, sparql_variable="item"
+        not_looked_up = (
+            table_label
+            if table_label is not None
+            else f"code: {self.code} has not been looked up"
+        )
+        cached = read_language(self.code)
+        if cached is not None:
+            self.wikidata_qid, self.label = cached
+            return
+        if wikidata_unreachable.is_set():
+            self.label = not_looked_up
+            return
+        try:
+            resolved = (
+                LanguageResolver(
+                    max_retries=lookup_max_retries,
+                    retry_after_seconds=lookup_retry_after_seconds,
+                )
+                .resolve([self.code])
+                .get(self.code)
+            )
+        except Exception as error:
+            logger.error(
+                f"Could not look up the language code '{self.code}' in Wikidata, "
+                f"using the language table for the rest of the extraction: {error}"
             )
-        if self.wikidata_qid is not None:
-            self.label = self.__lookup_label_using_wbi__(item=self.wikidata_qid)
-            logger.debug(self.__lookup_label_using_wbi__.cache_info())
+            wikidata_unreachable.set()
+            self.label = not_looked_up
+            return
+        if resolved is not None:
+            self.wikidata_qid = resolved[0]
+            self.label = resolved[1] if resolved[1] is not None else table_label
+        elif table_label is not None:
+            self.label = table_label
         else:
             # Hardcode workaround for issue #4
             if self.code == "ger":
@@ -83,6 +153,7 @@ class IsoThreeLetterLanguageCode:
                     f"falling back to 'undetermined'"
                 )
                 self.label = "Undetermined"
+        add_language(self.code, self.wikidata_qid, self.label)
 
     def __str__(self):
         return f"{self.label}"
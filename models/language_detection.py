@@ -0,0 +1,217 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd  # type: ignore
+from pydantic import BaseModel
+
+import config
+from helpers.caching import add_many_abstract_languages, read_abstract_languages
+
+logger = logging.getLogger(__name__)
+
+# A detector returns the ISO 639-1 code of the language of a text
+# or None if it cannot tell
+Detector = Callable[[str], Optional[str]]
+
+
+def __langdetect__(seed: Optional[int]) -> Detector:
+    from langdetect import DetectorFactory, LangDetectException, detect
+
+    # langdetect picks random samples of the text. With a seed every text
+    # gets the same language every time, independent of the order.
+    DetectorFactory.seed = seed
+
+    def detect_language(text: str) -> Optional[str]:
+        try:
+            return detect(text)
+        except LangDetectException:
+            logger.error(f"Could not detect language for summary: {text}")
+            return None
+
+    return detect_language
+
+
+def __py3langid__(seed: Optional[int]) -> Detector:
+    # py3langid is only needed for this backend. It is deterministic.
+    import py3langid  # type: ignore
+
+    return lambda text: py3langid.classify(text)[0]
+
+
+def __lingua__(seed: Optional[int]) -> Detector:
+    # lingua is only needed for this backend. It is deterministic.
+    from lingua import LanguageDetectorBuilder  # type: ignore
+
+    detector = LanguageDetectorBuilder.from_all_languages().build()
+
+    def detect_language(text: str) -> Optional[str]:
+        language = detector.detect_language_of(text)
+        return language.iso_code_639_1.name.lower() if language is not None else None
+
+    return detect_language
+
+
+# The detector backends by name. Each takes the seed and returns a detector.
+detector_backends: Dict[str, Callable[[Optional[int]], Detector]] = dict(
+    langdetect=__langdetect__,
+    py3langid=__py3langid__,
+    lingua=__lingua__,
+)
+
+
+def register_detector(name: str, backend: Callable[[Optional[int]], Detector]):
+    """Adds a detector backend. Register it when your module is imported
+    so the worker processes have it too"""
+    detector_backends[name] = backend
+
+
+def detector_for(backend: str, seed: Optional[int] = None) -> Detector:
+    if backend not in detector_backends:
+        raise ValueError(
+            f"unknown language detector {backend}, "
+            f"choose one of {list(detector_backends)}"
+        )
+    return detector_backends[backend](seed)
+
+
+# These run in the worker processes of the detection.
+# The detector of each process is set up once.
+__detectors__: Dict[str, Detector] = {}
+
+
+def configure_worker(backend: str, seed: Optional[int]):
+    __detectors__[backend] = detector_for(backend, seed=seed)
+
+
+def detect_batch(backend: str, texts: List[str]) -> List[Optional[str]]:
+    detect_language = __detectors__[backend]
+    return [detect_language(text) for text in texts]
+
+
+def detect_language_of(text: str) -> Optional[str]:
+    """Detects the language of one text with the backend and seed in config.
+    Used when detecting while parsing"""
+    if config.language_detection_backend not in __detectors__:
+        __detectors__[config.language_detection_backend] = detector_for(
+            config.language_detection_backend, seed=config.language_detection_seed
+        )
+    return __detectors__[config.language_detection_backend](text)
+
+
+def hash_of(text: str) -> bytes:
+    """Returns the key of the text in the cache"""
+    return blake2b(text.encode(), digest_size=16).digest()
+
+
+class LanguageDetector(BaseModel):
+    """Detects the language of many abstracts after parsing instead of
+    once per article during parsing.
+
+    Every distinct text is detected once. The texts are sent in batches
+    to a pool of worker processes. The results are stored in the SQLite
+    cache by the hash of the text so the next run only detects
+    the abstracts that are new or changed.
+
+    With a seed langdetect returns the same language for a text every time.
+    Without it the language of short or mixed texts can differ between runs"""
+
+    backend: str = config.language_detection_backend
+    seed: Optional[int] = config.language_detection_seed
+    number_of_workers: int = config.number_of_workers
+    batch_size: int = 1000
+    use_cache: bool = True
+    show_progress_every_x_batch: int = 10
+
+    def detect(self, texts: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """Returns the language of every text, None for missing or empty texts"""
+        if self.number_of_workers < 1:
+            raise ValueError("number_of_workers must be at least 1")
+        if self.batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if self.backend not in detector_backends:
+            raise ValueError(
+                f"unknown language detector {self.backend}, "
+                f"choose one of {list(detector_backends)}"
+            )
+        start = time.time()
+        hashes: List[Optional[bytes]] = []
+        # dict deduplicates and keeps the order
+        distinct: Dict[bytes, str] = {}
+        for text in texts:
+            if not isinstance(text, str) or len(text.strip()) == 0:
+                hashes.append(None)
+                continue
+            hash = hash_of(text)
+            hashes.append(hash)
+            distinct.setdefault(hash, text)
+        languages = (
+            read_abstract_languages(self.backend, distinct) if self.use_cache else {}
+        )
+        pending = [
+            (hash, text) for hash, text in distinct.items() if hash not in languages
+        ]
+        print(
+            f"detecting the language of {len(pending)} distinct abstracts, "
+            f"{len(distinct) - len(pending)} are already in the cache",
+            flush=True,
+        )
+        for rows in self.__detect_all__(pending, start=start):
+            languages.update(rows)
+            if self.use_cache:
+                add_many_abstract_languages(self.backend, rows)
+        print(f"detected in {round(time.time() - start)}s", flush=True)
+        return [languages[hash] if hash is not None else None for hash in hashes]
+
+    def __detect_all__(
+        self, pending: List[Tuple[bytes, str]], start: float
+    ) -> Iterable[List[Tuple[bytes, Optional[str]]]]:
+        """Yields the hashes and languages batch by batch"""
+        batches = [
+            pending[index : index + self.batch_size]
+            for index in range(0, len(pending), self.batch_size)
+        ]
+        if len(batches) == 0:
+            return
+        texts = ([text for _, text in batch] for batch in batches)
+        if self.number_of_workers == 1:
+            configure_worker(self.backend, self.seed)
+            results: Iterable[List[Optional[str]]] = (
+                detect_batch(self.backend, batch) for batch in texts
+            )
+            executor = None
+        else:
+            logger.info(f"Detecting using {self.number_of_workers} worker processes")
+            executor = ProcessPoolExecutor(
+                max_workers=self.number_of_workers,
+                initializer=configure_worker,
+                initargs=(self.backend, self.seed),
+            )
+            # map keeps the order of the batches
+            results = executor.map(detect_batch, (self.backend for _ in batches), texts)
+        try:
+            for number, (batch, languages) in enumerate(zip(batches, results), start=1):
+                yield [
+                    (hash, language) for (hash, _), language in zip(batch, languages)
+                ]
+                if number % self.show_progress_every_x_batch == 0:
+                    print(
+                        f"batch:{number} of {len(batches)} "
+                        f"duration:{round(time.time() - start)}s",
+                        flush=True,
+                    )
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def detect_articles(
+        self,
+        articles: pd.DataFrame,
+        column: str = "first_abstract",
+        target: str = "detected_abstract_language",
+    ) -> pd.DataFrame:
+        """Sets the target column to the language of the text in column"""
+        articles[target] = self.detect(articles[column].tolist())
+        return articles
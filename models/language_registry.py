@@ -0,0 +1,84 @@
+import csv
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+default_table_path = Path(__file__).parent.parent / "data" / "iso_639_2_languages.tsv"
+
+
+class LanguageRegistry:
+    """Offline table of ISO 639-2 code -> (Wikidata QID, English label)
+
+    The table is loaded once per process so that looking up
+    a code is a dictionary hit without any disk or network I/O.
+    Refresh it with refresh-language-table.py"""
+
+    table_path: Path
+    entries: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None
+    # The entries that were added or replaced since the table was loaded
+    changed: Dict[str, Tuple[Optional[str], Optional[str]]]
+
+    def __init__(self, table_path: Path = default_table_path):
+        self.table_path = table_path
+        self.changed = {}
+
+    def __read__(self) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        entries: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        if not self.table_path.exists():
+            logger.warning(f"Language table {self.table_path} not found")
+            return entries
+        with open(self.table_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                entries[row["code"]] = (row["qid"] or None, row["label"] or None)
+        return entries
+
+    def __load__(self):
+        self.entries = self.__read__()
+        logger.info(f"Loaded {len(self.entries)} languages from {self.table_path}")
+
+    def get(self, code: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """Returns (qid, label) or None if the code is not in the table"""
+        if self.entries is None:
+            self.__load__()
+        return self.entries.get(code)
+
+    def codes(self) -> List[str]:
+        """Returns the codes in the table"""
+        if self.entries is None:
+            self.__load__()
+        return sorted(self.entries)
+
+    def update(self, entries: Iterable[Tuple[str, Optional[str], Optional[str]]]):
+        """Add or replace (code, qid, label) entries in memory"""
+        if self.entries is None:
+            self.__load__()
+        for code, qid, label in entries:
+            self.entries[code] = (qid, label)
+            self.changed[code] = (qid, label)
+
+    def save(self):
+        """Write the changed entries to the table sorted by code
+
+        The table is read again first so that the entries another process
+        saved in the meantime are kept, and it is replaced in one step
+        so that no process ever reads half a table"""
+        if self.entries is None:
+            self.__load__()
+        self.entries = {**self.__read__(), **self.changed}
+        temporary_path = f"{self.table_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+            writer.writerow(["code", "qid", "label"])
+            for code in sorted(self.entries):
+                qid, label = self.entries[code]
+                writer.writerow([code, qid or "", label or ""])
+        os.replace(temporary_path, self.table_path)
+        self.changed = {}
+        logger.info(f"Saved {len(self.entries)} languages to {self.table_path}")
+
+
+# Shared by all language objects in this process
+language_registry = LanguageRegistry()
@@ -0,0 +1,138 @@
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+from wikibaseintegrator.wbi_helpers import (  # type: ignore
+    execute_sparql_query,
+    mediawiki_api_call_helper,
+)
+
+import config
+from models.language_registry import LanguageRegistry, language_registry
+
+logger = logging.getLogger(__name__)
+
+
+def batches(values: List[str], size: int) -> Iterable[List[str]]:
+    for index in range(0, len(values), size):
+        yield values[index : index + size]
+
+
+def language_codes_in_record(record: Any) -> Iterator[str]:
+    """Yields every language code in a decoded record
+
+    That is the languages of the work, the subjects and the affiliations"""
+
+    def __affiliation_codes__(affiliations: List[Any]) -> Iterator[str]:
+        for affiliation in affiliations:
+            if "code" in affiliation.get("language", {}):
+                yield affiliation["language"]["code"]
+            yield from __affiliation_codes__(affiliation.get("hasAffiliation", []))
+
+    instance_of = record.get("master", {}).get("instanceOf", {})
+    for language in instance_of.get("language", []):
+        if "code" in language:
+            yield language["code"]
+    for subject in instance_of.get("subject", []):
+        if "code" in subject.get("language", {}):
+            yield subject["language"]["code"]
+    for contribution in instance_of.get("contribution", []):
+        yield from __affiliation_codes__([contribution.get("agent", {})])
+        yield from __affiliation_codes__(contribution.get("hasAffiliation", []))
+
+
+class LanguageResolver(BaseModel):
+    """Resolves many ISO 639-2 codes to QIDs and English labels at once
+
+    The codes are sent in VALUES batches to the query service
+    and the labels are fetched with wbgetentities for up to 50 items
+    per call instead of one query and one full item per code.
+    The results are written to the language registry"""
+
+    sparql_endpoint: str = "https://query.wikidata.org/sparql"
+    api_url: str = "https://www.wikidata.org/w/api.php"
+    codes_per_query: int = 200
+    # wbgetentities accepts at most 50 ids per call without the apihighlimits right
+    ids_per_call: int = 50
+    # How often WBI tries again when the service is unreachable or busy
+    max_retries: int = 1000
+    retry_after_seconds: int = 60
+
+    def resolve(
+        self, codes: Iterable[str], registry: LanguageRegistry = language_registry
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Looks up the codes and updates the registry in memory.
+
+        Returns code -> (qid, label) of the codes that were found in Wikidata"""
+        codes = sorted(set(codes))
+        qids = self.__lookup_qids__(codes)
+        labels = self.__lookup_labels__(sorted(set(qids.values())))
+        resolved = {code: (qid, labels.get(qid)) for code, qid in qids.items()}
+        registry.update((code, qid, label) for code, (qid, label) in resolved.items())
+        logger.info(f"Resolved {len(resolved)} of {len(codes)} language codes")
+        return resolved
+
+    def resolve_missing(
+        self, codes: Iterable[str], registry: LanguageRegistry = language_registry
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Resolves only the codes that have no QID in the registry"""
+        missing: Set[str] = set()
+        for code in codes:
+            entry = registry.get(code)
+            if entry is None or entry[0] is None:
+                missing.add(code)
+        if len(missing) == 0:
+            return {}
+        return self.resolve(missing, registry=registry)
+
+    def __lookup_qids__(self, codes: List[str]) -> Dict[str, str]:
+        qids: Dict[str, str] = {}
+        for batch in batches(codes, self.codes_per_query):
+            values = " ".join(f'"{code}"' for code in batch)
+            result = execute_sparql_query(
+                f"""
+                SELECT ?code ?item
+                WHERE
+                {{
+                  VALUES ?code {{ {values} }}
+                  ?item wdt:P219 ?code.
+                }}
+                """,
+                endpoint=self.sparql_endpoint,
+                user_agent=config.user_agent,
+                max_retries=self.max_retries,
+                retry_after=self.retry_after_seconds,
+            )
+            for binding in result["results"]["bindings"]:
+                code = binding["code"]["value"]
+                qid = binding["item"]["value"].replace(config.wd_prefix, "")
+                # Some codes are on more than one item. We keep the lowest QID
+                # like refresh-language-table.py does.
+                if code in qids and int(qids[code][1:]) < int(qid[1:]):
+                    continue
+                qids[code] = qid
+        return qids
+
+    def __lookup_labels__(self, qids: List[str]) -> Dict[str, str]:
+        labels: Dict[str, str] = {}
+        for batch in batches(qids, self.ids_per_call):
+            result = mediawiki_api_call_helper(
+                data={
+                    "action": "wbgetentities",
+                    "ids": "|".join(batch),
+                    "props": "labels",
+                    # For now we only get the English label
+                    "languages": "en",
+                    "format": "json",
+                },
+                mediawiki_api_url=self.api_url,
+                user_agent=config.user_agent,
+                allow_anonymous=True,
+                max_retries=self.max_retries,
+                retry_after=self.retry_after_seconds,
+            )
+            for qid, entity in result["entities"].items():
+                label = entity.get("labels", {}).get("en")
+                if label is not None:
+                    labels[qid] = label["value"]
+        return labels
@@ -0,0 +1,273 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# The stages of an extraction that are timed.
+# parse includes lookup because the lookups happen while parsing.
+stages = ("decompress", "decode", "parse", "lookup", "build", "write")
+# The upper bounds in seconds of the buckets of the stage histograms
+bucket_bounds = (1e-5, 1e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0, 100.0)
+counter_names = ("lines", "articles", "subjects", "contributors", "affiliations")
+
+
+class Histogram:
+    """Counts durations in buckets with fixed bounds.
+    Histograms with the same bounds can be added up across processes"""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        # The last bucket counts everything above the last bound
+        self.counts: List[int] = [0] * (len(bucket_bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(bucket_bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def merge(self, other: "Histogram"):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns the upper bound of the bucket that holds the quantile"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(bucket_bounds, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            count=self.count,
+            seconds=self.sum,
+            mean_seconds=self.sum / self.count if self.count > 0 else None,
+            p50_seconds_at_most=self.quantile(0.5),
+            p99_seconds_at_most=self.quantile(0.99),
+            buckets={
+                str(bound): count
+                for bound, count in zip(bucket_bounds + ("+Inf",), self.counts)
+            },
+        )
+
+
+class Metrics:
+    """Counters and stage timings of an extraction.
+
+    Every process has its own. The workers send theirs back
+    with every shard and the parent adds them up"""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = dict.fromkeys(counter_names, 0)
+        self.histograms: Dict[str, Histogram] = {stage: Histogram() for stage in stages}
+        # Set while profiling, every record is timed when it is not None
+        self.slowest_records: Optional["SlowestRecords"] = None
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage: str, seconds: float):
+        self.histograms[stage].observe(seconds)
+
+    def merge(self, other: "Metrics"):
+        for name, value in other.counters.items():
+            if value != 0:
+                self.count(name, value)
+        for stage, histogram in other.histograms.items():
+            # Skipping empty ones leaves the decompress thread alone
+            if histogram.count > 0:
+                self.histograms[stage].merge(histogram)
+
+    def take(self) -> "Metrics":
+        """Returns what was collected so far and starts over"""
+        taken = Metrics()
+        taken.counters, self.counters = self.counters, taken.counters
+        taken.histograms, self.histograms = self.histograms, taken.histograms
+        return taken
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            counters=dict(self.counters),
+            stages={
+                stage: histogram.to_dict()
+                for stage, histogram in self.histograms.items()
+            },
+        )
+
+    def to_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Returns the metrics in the Prometheus text format"""
+        lines = []
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE swepub_{name}_total counter")
+            lines.append(f"swepub_{name}_total {value}")
+        lines.append("# HELP swepub_stage_seconds Time spent in each stage")
+        lines.append("# TYPE swepub_stage_seconds histogram")
+        for stage, histogram in self.histograms.items():
+            cumulative = 0
+            for bound, count in zip(bucket_bounds + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'swepub_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(f'swepub_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(
+                f'swepub_stage_seconds_count{{stage="{stage}"}} {histogram.count}'
+            )
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE swepub_{name} gauge")
+            lines.append(f"swepub_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class SlowestRecords:
+    """Keeps the records that took the longest to parse"""
+
+    def __init__(self, size: int):
+        self.size = size
+        # A min heap so the fastest of the slowest is replaced first.
+        # The counter breaks ties without comparing the records.
+        self.heap: List[Any] = []
+        self.added = 0
+
+    def add(self, seconds: float, record: Dict[str, Any]):
+        self.added += 1
+        item = (seconds, self.added, record)
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, item)
+        elif seconds > self.heap[0][0]:
+            heapq.heapreplace(self.heap, item)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [
+            dict(seconds=seconds, **record)
+            for seconds, _, record in sorted(self.heap, reverse=True)
+        ]
+
+
+# Shared by everything in this process
+metrics = Metrics()
+
+
+class ProgressReporter:
+    """Prints the progress at most every interval seconds
+    with the throughput and an estimate of the time left.
+
+    With a prometheus_filename the metrics are written there on every
+    report for the textfile collector of the node exporter. With a
+    prometheus_port they are served over HTTP for scraping"""
+
+    def __init__(
+        self,
+        total_lines: Optional[int],
+        interval_seconds: float = 10.0,
+        prometheus_filename: Optional[str] = None,
+        prometheus_port: Optional[int] = None,
+    ):
+        self.total_lines = total_lines
+        self.interval_seconds = interval_seconds
+        self.prometheus_filename = prometheus_filename
+        self.start = time.monotonic()
+        self.reported = self.start
+        self.lines = 0
+        self.server: Optional[ThreadingHTTPServer] = None
+        if prometheus_port is not None:
+            self.server = self.__serve__(prometheus_port)
+
+    def update(self, lines: int):
+        self.lines += lines
+        now = time.monotonic()
+        if now - self.reported < self.interval_seconds:
+            return
+        self.reported = now
+        gauges = self.gauges()
+        message = (
+            f"lines:{self.lines} duration:{round(now - self.start)}s "
+            f"lines/s:{round(gauges['lines_per_second'])}"
+        )
+        if "progress_ratio" in gauges:
+            message += (
+                f" progress:{round(gauges['progress_ratio'] * 100)}% "
+                f"eta:{round(gauges['eta_seconds'])}s"
+            )
+        print(message, flush=True)
+        self.__write_prometheus__()
+
+    def gauges(self) -> Dict[str, float]:
+        duration = time.monotonic() - self.start
+        lines_per_second = self.lines / duration if duration > 0 else 0.0
+        gauges = dict(duration_seconds=duration, lines_per_second=lines_per_second)
+        if self.total_lines:
+            gauges["progress_ratio"] = min(1.0, self.lines / self.total_lines)
+            gauges["eta_seconds"] = (
+                max(0, self.total_lines - self.lines) / lines_per_second
+                if lines_per_second > 0
+                else float("inf")
+            )
+        return gauges
+
+    def __write_prometheus__(self):
+        if self.prometheus_filename is None:
+            return
+        # The collector must never see half a file
+        temporary_filename = f"{self.prometheus_filename}.tmp"
+        with open(temporary_filename, "w") as f:
+            f.write(metrics.to_prometheus(self.gauges()))
+        os.replace(temporary_filename, self.prometheus_filename)
+
+    def __serve__(self, port: int) -> ThreadingHTTPServer:
+        reporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus(reporter.gauges()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        server = ThreadingHTTPServer(("", port), Handler)
+        threading.Thread(
+            target=server.serve_forever, name="prometheus", daemon=True
+        ).start()
+        print(f"serving metrics on port {server.server_port}", flush=True)
+        return server
+
+    def finish(self, summary_filename: Optional[str], settings: Dict[str, Any]):
+        """Writes the summary of the run as JSON and the last metrics"""
+        self.__write_prometheus__()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if summary_filename is None:
+            return
+        gauges = self.gauges()
+        summary = dict(
+            settings=settings,
+            duration_seconds=gauges["duration_seconds"],
+            lines_per_second=gauges["lines_per_second"],
+            **metrics.to_dict(),
+        )
+        with open(summary_filename, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"saved the metrics to {summary_filename}", flush=True)
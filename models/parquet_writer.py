@@ -0,0 +1,109 @@
+import logging
+import time
+from typing import Any, Dict, List
+
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+
+from models.arrow_schemas import schemas
+from models.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SwepubParquetWriter:
+    """Streams the linked articles, contributors, affiliations and subjects
+    tables to parquet files one row group at a time.
+
+    Only the current row group is held in memory"""
+
+    filenames: Dict[str, str]
+    row_group_size: int
+    columns: Dict[str, Dict[str, List[Any]]]
+    writers: Dict[str, pq.ParquetWriter]
+    number_of_articles_in_row_group: int = 0
+
+    def __init__(self, filenames: Dict[str, str], row_group_size: int = 10000):
+        if set(filenames) != set(schemas):
+            raise ValueError(f"filenames must have the keys {list(schemas)}")
+        if row_group_size < 1:
+            raise ValueError("row_group_size must be at least 1")
+        self.filenames = filenames
+        self.row_group_size = row_group_size
+        self.writers = {
+            table: pq.ParquetWriter(filenames[table], schema)
+            for table, schema in schemas.items()
+        }
+        self.__reset_columns__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __reset_columns__(self):
+        self.columns = {
+            table: {name: [] for name in schema.names}
+            for table, schema in schemas.items()
+        }
+        self.number_of_articles_in_row_group = 0
+
+    def add_rows(self, rows: Dict[str, List[Dict[str, Any]]]):
+        """Add the rows returned by SwepubArticle.export_normalized_rows()"""
+        for table, table_rows in rows.items():
+            columns = self.columns[table]
+            for row in table_rows:
+                for name, column in columns.items():
+                    column.append(row.get(name))
+        self.number_of_articles_in_row_group += len(rows["articles"])
+        if self.number_of_articles_in_row_group >= self.row_group_size:
+            self.flush()
+
+    def add_columns(self, tables: Dict[str, Dict[str, List[Any]]]):
+        """Add batches that are already in the form of one list per column"""
+        for table, table_columns in tables.items():
+            number_of_rows = len(next(iter(table_columns.values()), []))
+            for name, column in self.columns[table].items():
+                column.extend(table_columns.get(name, [None] * number_of_rows))
+        self.number_of_articles_in_row_group = len(self.columns["articles"]["id"])
+        if self.number_of_articles_in_row_group >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write the collected rows as one row group in every table"""
+        if self.number_of_articles_in_row_group == 0:
+            return
+        logger.debug(
+            f"Writing a row group with {self.number_of_articles_in_row_group} articles"
+        )
+        start = time.perf_counter()
+        for table, writer in self.writers.items():
+            writer.write_table(
+                pa.Table.from_pydict(self.columns[table], schema=schemas[table])
+            )
+        self.__reset_columns__()
+        metrics.observe("write", time.perf_counter() - start)
+
+    def close(self):
+        self.flush()
+        start = time.perf_counter()
+        for writer in self.writers.values():
+            writer.close()
+        metrics.observe("write", time.perf_counter() - start)
+
+
+def join_parquet_files(filenames: List[str], filename: str):
+    """Copy the row groups of the files in order into one file
+    without reading more than one row group at a time"""
+    writer = None
+    try:
+        for part_filename in filenames:
+            part = pq.ParquetFile(part_filename)
+            if writer is None:
+                writer = pq.ParquetWriter(filename, part.schema_arrow)
+            for index in range(part.num_row_groups):
+                writer.write_table(part.read_row_group(index))
+    finally:
+        if writer is not None:
+            writer.close()
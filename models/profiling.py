@@ -0,0 +1,222 @@
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from models.extractor import Extractor
+from models.metrics import SlowestRecords, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MemorySnapshots(threading.Thread):
+    """Takes a tracemalloc snapshot every interval seconds and keeps
+    the lines that hold the most memory"""
+
+    def __init__(self, interval_seconds: float, top: int = 10):
+        super().__init__(name="memory snapshots", daemon=True)
+        self.interval_seconds = interval_seconds
+        self.top = top
+        self.stop = threading.Event()
+        self.start_time = time.monotonic()
+        self.snapshots: List[Dict[str, Any]] = []
+
+    def run(self):
+        while not self.stop.wait(self.interval_seconds):
+            self.take()
+
+    def take(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        self.snapshots.append(
+            dict(
+                seconds=time.monotonic() - self.start_time,
+                current_bytes=current,
+                peak_bytes=peak,
+                top=[
+                    dict(
+                        location=str(statistic.traceback[0]),
+                        bytes=statistic.size,
+                        blocks=statistic.count,
+                    )
+                    for statistic in snapshot.statistics("lineno")[: self.top]
+                ],
+            )
+        )
+
+
+class ExtractionProfiler(BaseModel):
+    """Runs an extraction under a profiler and writes a report
+    to report_directory next to the articles output.
+
+    The report holds the functions that took the most time,
+    the records that took the longest to parse by @id and
+    tracemalloc snapshots of where the memory goes.
+
+    profiler is "cprofile" or "pyinstrument", a sampling profiler
+    with less overhead that has to be installed.
+    The extraction runs in one process because the profilers
+    only see the process they run in"""
+
+    profiler: str = "cprofile"
+    # None disables tracemalloc which slows parsing down a lot
+    snapshot_every_x_seconds: Optional[float] = 60
+    number_of_slowest_records: int = 20
+    number_of_functions: int = 40
+    report_directory: str = "profile"
+
+    def profile(self, extractor: Extractor) -> str:
+        """Runs the extraction and returns the directory of the report"""
+        if self.profiler not in ("cprofile", "pyinstrument"):
+            raise ValueError(f"unsupported profiler {self.profiler}")
+        if extractor.number_of_workers > 1:
+            print("profiling in one process instead of the worker pool", flush=True)
+            extractor = extractor.model_copy(update=dict(number_of_workers=1))
+        directory = os.path.join(
+            os.path.dirname(extractor.__filenames__()["articles"]),
+            self.report_directory,
+        )
+        os.makedirs(directory, exist_ok=True)
+        metrics.slowest_records = SlowestRecords(self.number_of_slowest_records)
+        snapshots = None
+        if self.snapshot_every_x_seconds is not None:
+            tracemalloc.start()
+            snapshots = MemorySnapshots(self.snapshot_every_x_seconds)
+            snapshots.start()
+        start = time.monotonic()
+        try:
+            if self.profiler == "pyinstrument":
+                functions = self.__run_pyinstrument__(extractor, directory)
+            else:
+                functions = self.__run_cprofile__(extractor, directory)
+        finally:
+            slowest_records = metrics.slowest_records.to_list()
+            metrics.slowest_records = None
+            if snapshots is not None:
+                snapshots.stop.set()
+                snapshots.join()
+                snapshots.take()
+                tracemalloc.stop()
+        self.__write_report__(
+            directory=directory,
+            duration=time.monotonic() - start,
+            functions=functions,
+            slowest_records=slowest_records,
+            snapshots=snapshots.snapshots if snapshots is not None else [],
+        )
+        return directory
+
+    def __run_cprofile__(
+        self, extractor: Extractor, directory: str
+    ) -> List[Dict[str, Any]]:
+        import cProfile
+
+        profile = cProfile.Profile()
+        profile.runcall(extractor.extract)
+        # profile.pstats can be opened with e.g. snakeviz
+        profile.dump_stats(os.path.join(directory, "profile.pstats"))
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        rows = sorted(
+            stats.stats.items(),  # type: ignore
+            key=lambda item: item[1][3],
+            reverse=True,
+        )
+        return [
+            dict(
+                function=f"{filename}:{line_number}({name})",
+                calls=calls,
+                own_seconds=own_seconds,
+                cumulative_seconds=cumulative_seconds,
+            )
+            for (
+                (filename, line_number, name),
+                (_, calls, own_seconds, cumulative_seconds, _),
+            ) in rows[: self.number_of_functions]
+        ]
+
+    def __run_pyinstrument__(
+        self, extractor: Extractor, directory: str
+    ) -> List[Dict[str, Any]]:
+        # pyinstrument is only needed for this profiler
+        from pyinstrument import Profiler  # type: ignore
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            extractor.extract()
+        finally:
+            profiler.stop()
+        with open(os.path.join(directory, "profile.html"), "w") as f:
+            f.write(profiler.output_html())
+        with open(os.path.join(directory, "profile.txt"), "w") as f:
+            f.write(profiler.output_text())
+        # The call tree is in the files above
+        return []
+
+    def __write_report__(
+        self,
+        directory: str,
+        duration: float,
+        functions: List[Dict[str, Any]],
+        slowest_records: List[Dict[str, Any]],
+        snapshots: List[Dict[str, Any]],
+    ):
+        with open(os.path.join(directory, "report.json"), "w") as f:
+            json.dump(
+                dict(
+                    profiler=self.profiler,
+                    duration_seconds=duration,
+                    functions=functions,
+                    slowest_records=slowest_records,
+                    memory_snapshots=snapshots,
+                ),
+                f,
+                indent=2,
+            )
+        lines = [f"Profiled with {self.profiler} for {duration:.1f}s", ""]
+        if len(functions) > 0:
+            lines.append("Functions by cumulative time")
+            lines.append(f"{'cumulative':>11} {'own':>9} {'calls':>10}  function")
+            for function in functions:
+                lines.append(
+                    f"{function['cumulative_seconds']:>10.2f}s "
+                    f"{function['own_seconds']:>8.2f}s {function['calls']:>10}  "
+                    f"{function['function']}"
+                )
+            lines.append("")
+        lines.append("Slowest records")
+        lines.append(
+            f"{'ms':>9} {'bytes':>9} {'contributors':>12} {'subjects':>8}  @id"
+        )
+        for record in slowest_records:
+            lines.append(
+                f"{record['seconds'] * 1000:>9.2f} {record['bytes']:>9} "
+                f"{record['contributors']:>12} {record['subjects']:>8}  {record['id']}"
+            )
+        for snapshot in snapshots:
+            lines.append("")
+            lines.append(
+                f"Memory after {snapshot['seconds']:.0f}s: "
+                f"{snapshot['current_bytes'] / 2**20:.1f}MB, "
+                f"peak {snapshot['peak_bytes'] / 2**20:.1f}MB"
+            )
+            for statistic in snapshot["top"]:
+                lines.append(
+                    f"{statistic['bytes'] / 2**20:>9.1f}MB {statistic['blocks']:>9}  "
+                    f"{statistic['location']}"
+                )
+        with open(os.path.join(directory, "report.txt"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"saved the profile to {directory}", flush=True)
@@ -0,0 +1,57 @@
+from typing import Dict, Optional, Tuple
+
+from helpers.caching import add_many_to_review_queue
+
+Match = Tuple[str, str]
+
+
+class ReviewQueue:
+    """The matches of topics that were queued for review in this process.
+
+    While collecting, the workers send theirs back with every shard and
+    the parent writes them to the cache in one transaction. Otherwise
+    every match is written to the cache right away"""
+
+    def __init__(self):
+        self.collecting = False
+        self.candidates: Dict[Match, Tuple[Optional[str], Optional[str]]] = {}
+        self.occurrences: Dict[Match, int] = {}
+
+    def add(
+        self,
+        label: str,
+        qid: str,
+        candidate_label: Optional[str] = None,
+        description: Optional[str] = None,
+    ):
+        match = (label, qid)
+        self.candidates[match] = (candidate_label, description)
+        self.occurrences[match] = self.occurrences.get(match, 0) + 1
+        if not self.collecting:
+            self.save()
+
+    def take(self) -> Dict[Match, Tuple[Optional[str], Optional[str], int]]:
+        """Returns the matches collected so far with their number
+        of occurrences and starts over"""
+        taken = {
+            match: (*candidate, self.occurrences[match])
+            for match, candidate in self.candidates.items()
+        }
+        self.candidates = {}
+        self.occurrences = {}
+        return taken
+
+    def merge(self, matches: Dict[Match, Tuple[Optional[str], Optional[str], int]]):
+        """Add the matches that a worker took"""
+        for match, (candidate_label, description, occurrences) in matches.items():
+            self.candidates[match] = (candidate_label, description)
+            self.occurrences[match] = self.occurrences.get(match, 0) + occurrences
+
+    def save(self):
+        """Write the collected matches to the cache"""
+        matches = self.take()
+        if len(matches) > 0:
+            add_many_to_review_queue(matches)
+
+
+review_queue = ReviewQueue()
@@ -0,0 +1,119 @@
+import logging
+import time
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import config
+from models.metrics import Metrics, metrics
+from models.review_queue import review_queue
+from models.swepub.article import SwepubArticle
+
+logger = logging.getLogger(__name__)
+
+# These functions run in the worker processes of the parallel extraction.
+# They live on module level so that they can be pickled.
+
+
+def export_settings() -> Dict[str, Any]:
+    """Returns the settings in config so they can be copied into the workers"""
+    return {
+        key: value
+        for key, value in vars(config).items()
+        if not key.startswith("_") and not isinstance(value, ModuleType)
+    }
+
+
+def configure_worker(settings: Dict[str, Any]):
+    """Apply the settings of the parent process in a worker"""
+    for key, value in settings.items():
+        setattr(config, key, value)
+    logging.basicConfig(level=config.loglevel)
+    # Forked workers start with a copy of the metrics of the parent
+    metrics.take()
+    # The parent writes the matches that are queued for review
+    review_queue.collecting = True
+    review_queue.take()
+
+
+def count_article(article: SwepubArticle):
+    metrics.count("articles")
+    contributors = article.contributors or []
+    metrics.count("contributors", len(contributors))
+    metrics.count(
+        "affiliations",
+        sum(len(contributor.affiliations or []) for contributor in contributors),
+    )
+    metrics.count("subjects", len(article.subjects or []))
+
+
+def parse_article(line: bytes, fields: Optional[List[str]]) -> SwepubArticle:
+    slowest_records = metrics.slowest_records
+    if slowest_records is None:
+        article = SwepubArticle(raw_data=line, fields=fields)
+    else:
+        start = time.perf_counter()
+        article = SwepubArticle(raw_data=line, fields=fields)
+        slowest_records.add(
+            time.perf_counter() - start,
+            dict(
+                id=article.id,
+                bytes=len(line),
+                contributors=article.number_of_contributors,
+                subjects=len(article.subjects or []),
+            ),
+        )
+    count_article(article)
+    return article
+
+
+def parse_shard(
+    lines: List[bytes],
+    export: str = "dict",
+    fields: Optional[List[str]] = None,
+) -> Union[Dict[str, List[Any]], Dict[str, Dict[str, List[Any]]]]:
+    """Parses a shard of lines and returns one list per column
+
+    export is the name of the SwepubArticle export to use: "dict", "flat"
+    or "normalized".
+    fields is the projection of the articles, see SwepubArticle.
+    The dict export only has the object column if the fields ask for it,
+    which Extractor only allows with one worker so that the workers
+    return columns of values and not pickled articles.
+    The normalized export returns the columns of the linked
+    articles, contributors, affiliations and subjects tables"""
+    if export == "normalized":
+        tables: Dict[str, Dict[str, List[Any]]] = {}
+        for line in lines:
+            rows = parse_article(line, fields).export_normalized_rows()
+            for table, table_rows in rows.items():
+                columns = tables.setdefault(table, {})
+                for row in table_rows:
+                    for key, value in row.items():
+                        columns.setdefault(key, []).append(value)
+        logger.debug(f"Parsed a shard of {len(lines)} lines into tables")
+        return tables
+    columns: Dict[str, List[Any]] = {}
+    for line in lines:
+        article = parse_article(line, fields)
+        if export == "flat":
+            row = article.export_flat_dict()
+        else:
+            row = article.export_dict()
+        for key, value in row.items():
+            columns.setdefault(key, []).append(value)
+    logger.debug(f"Parsed a shard of {len(lines)} lines")
+    return columns
+
+
+def parse_shard_in_worker(
+    lines: List[bytes], export: str = "dict", fields: Optional[List[str]] = None
+) -> Tuple[
+    Union[Dict[str, List[Any]], Dict[str, Dict[str, List[Any]]]],
+    Metrics,
+    Dict[Tuple[str, str], Tuple[Optional[str], Optional[str], int]],
+]:
+    """Parses a shard in a worker process and returns the columns
+    together with the metrics of the shard so the parent can add them up
+    and the matches that were queued for review so the parent can save them"""
+    columns = parse_shard(lines, export, fields=fields)
+    return columns, metrics.take(), review_queue.take()
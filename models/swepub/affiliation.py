@@ -7,26 +7,44 @@ from pydantic import BaseModel
 from wikibaseintegrator import wbi_config  # type: ignore
 
 import config
-from models.swepub.language import SwepubLanguage
+from models.swepub.compact import CompactModel, intern_string
+from models.swepub.language import SwepubLanguage, language_or_undetermined
 
 wbi_config.config["USER_AGENT"] = config.user_agent
 logger = logging.getLogger(__name__)
 
 
-class SwepubAffiliation:
+class SwepubAffiliation(CompactModel):
     """This models the affiliation aka organization and departments of authors in the Swepub raw_data"""
 
-    name: Optional[str] = None
-    language_code: Optional[SwepubLanguage] = None
-    local_identifier: str = None
-    has_subaffiliation: bool = False
-    subaffiliations: Optional[List[Dict[str, Any]]] = None
+    __slots__ = (
+        "name",
+        "language_code",
+        "local_identifier",
+        "has_subaffiliation",
+        "subaffiliations",
+        "linked_to_person",
+        "url",
+    )
+    name: Optional[str]
+    language_code: Optional[SwepubLanguage]
+    local_identifier: Optional[str]
+    has_subaffiliation: bool
+    # The JSON of the subaffiliations until the contributor has unnested them
+    subaffiliations: Optional[List[Dict[str, Any]]]
     linked_to_person: bool
-    url: Optional[str] = None
+    url: Optional[str]
+    __slot_defaults__ = dict(has_subaffiliation=False, linked_to_person=True)
 
     def __init__(
         self, affiliation: Dict[str, Any] = None, linked_to_person: bool = True
     ):
+        self.name = None
+        self.language_code = None
+        self.local_identifier = None
+        self.has_subaffiliation = False
+        self.subaffiliations = None
+        self.url = None
         self.linked_to_person = linked_to_person
         if isinstance(affiliation, list):
             raise ValueError("got list, need Dict")
@@ -43,7 +61,7 @@ class SwepubAffiliation:
                 if "name" in affiliation:
                     name = affiliation["name"]
                     if name != "":
-                        self.name = name
+                        self.name = intern_string(name)
                     else:
                         logger.debug("name of organization was empty string")
                 else:
@@ -70,9 +88,9 @@ class SwepubAffiliation:
                             identifier_type = identifier["@type"]
                             value = identifier["value"]
                             if identifier_type == "Local":
-                                self.local_identifier = value
+                                self.local_identifier = intern_string(value)
                             elif identifier_type == "URI":
-                                self.url = value
+                                self.url = intern_string(value)
                             else:
                                 logger.debug(
                                     f"unsupported identifier {identifier_type} in swepub affiliation"
@@ -99,15 +117,16 @@ class SwepubAffiliation:
         return f"{self.name} ({self.language_code.label})"
 
     def export_dataframe(self):
-        if self.language_code is None:
-            self.language_code = SwepubLanguage("und")
-        data = dict(
+        # The list around the row is needed because we have scalar values
+        return pd.DataFrame(data=[self.export_dict()])
+
+    def export_dict(self) -> Dict[str, Any]:
+        """Returns one row with column names as keys"""
+        return dict(
             name=self.name,
             local_identifier=self.local_identifier,
             has_nested_affiliations=self.has_subaffiliation,
-            language_code=self.language_code.code,
+            language_code=language_or_undetermined(self.language_code).code,
             linked_to_person=self.linked_to_person,
             url=self.url,
         )
-        # The list around raw_data is needed because we have scalar values
-        return pd.DataFrame(data=[data])
@@ -1,29 +1,87 @@
-import json
 import logging
-from json import JSONDecodeError
-from typing import List, Optional, Dict, Any
+import time
+from typing import Any, Dict, List, Optional, Sequence
 
 import pandas as pd  # type: ignore
-from langdetect import detect, LangDetectException
 from pydantic import BaseModel
 from wikibaseintegrator import wbi_config  # type: ignore
 
 import config
+from helpers.json_decoding import DecodeError
+from models.language_detection import detect_language_of
+from models.metrics import metrics
 from models.swedish_higher_education_authority import UKACodeLevel
 from models.swepub.contributor import SwepubContributor
 from models.swepub.language import SwepubLanguage
+from models.swepub.projection import Projection, projection_of, sections
+from models.swepub.schema import decode_record
 from models.swepub.subject import SwepubSubject
 
 wbi_config.config["USER_AGENT"] = config.user_agent
 logger = logging.getLogger(__name__)
 
+# The attribute that each type of identifier under master is stored in
+identifier_attributes = {
+    "URI": "url",
+    "DOI": "doi",
+    "PMID": "pmid",
+    "ScopusID": "scopusid",
+    "ISBN": "isbn",
+    "Local": "unknown_local_identifier",
+    "LibrisNumber": "libris_id",
+    "PatentNumber": "patent_number",
+    "ISI": "isi",
+    "Hdl": "hdl",
+    "ISSN": "issn",
+}
+
+
+def is_swedish(subject: SwepubSubject) -> bool:
+    # The language objects are not equal to their codes
+    return subject.language_code is not None and subject.language_code.code == "swe"
+
+
+class SectionAttribute:
+    """An attribute of SwepubArticle that is set when its section is parsed.
+
+    In lazy mode the section is parsed the first time
+    one of its attributes is read"""
+
+    def __init__(self, section: str, default: Any = None):
+        self.section = section
+        self.default = default
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, article, owner=None):
+        if article is None:
+            return self
+        state = article.__dict__
+        if self.section in state.get("pending_sections", ()):
+            article.__parse_section__(self.section)
+        return state.get(self.name, self.default)
+
+    def __set__(self, article, value):
+        article.__dict__[self.name] = value
+
 
 class SwepubArticle:
-    """This class parses a Swepub article json into an object"""
+    """This class parses a Swepub article json into an object
 
-    abstracts: Optional[List[str]] = None
-    contributors: Optional[List[SwepubContributor]] = None
-    detected_abstract_language: Optional[str] = None
+    fields is a projection like ["id", "doi", "subjects"]. Only the
+    sections of instanceOf that the fields need are decoded and parsed
+    and export_dict() returns exactly those fields. Without fields the
+    parse_* settings in config decide. With lazy=True the sections are
+    parsed the first time one of their attributes is read"""
+
+    abstracts: Optional[List[str]] = SectionAttribute("abstracts")  # type: ignore
+    contributors: Optional[List[SwepubContributor]] = SectionAttribute(  # type: ignore
+        "contributors"
+    )
+    detected_abstract_language: Optional[str] = SectionAttribute(  # type: ignore
+        "abstracts"
+    )
     doi: Optional[str] = None
     hdl: Optional[str] = None  # What is this?
     id: Optional[str] = None
@@ -32,211 +90,241 @@ class SwepubArticle:
     issn: Optional[str] = None
     # json: Optional[Dict[str, str]] = None
     libris_id: Optional[str] = None
-    language_codes: Optional[List[SwepubLanguage]] = None
+    language_codes: Optional[List[SwepubLanguage]] = SectionAttribute(  # type: ignore
+        "language_codes"
+    )
     unknown_local_identifier: Optional[str] = None  # What is this?
     patent_number: Optional[str] = None
     pmid: Optional[str] = None
     scopusid: Optional[str] = None
-    titles: Optional[List[str]] = None
-    subjects: Optional[List[SwepubSubject]] = None
+    titles: Optional[List[str]] = SectionAttribute("titles")  # type: ignore
+    subjects: Optional[List[SwepubSubject]] = SectionAttribute(  # type: ignore
+        "subjects"
+    )
     url: Optional[str] = None
-    number_of_abstracts: int = 0
-    number_of_titles: int = 0
-    number_of_language_codes: int = 0
-    number_of_contributors: int = 0
+    number_of_abstracts: int = SectionAttribute("abstracts", 0)  # type: ignore
+    number_of_titles: int = SectionAttribute("titles", 0)  # type: ignore
+    number_of_language_codes: int = SectionAttribute(  # type: ignore
+        "language_codes", 0
+    )
+    number_of_contributors: int = SectionAttribute("contributors", 0)  # type: ignore
     raw_data: Any = None
+    # Articles pickled before projections existed have none
+    projection: Optional[Projection] = None
 
-    def __init__(self, raw_data):
+    def __init__(
+        self, raw_data, fields: Optional[Sequence[str]] = None, lazy: bool = False
+    ):
         self.raw_data = raw_data
+        self.projection = projection_of(fields)
+        start = time.perf_counter()
         try:
-            deserialized_json_data = json.loads(self.raw_data)
-            self.__parse_json__(data=deserialized_json_data)
-        except JSONDecodeError:
+            deserialized_json_data = decode_record(
+                self.raw_data, sections=self.projection.sections
+            )
+        except DecodeError:
             logger.error(f"Decoding of the json {self.raw_data} failed")
+        else:
+            decoded = time.perf_counter()
+            metrics.observe("decode", decoded - start)
+            self.__parse_json__(data=deserialized_json_data, lazy=lazy)
+            metrics.observe("parse", time.perf_counter() - decoded)
+        if not config.keep_raw_data:
+            # Keeping the raw data would store the whole dump twice
+            self.raw_data = None
 
-    def __parse_json__(self, data: Any):
-        def __parse_abstracts__(instance_of: Any):
-            if config.parse_abstracts:
-                if "summary" in instance_of:
-                    summaries: List[Dict[str, str]] = instance_of["summary"]
-                    logger.info(f"Found {len(summaries)} abstracts")
-                    if len(summaries) > 0:
-                        self.abstracts = []
-                        # TODO create a models for abstracts with language_code and text attributes
-                        # Detect the language of the abstract
-                        if config.detect_language_of_abstract:
-                            if "label" in summaries[0]:
-                                first_summary = summaries[0]["label"]
-                                if len(first_summary.strip()) > 0:
-                                    logger.info(
-                                        f"First abstract found: {first_summary}"
-                                    )
-                                    try:
-                                        self.detected_abstract_language = detect(
-                                            first_summary
-                                        )
-                                        logger.info(
-                                            f"Detected language of the "
-                                            f"first abstract : {self.detected_abstract_language}"
-                                        )
-                                    except LangDetectException:
-                                        logger.error(
-                                            f"Could not detect language"
-                                            f"for summary: {first_summary}"
-                                        )
-                                else:
-                                    logger.debug("First summary was empty.")
-                        for summary in summaries:
-                            if "label" in summary:
-                                self.abstracts.append(summary["label"])
-                        self.number_of_abstracts = len(self.abstracts)
-                    else:
-                        logger.info("No summary found for this article")
-                else:
-                    logger.info("No summery found for this article")
-
-        def __parse_contributors__(instance_of: Any):
-            if config.parse_contributors:
-                if "contribution" in instance_of:
-                    # This can hold bot authors and other stakeholders
-                    self.contributors = []
-                    contributions = instance_of["contribution"]
-                    for person in contributions:
-                        self.contributors.append(SwepubContributor(person))
-                    self.number_of_contributors = len(self.contributors)
-
-        def __parse_identifiers__(master: Any):
-            if "@id" in master:
-                self.id: str = master["@id"]
-            else:
-                raise ValueError("id was None")
-            # We detect the identifiers first so we can link to them in some messages below
-            if "identifiedBy" in master:
-                logger.info("Found identifiedBy")
-                identified_by = master["identifiedBy"]
-                logger.debug(f"identified_by:{identified_by}")
-                for item in identified_by:
-                    if "@type" in item:
-                        identifier_type = item["@type"]
-                        value = item["value"]
-                        if identifier_type == "URI":
-                            self.url = value
-                        elif identifier_type == "DOI":
-                            self.doi = value
-                        elif identifier_type == "PMID":
-                            self.pmid = value
-                        elif identifier_type == "ScopusID":
-                            self.scopusid = value
-                        elif identifier_type == "ISBN":
-                            self.isbn = value
-                        elif identifier_type == "Local":
-                            self.unknown_local_identifier = value
-                        elif identifier_type == "LibrisNumber":
-                            self.libris_id = value
-                        elif identifier_type == "PatentNumber":
-                            self.patent_number = value
-                        elif identifier_type == "ISI":
-                            self.isi = value
-                        elif identifier_type == "Hdl":
-                            self.hdl = value
-                        elif identifier_type == "ISSN":
-                            self.issn = value
-                        else:
-                            logger.debug(
-                                f"Unsupported identifier_type {identifier_type} "
-                                f"detected with value {value}"
+    def __getstate__(self):
+        # Parse what is left so the pickle does not depend on the JSON
+        for section in list(self.__dict__.get("pending_sections", ())):
+            self.__parse_section__(section)
+        return self.__dict__
+
+    def __projection__(self) -> Projection:
+        return self.projection if self.projection is not None else projection_of()
+
+    def __parse_abstracts__(self, instance_of: Any):
+        if "summary" in instance_of:
+            summaries: List[Dict[str, str]] = instance_of["summary"]
+            logger.info(f"Found {len(summaries)} abstracts")
+            if len(summaries) > 0:
+                self.abstracts = []
+                # TODO create a models for abstracts with language_code and text attributes
+                # Detect the language of the abstract
+                if config.detect_language_of_abstract:
+                    if "label" in summaries[0]:
+                        first_summary = summaries[0]["label"]
+                        if len(first_summary.strip()) > 0:
+                            logger.info(f"First abstract found: {first_summary}")
+                            self.detected_abstract_language = detect_language_of(
+                                first_summary
+                            )
+                            logger.info(
+                                f"Detected language of the "
+                                f"first abstract : {self.detected_abstract_language}"
                             )
+                        else:
+                            logger.debug("First summary was empty.")
+                for summary in summaries:
+                    if "label" in summary:
+                        self.abstracts.append(summary["label"])
+                self.number_of_abstracts = len(self.abstracts)
             else:
-                logger.info(f"No identifiedBy found under master for this article")
-
-        def __parse_language__(instance_of: Any):
-            if "language" in instance_of:
-                self.language_codes = []
-                languages: List[Dict[str, str]] = instance_of["language"]
-                for language in languages:
-                    if "code" in language:
-                        self.language_codes.append(SwepubLanguage(language["code"]))
-                self.number_of_language_codes = len(self.language_codes)
-
-        def __parse_tiles__(instance_of: Any):
-            if config.parse_titles:
-                if "hasTitle" in instance_of:
-                    has_title: List[Dict[str, str]] = instance_of["hasTitle"]
-                    # print(type(has_title))
-                    logger.info(f"Found {len(has_title)} titles")
-                    title_labels = []
-                    self.titles = []
-                    for title in has_title:
-                        if "mainTitle" in title:
-                            title_label = title["mainTitle"]
-                            # Check for empty string
-                            if title_label.strip() != "":
-                                self.titles.append(title_label)
-                                if len(self.language_codes) == 1:
-                                    logging.info(
-                                        f"Title {title_label} found in work with "
-                                        f"the language {self.language_codes[0]}"
-                                    )
-                                elif len(self.language_codes) > 1:
-                                    logging.info(
-                                        f"Title {title_label} found in work with one of "
-                                        f"the languages {self.language_codes}"
-                                    )
-                                else:
-                                    logging.info(
-                                        f"Title {title_label} found"
-                                        f"in work with unknown language"
-                                    )
+                logger.info("No summary found for this article")
+        else:
+            logger.info("No summery found for this article")
+
+    def __parse_contributors__(self, instance_of: Any):
+        if "contribution" in instance_of:
+            # This can hold bot authors and other stakeholders
+            self.contributors = []
+            contributions = instance_of["contribution"]
+            for person in contributions:
+                self.contributors.append(SwepubContributor(person))
+            self.number_of_contributors = len(self.contributors)
+
+    def __parse_identifiers__(self, master: Any):
+        if "@id" in master:
+            self.id: str = master["@id"]
+        else:
+            raise ValueError("id was None")
+        # We detect the identifiers first so we can link to them in some messages below
+        if "identifiedBy" in master:
+            logger.info("Found identifiedBy")
+            identified_by = master["identifiedBy"]
+            logger.debug(f"identified_by:{identified_by}")
+            for item in identified_by:
+                if "@type" in item:
+                    identifier_type = item["@type"]
+                    value = item["value"]
+                    attribute = identifier_attributes.get(identifier_type)
+                    if attribute is not None:
+                        setattr(self, attribute, value)
+                    else:
+                        logger.debug(
+                            f"Unsupported identifier_type {identifier_type} "
+                            f"detected with value {value}"
+                        )
+        else:
+            logger.info(f"No identifiedBy found under master for this article")
+
+    def __parse_language__(self, instance_of: Any):
+        if "language" in instance_of:
+            self.language_codes = []
+            languages: List[Dict[str, str]] = instance_of["language"]
+            for language in languages:
+                if "code" in language:
+                    self.language_codes.append(SwepubLanguage(language["code"]))
+            self.number_of_language_codes = len(self.language_codes)
+
+    def __parse_tiles__(self, instance_of: Any):
+        if "hasTitle" in instance_of:
+            has_title: List[Dict[str, str]] = instance_of["hasTitle"]
+            # print(type(has_title))
+            logger.info(f"Found {len(has_title)} titles")
+            # Only for the log messages, we don't parse the languages for them
+            language_codes = [
+                language["code"]
+                for language in instance_of.get("language", [])
+                if "code" in language
+            ]
+            self.titles = []
+            for title in has_title:
+                if "mainTitle" in title:
+                    title_label = title["mainTitle"]
+                    # Check for empty string
+                    if title_label.strip() != "":
+                        self.titles.append(title_label)
+                        if len(language_codes) == 1:
+                            logging.info(
+                                f"Title {title_label} found in work with "
+                                f"the language {language_codes[0]}"
+                            )
+                        elif len(language_codes) > 1:
+                            logging.info(
+                                f"Title {title_label} found in work with one of "
+                                f"the languages {language_codes}"
+                            )
                         else:
-                            logger.debug(
-                                f"No main title found for this article at {self.url}"
+                            logging.info(
+                                f"Title {title_label} found"
+                                f"in work with unknown language"
                             )
-                    self.number_of_titles = len(self.titles)
-
-        def __parse_subjects__(instance_of: Any):
-            if config.parse_subjects:
-                if "subject" in instance_of:
-                    # This holds all the subjects
-                    json_subjects: List[Dict[str, str]] = instance_of["subject"]
-                    logger.info(f"Found {len(json_subjects)} subjects")
-                    # logger.debug("subjects:")
-                    # pprint(subjects)
-                    if len(json_subjects) > 0:
-                        self.subjects = []
-                        for subject_json_item in json_subjects:
-                            logger.debug(f"subject type:{type(subject_json_item)}")
-                            logger.debug(f"subject data:")
-                            # pprint(subject_json_item)
-                            subject = SwepubSubject(data=subject_json_item)
-                            if subject.unnested_non_uka_labels is not None:
-                                logger.info(
-                                    f"Unnesting {len(subject.unnested_non_uka_labels)} labels"
-                                )
-                                for label in subject.unnested_non_uka_labels:
-                                    logger.debug(f"unnesting label:{label}")
-                                    unnested_subject = SwepubSubject(
-                                        label=label,
-                                        # Inherit the language code
-                                        language_code=subject.language_code,
-                                    )
-                                    self.subjects.append(unnested_subject)
-                            else:
-                                self.subjects.append(subject)
+                else:
+                    logger.debug(f"No main title found for this article at {self.url}")
+            self.number_of_titles = len(self.titles)
+
+    def __parse_subjects__(self, instance_of: Any):
+        if "subject" in instance_of:
+            # This holds all the subjects
+            json_subjects: List[Dict[str, str]] = instance_of["subject"]
+            logger.info(f"Found {len(json_subjects)} subjects")
+            # logger.debug("subjects:")
+            # pprint(subjects)
+            if len(json_subjects) > 0:
+                self.subjects = []
+                for subject_json_item in json_subjects:
+                    logger.debug(f"subject type:{type(subject_json_item)}")
+                    logger.debug(f"subject data:")
+                    # pprint(subject_json_item)
+                    subject = SwepubSubject(data=subject_json_item)
+                    if subject.unnested_non_uka_labels is not None:
+                        logger.info(
+                            f"Unnesting {len(subject.unnested_non_uka_labels)} labels"
+                        )
+                        for label in subject.unnested_non_uka_labels:
+                            logger.debug(f"unnesting label:{label}")
+                            unnested_subject = SwepubSubject(
+                                label=label,
+                                # Inherit the language code
+                                language_code=subject.language_code,
+                            )
+                            self.subjects.append(unnested_subject)
+                    else:
+                        self.subjects.append(subject)
+
+    def __parse_section__(self, section: str, instance_of: Any = None):
+        """Parses one section. Without instance_of the one kept
+        for lazy parsing is used"""
+        pending = self.__dict__.get("pending_sections")
+        if instance_of is None:
+            instance_of = self.__dict__["instance_of"]
+        if pending is not None:
+            pending.discard(section)
+            if len(pending) == 0:
+                # Everything is parsed, we don't need the JSON anymore
+                del self.__dict__["pending_sections"]
+                del self.__dict__["instance_of"]
+        if section == "abstracts":
+            self.__parse_abstracts__(instance_of)
+        elif section == "contributors":
+            self.__parse_contributors__(instance_of)
+        elif section == "language_codes":
+            self.__parse_language__(instance_of)
+        elif section == "titles":
+            self.__parse_tiles__(instance_of)
+        elif section == "subjects":
+            self.__parse_subjects__(instance_of)
+        else:
+            raise ValueError(f"unknown section {section}")
 
+    def __parse_json__(self, data: Any, lazy: bool = False):
         master: Any = data["master"]
-        __parse_identifiers__(master)
+        self.__parse_identifiers__(master)
         # pprint(master)
         if "instanceOf" in master:
             instance_of: Dict[str, List[Dict[str, str]]] = master["instanceOf"]
-            __parse_abstracts__(instance_of)
-            __parse_contributors__(instance_of)
-            __parse_language__(instance_of)
-            __parse_tiles__(instance_of)
-            __parse_subjects__(instance_of)
+            requested = self.__projection__().sections
+            if lazy and len(requested) > 0:
+                self.instance_of = instance_of
+                self.pending_sections = set(requested)
+                return
+            for section in sections:
+                if section in requested:
+                    self.__parse_section__(section, instance_of)
 
     def __str__(self):
         """Prints an article object in a way that makes it easy for the user to read"""
-        if config.parse_contributors and config.parse_titles and config.parse_abstracts:
+        if {"contributors", "titles", "abstracts"} <= self.__projection__().sections:
             return (
                 f"id:{self.id}\n"
                 f"titles:{self.titles}\n"
@@ -259,71 +347,112 @@ class SwepubArticle:
             )
 
     def export_dataframe(self):
+        # The list around the row is needed because we have scalar values
+        return pd.DataFrame(data=[self.export_dict()])
+
+    def __field_value__(self, field: str) -> Any:
+        if field == "object":
+            return self
+        if field == "first_abstract":
+            return self.abstracts[0] if self.number_of_abstracts > 0 else None
+        if field == "first_title":
+            return self.titles[0] if self.number_of_titles > 0 else None
+        return getattr(self, field)
+
+    def export_dict(self) -> Dict[str, Any]:
+        """Returns one row with the fields of the projection as keys.
+        Every article of a projection has the same keys"""
         # This is not an optimal way of storing the raw_data in pandas
         # https://stackoverflow.com/questions/26792852/multiple-values-in-single-column-of-a-pandas-dataframe
         # https://stackoverflow.com/questions/26483254/python-pandas-insert-list-into-a-cell#47548471
-        if config.parse_contributors and config.parse_titles and config.parse_abstracts:
-            logger.info(
-                "Returning a dataframe with all information we currently support"
-            )
-            if self.number_of_abstracts > 0:
-                first_abstract = self.abstracts[0]
-            else:
-                first_abstract = None
-            if self.number_of_titles > 0:
-                first_title = self.titles[0]
-            else:
-                first_title = None
-            data = dict(
-                contributors=self.contributors,
-                doi=self.doi,
-                first_abstract=first_abstract,
-                first_title=first_title,
-                id=self.id,  # scalar value
-                isbn=self.isbn,
-                isi=self.isi,
-                issn=self.issn,
-                language_codes=self.language_codes,
-                number_of_abstracts=self.number_of_abstracts,
-                number_of_contributors=self.number_of_contributors,
-                number_of_language_codes=self.number_of_language_codes,
-                number_of_titles=self.number_of_titles,
-                object=self,
-                patent_number=self.patent_number,
-                pmid=self.pmid,
-                scopusid=self.scopusid,
-                subjects=self.subjects,  # list
-                url=self.url,
-            )
-            # print(raw_data)
-            # The list around raw_data is needed because we have scalar values
-            return pd.DataFrame(data=[data])  # , index=[count])
+        return {
+            field: self.__field_value__(field) for field in self.__projection__().fields
+        }
+
+    def export_normalized_rows(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Returns rows for the linked articles, contributors, affiliations
+        and subjects tables. All rows carry the article id.
+        Contributors and their affiliations are linked by contributor_number"""
+        article = dict(
+            detected_abstract_language=self.detected_abstract_language,
+            doi=self.doi,
+            first_abstract=self.abstracts[0] if self.number_of_abstracts > 0 else None,
+            first_title=self.titles[0] if self.number_of_titles > 0 else None,
+            hdl=self.hdl,
+            id=self.id,
+            isbn=self.isbn,
+            isi=self.isi,
+            issn=self.issn,
+            language_codes=(
+                [language.code for language in self.language_codes]
+                if self.language_codes is not None
+                else None
+            ),
+            libris_id=self.libris_id,
+            number_of_abstracts=self.number_of_abstracts,
+            number_of_contributors=self.number_of_contributors,
+            number_of_language_codes=self.number_of_language_codes,
+            number_of_titles=self.number_of_titles,
+            patent_number=self.patent_number,
+            pmid=self.pmid,
+            scopusid=self.scopusid,
+            unknown_local_identifier=self.unknown_local_identifier,
+            url=self.url,
+        )
+        contributors = []
+        affiliations = []
+        if self.contributors is not None:
+            for contributor_number, contributor in enumerate(self.contributors):
+                row = contributor.export_dict()
+                del row["affiliation"]
+                row.update(id=self.id, contributor_number=contributor_number)
+                contributors.append(row)
+                for affiliation in contributor.affiliations:
+                    row = affiliation.export_dict()
+                    row.update(id=self.id, contributor_number=contributor_number)
+                    affiliations.append(row)
+        subjects = []
+        if self.subjects is not None:
+            for subject in self.subjects:
+                row = subject.export_dict()
+                if subject.uka_code_level is not None:
+                    row["uka_code_level"] = subject.uka_code_level.value
+                row["id"] = self.id
+                subjects.append(row)
+        return dict(
+            articles=[article],
+            contributors=contributors,
+            affiliations=affiliations,
+            subjects=subjects,
+        )
+
+    def export_flat_dict(self) -> Dict[str, Any]:
+        """Returns one row that only holds scalars, lists and dicts.
+        They map to the list and struct columns of the flat article schema"""
+        rows = self.export_normalized_rows()
+        row = rows["articles"][0]
+        if self.contributors is not None:
+            row["contributors"] = rows["contributors"]
+            for contributor in row["contributors"]:
+                contributor["affiliations"] = []
+            for affiliation in rows["affiliations"]:
+                row["contributors"][affiliation["contributor_number"]][
+                    "affiliations"
+                ].append(affiliation)
         else:
-            logger.info(
-                "Exporting a minimal dataframe with identifiers and language codes"
-            )
-            data = dict(
-                doi=self.doi,
-                id=self.id,  # scalar value
-                isbn=self.isbn,
-                isi=self.isi,
-                issn=self.issn,
-                language_codes=self.language_codes,  # list
-                number_of_language_codes=self.number_of_language_codes,
-                object=self,
-                patent_number=self.patent_number,
-                pmid=self.pmid,
-                scopusid=self.scopusid,
-                url=self.url,
-            )
-            # print(raw_data)
-            # The list around raw_data is needed because we have scalar values
-            return pd.DataFrame(data=[data])
+            row["contributors"] = None
+        row["subjects"] = rows["subjects"] if self.subjects is not None else None
+        if self.raw_data is not None:
+            if isinstance(self.raw_data, bytes):
+                row["raw_data"] = self.raw_data.decode()
+            else:
+                row["raw_data"] = self.raw_data
+        return row
 
     def non_swedish_subjects(self):
         """This filters out all subjects with the language_code=swe"""
         if self.subjects is not None:
-            return list(filter(lambda x: x.language_code != "swe", self.subjects))
+            return list(filter(lambda x: not is_swedish(x), self.subjects))
         else:
             return list()
 
@@ -332,7 +461,7 @@ class SwepubArticle:
         if self.subjects is not None:
             return list(
                 filter(
-                    lambda x: (x.language_code != "swe" and x.uka_code is None),
+                    lambda x: (not is_swedish(x) and x.uka_code is None),
                     self.subjects,
                 )
             )
@@ -345,7 +474,7 @@ class SwepubArticle:
         if self.subjects is not None:
             return list(
                 filter(
-                    lambda x: (x.uka_code is not None and x.language_code != "swe"),
+                    lambda x: (x.uka_code is not None and not is_swedish(x)),
                     self.subjects,
                 )
             )
@@ -366,7 +495,7 @@ class SwepubArticle:
                 filter(
                     lambda x: (
                         x.uka_code is not None
-                        and x.language_code != "swe"
+                        and not is_swedish(x)
                         and x.uka_code_level == level
                     ),
                     self.subjects,
@@ -0,0 +1,35 @@
+import sys
+from typing import Any, Dict
+
+
+def intern_string(value: Any) -> Any:
+    """Returns the shared copy of a string so that repeated values like
+    organization names and UKÄ labels are only stored once"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class CompactModel:
+    """Base class for models that use __slots__ instead of a __dict__
+    because there are millions of instances in a full run"""
+
+    __slots__ = ()
+    # The values of the slots that old pickles leave out because they
+    # had the class default. The other slots default to None.
+    __slot_defaults__: Dict[str, Any] = {}
+
+    def __setstate__(self, state):
+        # Pickles from before __slots__ hold the __dict__ of the instance
+        if isinstance(state, tuple):
+            dict_state, slots_state = state
+            state = {**(dict_state or {}), **(slots_state or {})}
+        slots = {
+            slot
+            for cls in type(self).__mro__
+            for slot in cls.__dict__.get("__slots__", ())
+        }
+        defaults = type(self).__slot_defaults__
+        for slot in slots:
+            # Attributes that had their class default are missing in old pickles
+            setattr(self, slot, state[slot] if slot in state else defaults.get(slot))
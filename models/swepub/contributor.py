@@ -7,24 +7,36 @@ from wikibaseintegrator import wbi_config  # type: ignore
 
 import config
 from models.swepub.affiliation import SwepubAffiliation
+from models.swepub.compact import CompactModel
 
 wbi_config.config["USER_AGENT"] = config.user_agent
 logger = logging.getLogger(__name__)
 
 
-class SwepubContributor:
+class SwepubContributor(CompactModel):
     """This models the contributor aka author in the Swepub raw_data"""
 
-    given_name: Optional[str] = None
-    family_name: Optional[str] = None
+    __slots__ = (
+        "given_name",
+        "family_name",
+        "affiliations",
+        "orcid",
+        "local_identifier",
+    )
+    given_name: Optional[str]
+    family_name: Optional[str]
     affiliations: List[SwepubAffiliation]
-    orcid: Optional[str] = None
-    local_identifier: Optional[str] = None
+    orcid: Optional[str]
+    local_identifier: Optional[str]
 
     def __init__(self, person_data: Any = None):
         if person_data is None:
             raise ValueError("instance of was None")
         else:
+            self.given_name = None
+            self.family_name = None
+            self.orcid = None
+            self.local_identifier = None
             self.affiliations = []
             self.__parse__(person_data)
 
@@ -65,7 +77,10 @@ class SwepubContributor:
                 elif affiliation_type == "Organization":
                     # print("agent:")
                     # pprint(agent)
-                    self.affiliations.append(SwepubAffiliation(affiliation=agent))
+                    affiliation = SwepubAffiliation(affiliation=agent)
+                    # Save memory by deleting the json raw_data
+                    affiliation.subaffiliations = None
+                    self.affiliations.append(affiliation)
                 else:
                     logger.debug(
                         f"unsupported affiliation type {affiliation_type} in swepub agent"
@@ -99,15 +114,20 @@ class SwepubContributor:
         return f"{self.given_name} {self.family_name}"
 
     def export_dataframe(self):
+        # The list around the row is needed because we have scalar values
+        return pd.DataFrame(data=[self.export_dict()])
+
+    def export_dict(self) -> Dict[str, Any]:
+        """Returns one row with column names as keys"""
         if len(self.affiliations) == 0:
             affiliations = None
         else:
             affiliations = self.affiliations
-        data = dict(
+        return dict(
             affiliation=affiliations,
+            family_name=self.family_name,
             full_name=self.full_name(),
+            given_name=self.given_name,
             orcid=self.orcid,
             local_identifier=self.local_identifier,
         )
-        # The list around raw_data is needed because we have scalar values
-        return pd.DataFrame(data=[data])
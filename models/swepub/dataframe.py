@@ -1,9 +1,91 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import pandas as pd  # type: ignore
 from pandas import DataFrame  # type: ignore
 from pydantic import BaseModel
 
+from models.swedish_higher_education_authority import UKACodeLevel
+
+
+def __explode__(articles: DataFrame, column: str, number_column: str) -> DataFrame:
+    """Returns one row per item in the list column with the article id
+    and the position of the item in its list"""
+    if column not in articles:
+        raise ValueError(f"the articles have no {column} column")
+    # The index of the articles may have duplicates, e.g. after concatenating
+    # pickles, so every article gets its position as the index first
+    exploded = articles[["id", column]].reset_index(drop=True).explode(column)
+    exploded = exploded[exploded[column].notna()]
+    # The index is still the one of the article so counting within it
+    # gives the position in the list
+    exploded[number_column] = exploded.groupby(level=0).cumcount()
+    return exploded.reset_index(drop=True)
+
+
+def __rows__(items: List[Any]) -> List[Dict[str, Any]]:
+    """Returns the exported rows of the model objects.
+    With flat_export=True the items are dictionaries already"""
+    return [
+        dict(item) if isinstance(item, dict) else item.export_dict() for item in items
+    ]
+
+
+def __with_ids__(
+    rows: List[Dict[str, Any]], exploded: DataFrame, columns: List[str]
+) -> DataFrame:
+    df = pd.DataFrame.from_records(rows)
+    for column in columns:
+        df[column] = exploded[column].to_numpy()
+    return df
+
+
+def explode_subjects(articles: DataFrame) -> DataFrame:
+    """Returns one row per subject of the articles with the article id.
+    The columns are the ones of the subjects table of the parquet output"""
+    exploded = __explode__(articles, "subjects", "subject_number")
+    df = __with_ids__(__rows__(exploded["subjects"].tolist()), exploded, ["id"])
+    if "uka_code_level" in df:
+        # Like the parquet output we store the level as a number
+        df["uka_code_level"] = df["uka_code_level"].map(
+            lambda level: level.value if isinstance(level, UKACodeLevel) else level
+        )
+    return df
+
+
+def explode_contributors(articles: DataFrame) -> DataFrame:
+    """Returns one row per contributor of the articles with the article id
+    and the contributor_number that links them to their affiliations"""
+    exploded = __explode__(articles, "contributors", "contributor_number")
+    df = __with_ids__(
+        __rows__(exploded["contributors"].tolist()),
+        exploded,
+        ["id", "contributor_number"],
+    )
+    # The affiliations have their own table
+    return df.drop(columns=["affiliation", "affiliations"], errors="ignore")
+
+
+def explode_affiliations(articles: DataFrame) -> DataFrame:
+    """Returns one row per affiliation of the contributors of the articles
+    with the article id and the contributor_number"""
+    contributors = __explode__(articles, "contributors", "contributor_number")
+    contributors["affiliations"] = [
+        (
+            contributor.get("affiliations")
+            if isinstance(contributor, dict)
+            else contributor.affiliations
+        )
+        for contributor in contributors["contributors"]
+    ]
+    contributors = contributors.drop(columns=["contributors"])
+    exploded = contributors.explode("affiliations", ignore_index=True)
+    exploded = exploded[exploded["affiliations"].notna()]
+    return __with_ids__(
+        __rows__(exploded["affiliations"].tolist()),
+        exploded,
+        ["id", "contributor_number"],
+    )
+
 
 class SwepubDataframe(BaseModel):
     dataframe: Optional[DataFrame]
@@ -15,14 +97,44 @@ class SwepubDataframe(BaseModel):
     def load_into_memory(self):
         self.dataframe = pd.read_pickle(self.pickle_filename)
 
-    def export_subjects_dataframe(self, pickle_filename: str = "subjects.pkl.gz"):
-        """Takes a pickle filename and export all subjects as a dataframe to it"""
+    def __articles__(self) -> DataFrame:
         if self.dataframe is None:
             raise ValueError("self.dataframe was None")
-        df_subjects = pd.DataFrame()
-        for list in self.dataframe["subjects"]:
-            for item in list:
-                df_subjects = df_subjects.append(item.export_dataframe())
+        return self.dataframe
+
+    def subjects(self) -> DataFrame:
+        """Returns all subjects as one table with the article id"""
+        return explode_subjects(self.__articles__())
+
+    def contributors(self) -> DataFrame:
+        """Returns all contributors as one table with the article id"""
+        return explode_contributors(self.__articles__())
+
+    def affiliations(self) -> DataFrame:
+        """Returns all affiliations as one table with the article id"""
+        return explode_affiliations(self.__articles__())
+
+    def export_subjects_dataframe(self, pickle_filename: str = "subjects.pkl.gz"):
+        """Takes a pickle filename and export all subjects as a dataframe to it"""
+        df_subjects = self.subjects()
         df_subjects.to_pickle(pickle_filename)
         print(df_subjects.describe())
-        print(df_subjects.sample(3))
+        print(df_subjects.sample(min(3, len(df_subjects))))
+
+    def export_contributors_dataframe(
+        self, pickle_filename: str = "contributors.pkl.gz"
+    ):
+        """Takes a pickle filename and export all contributors as a dataframe to it"""
+        df_contributors = self.contributors()
+        df_contributors.to_pickle(pickle_filename)
+        print(df_contributors.describe())
+        print(df_contributors.sample(min(3, len(df_contributors))))
+
+    def export_affiliations_dataframe(
+        self, pickle_filename: str = "affiliations.pkl.gz"
+    ):
+        """Takes a pickle filename and export all affiliations as a dataframe to it"""
+        df_affiliations = self.affiliations()
+        df_affiliations.to_pickle(pickle_filename)
+        print(df_affiliations.describe())
+        print(df_affiliations.sample(min(3, len(df_affiliations))))
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from models.iso import IsoThreeLetterLanguageCode
 
 
@@ -6,3 +8,8 @@ class SwepubLanguage(IsoThreeLetterLanguageCode):
 
     def __str__(self):
         return f"{self.label}"
+
+
+def language_or_undetermined(language: Optional[SwepubLanguage]) -> SwepubLanguage:
+    """Returns the language or und for the exports of models without one"""
+    return language if language is not None else SwepubLanguage("und")
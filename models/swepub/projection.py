@@ -0,0 +1,139 @@
+from functools import lru_cache
+from typing import FrozenSet, NamedTuple, Optional, Sequence, Tuple
+
+import config
+
+# The parts of instanceOf that SwepubArticle parses, in the order they are parsed
+sections = ("abstracts", "contributors", "language_codes", "titles", "subjects")
+
+# The fields that need a section to be parsed
+section_of_field = dict(
+    abstracts="abstracts",
+    detected_abstract_language="abstracts",
+    first_abstract="abstracts",
+    number_of_abstracts="abstracts",
+    contributors="contributors",
+    number_of_contributors="contributors",
+    language_codes="language_codes",
+    number_of_language_codes="language_codes",
+    titles="titles",
+    first_title="titles",
+    number_of_titles="titles",
+    subjects="subjects",
+)
+# The id and the identifiers are always parsed because they are cheap.
+# object is the article itself. It is only exported when asked for
+# because the workers would have to pickle every article back.
+identifier_fields = (
+    "id",
+    "doi",
+    "hdl",
+    "isbn",
+    "isi",
+    "issn",
+    "libris_id",
+    "patent_number",
+    "pmid",
+    "scopusid",
+    "unknown_local_identifier",
+    "url",
+)
+fields = tuple(section_of_field) + identifier_fields + ("object",)
+
+# The columns of SwepubArticle.export_dict() when no fields are given
+full_export_fields = (
+    "contributors",
+    "doi",
+    "first_abstract",
+    "first_title",
+    "id",
+    "isbn",
+    "isi",
+    "issn",
+    "language_codes",
+    "number_of_abstracts",
+    "number_of_contributors",
+    "number_of_language_codes",
+    "number_of_titles",
+    "patent_number",
+    "pmid",
+    "scopusid",
+    "subjects",
+    "url",
+)
+minimal_export_fields = (
+    "doi",
+    "id",
+    "isbn",
+    "isi",
+    "issn",
+    "language_codes",
+    "number_of_language_codes",
+    "patent_number",
+    "pmid",
+    "scopusid",
+    "url",
+)
+
+
+class Projection(NamedTuple):
+    """The fields that are exported, in order, and the sections
+    that have to be parsed for them"""
+
+    fields: Tuple[str, ...]
+    sections: FrozenSet[str]
+
+
+@lru_cache(maxsize=None)
+def __projection__(requested: Tuple[str, ...]) -> Projection:
+    unknown = [field for field in requested if field not in fields]
+    if len(unknown) > 0:
+        raise ValueError(f"unknown fields {unknown}, choose from {list(fields)}")
+    # dict.fromkeys deduplicates and keeps the order
+    requested = tuple(dict.fromkeys(requested))
+    return Projection(
+        fields=requested,
+        sections=frozenset(
+            section_of_field[field] for field in requested if field in section_of_field
+        ),
+    )
+
+
+@lru_cache(maxsize=None)
+def __default_projection__(
+    parse_abstracts: bool,
+    parse_contributors: bool,
+    parse_titles: bool,
+    parse_subjects: bool,
+) -> Projection:
+    parsed = dict(
+        abstracts=parse_abstracts,
+        contributors=parse_contributors,
+        language_codes=True,
+        titles=parse_titles,
+        subjects=parse_subjects,
+    )
+    return Projection(
+        fields=(
+            full_export_fields
+            if parse_contributors and parse_titles and parse_abstracts
+            else minimal_export_fields
+        ),
+        sections=frozenset(section for section in sections if parsed[section]),
+    )
+
+
+def projection_of(requested: Optional[Sequence[str]] = None) -> Projection:
+    """Returns the projection of the requested fields.
+
+    Without fields the parse_* settings in config decide what is parsed
+    and exported like before projections existed.
+    The projections are cached so every article of a run shares one"""
+    if requested is None:
+        return __default_projection__(
+            config.parse_abstracts,
+            config.parse_contributors,
+            config.parse_titles,
+            config.parse_subjects,
+        )
+    return __projection__(tuple(requested))
@@ -0,0 +1,150 @@
+import logging
+from functools import lru_cache
+from typing import Any, FrozenSet, List, Optional, TypedDict
+
+import config
+from helpers.json_decoding import get_decoder
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgspec  # type: ignore
+except ImportError:
+    msgspec = None
+
+# This is the part of a SwePub record that our models parse.
+# msgspec decodes a line into these TypedDicts in one pass and skips
+# every key that is not declared here without materializing it.
+# The result is plain dictionaries so the models walk it as before.
+# The keys starting with @ need the functional syntax.
+
+Identifier = TypedDict(
+    "Identifier", {"@type": str, "value": Any}, total=False  # type: ignore
+)
+
+
+class Code(TypedDict, total=False):
+    code: str
+
+
+class Summary(TypedDict, total=False):
+    label: str
+
+
+class Title(TypedDict, total=False):
+    mainTitle: str
+
+
+Affiliation = TypedDict(
+    "Affiliation",
+    {
+        "@type": str,
+        "name": str,
+        "language": Code,
+        "identifiedBy": List[Identifier],
+        "hasAffiliation": List["Affiliation"],
+    },
+    total=False,
+)
+
+# The agent is either a person or an organization
+Agent = TypedDict(
+    "Agent",
+    {
+        "@type": str,
+        "givenName": str,
+        "familyName": str,
+        "name": str,
+        "language": Code,
+        "identifiedBy": List[Identifier],
+        "hasAffiliation": List[Affiliation],
+    },
+    total=False,
+)
+
+
+class Contribution(TypedDict, total=False):
+    agent: Agent
+    hasAffiliation: List[Affiliation]
+
+
+class Subject(TypedDict, total=False):
+    code: str
+    prefLabel: str
+    inScheme: Code
+    language: Code
+
+
+class InstanceOf(TypedDict, total=False):
+    summary: List[Summary]
+    contribution: List[Contribution]
+    language: List[Code]
+    hasTitle: List[Title]
+    subject: List[Subject]
+
+
+Master = TypedDict(
+    "Master",
+    {"@id": str, "identifiedBy": List[Identifier], "instanceOf": InstanceOf},
+    total=False,
+)
+
+
+class Record(TypedDict):
+    master: Master
+
+
+record_decoder = msgspec.json.Decoder(Record) if msgspec is not None else None
+
+# The keys of instanceOf that every section of SwepubArticle reads
+section_keys = dict(
+    abstracts=("summary",),
+    contributors=("contribution",),
+    language_codes=("language",),
+    # The titles are logged with the languages
+    titles=("hasTitle", "language"),
+    subjects=("subject",),
+)
+
+
+@lru_cache(maxsize=None)
+def record_decoder_for(sections: FrozenSet[str]) -> Any:
+    """Returns a decoder that skips the parts of instanceOf
+    that none of the sections read"""
+    keys = {key for section in sections for key in section_keys[section]}
+    projected_instance_of = TypedDict(  # type: ignore
+        "ProjectedInstanceOf",
+        {
+            key: value
+            for key, value in InstanceOf.__annotations__.items()
+            if key in keys
+        },
+        total=False,
+    )
+    projected_master = TypedDict(  # type: ignore
+        "ProjectedMaster",
+        {
+            "@id": str,
+            "identifiedBy": List[Identifier],
+            "instanceOf": projected_instance_of,
+        },
+        total=False,
+    )
+    projected_record = TypedDict(  # type: ignore
+        "ProjectedRecord", {"master": projected_master}
+    )
+    return msgspec.json.Decoder(projected_record)
+
+
+def decode_record(data: bytes, sections: Optional[FrozenSet[str]] = None) -> Any:
+    """Decodes only the parts of the record that we parse if msgspec is installed.
+    With sections only the parts of instanceOf that they read are decoded.
+
+    Records that do not follow the schema are decoded in full instead"""
+    if record_decoder is not None and config.schema_decoding:
+        decoder = record_decoder if sections is None else record_decoder_for(sections)
+        try:
+            return decoder.decode(data)
+        except msgspec.ValidationError as e:
+            logger.info(f"Record did not follow the schema, decoding all of it: {e}")
+    return get_decoder()(data)
@@ -1,39 +1,57 @@
 import logging
-from time import sleep
-from typing import Dict, Set, Optional
+from time import perf_counter, sleep
+from typing import Any, Dict, List, Set, Optional
 
 import pandas as pd  # type: ignore
-from cache_to_disk import cache_to_disk  # type: ignore
-from pydantic import BaseModel
 from wikibaseintegrator import wbi_config  # type: ignore
-from wikibaseintegrator.wbi_exceptions import MWApiError, SearchError  # type: ignore
+from wikibaseintegrator.wbi_exceptions import MWApiError  # type: ignore
 from wikibaseintegrator.wbi_helpers import mediawiki_api_call_helper  # type: ignore
 
 import config
-from helpers.caching import read_from_cache, add_to_cache
-from helpers.util import yes_no_question
+from helpers.caching import (
+    add_search_results,
+    read_from_cache,
+    read_search_results,
+)
+from models.metrics import metrics
+from models.review_queue import review_queue
 from models.swedish_higher_education_authority import UKACodeLevel
-from models.swepub.language import SwepubLanguage
+from models.swepub.compact import CompactModel, intern_string
+from models.swepub.language import SwepubLanguage, language_or_undetermined
+from models.topic_matcher import parse_search_results, search_parameters
 
 wbi_config.config["USER_AGENT"] = config.user_agent
 logger = logging.getLogger(__name__)
 
 
-class SwepubSubject:
-    """This models a Swepub subject aka topic"""
+class SwepubSubject(CompactModel):
+    """This models a Swepub subject aka topic
+
+    The source JSON is not kept after parsing"""
 
     # FIXME update to pydantic
     # TODO decide whether to flesh out in own models UKACode or not
-    data: Dict[str, str] = None
-    label: Optional[str] = None
-    unnested_non_uka_labels: Set[str] = None
-    language_code: Optional[SwepubLanguage] = None
-    uka_code: Optional[int] = None
-    uka_code_level: Optional[UKACodeLevel] = None
-    uka_label: Optional[str] = None
-    uka_scheme: bool = False
-    matched_wikidata_qid: Optional[str] = None
-    manually_matched: bool = False
+    __slots__ = (
+        "label",
+        "unnested_non_uka_labels",
+        "language_code",
+        "uka_code",
+        "uka_code_level",
+        "uka_label",
+        "uka_scheme",
+        "matched_wikidata_qid",
+        "manually_matched",
+    )
+    label: Optional[str]
+    unnested_non_uka_labels: Optional[Set[str]]
+    language_code: Optional[SwepubLanguage]
+    uka_code: Optional[int]
+    uka_code_level: Optional[UKACodeLevel]
+    uka_label: Optional[str]
+    uka_scheme: bool
+    matched_wikidata_qid: Optional[str]
+    manually_matched: bool
+    __slot_defaults__ = dict(uka_scheme=False, manually_matched=False)
 
     def __init__(
         self,
@@ -41,103 +59,77 @@ class SwepubSubject:
         label: str = None,
         language_code: SwepubLanguage = None,
     ):
+        self.label = None
+        self.unnested_non_uka_labels = None
+        self.language_code = None
+        self.uka_code = None
+        self.uka_code_level = None
+        self.uka_label = None
+        self.uka_scheme = False
+        self.matched_wikidata_qid = None
+        self.manually_matched = False
         if label is not None and language_code is not None:
-            self.label = label
+            self.label = intern_string(label)
             self.language_code = language_code
         elif label is not None and language_code is None:
             logger.debug(
                 "Language code was missing on this subject. Setting to UNDETERMINED"
             )
-            self.label = label
+            self.label = intern_string(label)
             self.language_code = SwepubLanguage("und")
         else:
             if data is None:
                 raise ValueError("raw_data was None")
             else:
                 # We got raw_data, handle it
-                self.data = data
                 self.__parse_json__(data=data)
         if config.lookup_topics_in_wd and self.label is not None:
+            start = perf_counter()
             self.__lookup_topic_in_wikidata__()
+            metrics.observe("lookup", perf_counter() - start)
+
+    def __search_entities__(self, topic: str = None) -> List[Dict[str, Any]]:
+        """Returns the search results for the topic from the cache
+        or else searches using WBI and caches them
 
-    @cache_to_disk(50)
-    def __search_entities__(self, topic: str = None):
-        """Looks up the code in WD using unfinished WBI function"""
-        logger.info(f"Running sparql query for topic {topic}")
-        # TODO convert 3-letter ISO code to Wikimedia language code using SPARQL
-        # Code borrowed from https://github.com/LeMyst/WikibaseIntegrator/blob/32698a69d10d1cf50b18961d3fabc36111128883/wikibaseintegrator/wbi_helpers.py#L319
-        # See license in that repo.
-        # search_expression = (
-        #         "-haswbstatement:P31=Q482994 "  # album
-        #         "-haswbstatement:P31=Q13442814 "  # scientific article
-        #         "-haswbstatement:P31=Q5633421 "  # scientific journal
-        #         + topic
-        # )
-        # cirrus_search_params = {
-        #     'action': 'query',
-        #     'srsearch': search_expression,
-        #     # hardcoded to English for now
-        #     'list': "search",
-        #     'srlimit': 50,
-        #     'format': 'json'
-        # }
-        params = {
-            "action": "wbsearchentities",
-            "search": topic,
-            "site": "enwiki",
-            # hardcoded to English for now
-            "language": "en",
-            "strict_language": False,
-            "type": "item",
-            "limit": 1,
-            "format": "json",
-        }
+        match-topics.py searches for all topics of the dump concurrently
+        so that we normally don't have to wait for the API here"""
+        language = self.language_code.code if self.language_code is not None else "und"
+        results = read_search_results(label=topic, language=language)
+        if results is not None:
+            logger.info(f"Found search results for topic {topic} in the cache")
+            return results
         logger.info("Running search entities query on the Wikidata API")
         try:
             search_results = mediawiki_api_call_helper(
-                data=params, allow_anonymous=True
+                data=search_parameters(label=topic, language=language),
+                allow_anonymous=True,
             )
         except MWApiError:
             logger.error(f"Got {MWApiError} for {topic}")
-            search_results = None
-        if search_results is not None:
-            if search_results["success"] != 1:
-                raise SearchError("Wikibase API wbsearchentities failed")
-            dict_result: bool = True
-            results = []
-            for i in search_results["search"]:
-                if dict_result:
-                    description = i["description"] if "description" in i else None
-                    aliases = i["aliases"] if "aliases" in i else None
-                    results.append(
-                        {
-                            "id": i["id"],
-                            "label": i["label"],
-                            "match": i["match"],
-                            "description": description,
-                            "aliases": aliases,
-                        }
-                    )
-                else:
-                    results.append(i["id"])
-            return results
+            return []
+        results = parse_search_results(search_results)
+        add_search_results(label=topic, language=language, results=results)
+        sleep(config.sleep_after_topic_match)
+        return results
+
+    def __ask_for_approval__(self, qid: str, label: str, description: Optional[str]):
+        """Lookup in cache and if miss queue the match for review
 
-    def __ask_for_approval__(self, qid: str = None):
-        """Lookup in cache and if miss ask for approval"""
+        review-matches.py asks about the queued matches after the extraction
+        so that the extraction never waits for a human.
+        During an extraction the parent writes the queued matches
+        of every shard to the cache"""
         result = read_from_cache(label=self.label, qid=qid)
         logger.info(f"Result from cache was {result}")
         if result is None:
-            if yes_no_question("Accept match?"):
-                # TODO save match locally so that the user
-                #  does not have to accept the same match twice
-                self.matched_wikidata_qid = qid
-                self.manually_matched = True
-                logger.info("Match accepted")
-                result = True
-            else:
-                logger.info("Match rejected")
-                result = False
-            add_to_cache(label=self.label, qid=qid, result=result)
+            review_queue.add(
+                label=self.label,
+                qid=qid,
+                candidate_label=label,
+                description=description,
+            )
+            logger.info("Match queued for review")
         else:
             logger.info(f"Got cached result {result}")
             if result:
@@ -150,39 +142,20 @@ class SwepubSubject:
         # underway and manual import/matching
         if not self.uka_scheme:
             results = self.__search_entities__(topic=self.label)
-            logger.info(self.__search_entities__.cache_info())
-            # pprint(results)
-            # if only one result and the labels match exact save it automatically
-            results_length = len(results)
-            if results_length == 1:
+            if len(results) > 0:
+                # We pick the first one because it is almost always right anyway
                 qid = results[0]["id"]
-                label = results[0]["label"]
-                description = results[0]["description"]
-                print(
-                    f"We found exactly one result for '{self.label}': "
-                    f"'{label}' with the description: '{description}' (see QID {qid})"
+                logger.info(
+                    f"Got {len(results)} matches for '{self.label}' and "
+                    f"picked the first one (see QID {qid})"
                 )
-                self.__ask_for_approval__(qid=qid)
-            elif results_length > 1:
-                # TODO present choice to user and give them a
-                #  short timespan of 5-10 seconds before auto-picking the first?
-                # pick the first one for now because it is almost always right anyway
-                # pprint(results)
-                qid = results[0]["id"]
-                label = results[0]["label"]
-                description = results[0]["description"]
-                print(
-                    f"Got {results_length} matches for '{self.label}' and "
-                    f"auto-picked the first one '{label}' with the "
-                    f"description: '{description}' (see QID {qid})"
+                self.__ask_for_approval__(
+                    qid=qid,
+                    label=results[0]["label"],
+                    description=results[0]["description"],
                 )
-                self.__ask_for_approval__(qid=qid)
             else:
                 logger.warning(f"Got zero results from Wikidata for '{self.label}'")
-            sleep(config.sleep_after_topic_match)
-            # print("debug exit")
-            # exit(0)
-            # if multiple matches, present the results and move on
 
     def __parse_json__(self, data: Dict[str, str] = None):
         if "inScheme" in data:
@@ -223,7 +196,7 @@ class SwepubSubject:
         if "prefLabel" in data:
             code_label = data["prefLabel"]
             if self.uka_scheme:
-                self.uka_label = code_label
+                self.uka_label = intern_string(code_label)
             else:
                 self.unnested_non_uka_labels = set()
                 if "; " in code_label:
@@ -231,7 +204,7 @@ class SwepubSubject:
                         self.unnested_non_uka_labels.add(label)
                 else:
                     # Single label that we can set directly
-                    self.label = code_label
+                    self.label = intern_string(code_label)
         if "language" in data:
             language = data["language"]
             if "code" in data["language"]:
@@ -253,7 +226,7 @@ class SwepubSubject:
         if self.uka_scheme:
             logging.info("__str__:Detected UKÄ scheme")
             if self.uka_code_level is None:
-                raise ValueError(f"code_level was none for {self.data}")
+                raise ValueError(f"code_level was none for UKÄ code {self.uka_code}")
             prefix = "UKÄ"
             if self.language_code is None:
                 language = "no language code found"
@@ -275,14 +248,23 @@ class SwepubSubject:
                     language = self.language_code.label
                 return f"{prefix}: " f"{self.label} ({language})"
             else:
-                raise ValueError(f"Could not print this subject {dict(self.data)}")
+                raise ValueError(
+                    f"Could not print this subject without label "
+                    f"in the language {self.language_code}"
+                )
 
     def export_dataframe(self):
+        # The list around the row is needed because we have scalar values
+        return pd.DataFrame(data=[self.export_dict()])
+
+    def export_dict(self) -> Dict[str, Any]:
+        """Returns one row with column names as keys"""
         # We don't export the labels attribute because it is nested.
-        data = dict(
-            language_code=self.language_code.code,
-            language_label=self.language_code.label,
-            language_qid=self.language_code.wikidata_qid,
+        language = language_or_undetermined(self.language_code)
+        return dict(
+            language_code=language.code,
+            language_label=language.label,
+            language_qid=language.wikidata_qid,
             label=self.label,
             uka_code=self.uka_code,
             uka_code_level=self.uka_code_level,
@@ -291,5 +273,3 @@ class SwepubSubject:
             matched_wikidata_qid=self.matched_wikidata_qid,
             manually_matched=self.manually_matched,
         )
-        # The list around raw_data is needed because we have scalar values
-        return pd.DataFrame(data=[data])
@@ -0,0 +1,126 @@
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd  # type: ignore
+from pandas import DataFrame  # type: ignore
+from pydantic import BaseModel
+
+from models.swedish_higher_education_authority import UKACodeLevel
+from models.swepub.dataframe import explode_subjects
+
+# uka_code and uka_code_level are 0 for subjects without a UKÄ code
+# so that they can be plain numpy integers
+no_uka_code = 0
+columns = (
+    "id",
+    "label",
+    "language_code",
+    "uka_code",
+    "uka_code_level",
+    "uka_label",
+    "uka_scheme",
+    "matched_wikidata_qid",
+)
+
+
+class SwepubSubjectsTable(BaseModel):
+    """All subjects of the corpus in one table with one row per subject
+
+    The columns are compact so that the whole corpus fits in memory:
+    id (the article), label, language_code and uka_label are categorical,
+    uka_code is int32 and uka_code_level is int8.
+
+    The query methods return the same subjects as the methods with
+    the same names on SwepubArticle, for all articles at once"""
+
+    dataframe: DataFrame
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @classmethod
+    def from_rows(cls, rows: Any) -> "SwepubSubjectsTable":
+        """rows is a dataframe or a list of dictionaries with the columns
+        of SwepubSubject.export_dict() plus the article id"""
+        df = pd.DataFrame(rows)
+        # Without any subjects there are no columns but the id
+        for column in columns:
+            if column not in df:
+                df[column] = None
+        uka_code = pd.to_numeric(df["uka_code"], errors="coerce")
+        uka_code_level = df["uka_code_level"].map(
+            lambda level: level.value if isinstance(level, UKACodeLevel) else level
+        )
+        uka_code_level = pd.to_numeric(uka_code_level, errors="coerce")
+        return cls(
+            dataframe=pd.DataFrame(
+                dict(
+                    id=df["id"].astype("category"),
+                    label=df["label"].astype("category"),
+                    language_code=df["language_code"].astype("category"),
+                    uka_code=uka_code.fillna(no_uka_code).astype(np.int32),
+                    uka_code_level=uka_code_level.fillna(no_uka_code).astype(np.int8),
+                    uka_label=df["uka_label"].astype("category"),
+                    uka_scheme=df["uka_scheme"].fillna(False).astype(bool),
+                    matched_wikidata_qid=df["matched_wikidata_qid"].astype("category"),
+                )
+            )
+        )
+
+    @classmethod
+    def from_articles(cls, articles: DataFrame) -> "SwepubSubjectsTable":
+        """Build the table from the articles pickle.
+
+        The subjects are SwepubSubject objects or with flat_export=True dictionaries"""
+        return cls.from_rows(explode_subjects(articles))
+
+    @classmethod
+    def from_parquet(cls, filename: str = "subjects.parquet") -> "SwepubSubjectsTable":
+        """Build the table from the subjects table of the parquet output"""
+        return cls.from_rows(pd.read_parquet(filename))
+
+    def __is_swedish__(self) -> np.ndarray:
+        return (self.dataframe["language_code"] == "swe").to_numpy()
+
+    def __has_uka_code__(self) -> np.ndarray:
+        return self.dataframe["uka_code"].to_numpy() != no_uka_code
+
+    def __has_level__(self, level: Optional[UKACodeLevel]) -> np.ndarray:
+        if level is None:
+            raise ValueError("level was None")
+        if not isinstance(level, UKACodeLevel):
+            raise ValueError("level was not a valid UKACodeLevel")
+        return self.dataframe["uka_code_level"].to_numpy() == level.value
+
+    def non_swedish_subjects(self) -> DataFrame:
+        """This filters out all subjects with the language_code=swe"""
+        return self.dataframe[~self.__is_swedish__()]
+
+    def non_swedish_subjects_non_uka_subjects(self) -> DataFrame:
+        """This filters out all subjects with the language_code=swe and any uka_code set"""
+        return self.dataframe[~self.__is_swedish__() & ~self.__has_uka_code__()]
+
+    def non_swedish_uka_subjects(self) -> DataFrame:
+        """This returns all subjects that have a UKÄ classification code but
+        leaves out the ones with labels in Swedish"""
+        return self.dataframe[~self.__is_swedish__() & self.__has_uka_code__()]
+
+    def non_swedish_uka_subjects_with_specific_code_level(
+        self, level: UKACodeLevel = None
+    ) -> DataFrame:
+        """This returns all subjects that have a UKÄ classification code level
+        specified by LEVEL but leaves out the ones with labels in Swedish"""
+        return self.dataframe[
+            ~self.__is_swedish__() & self.__has_uka_code__() & self.__has_level__(level)
+        ]
+
+    def uka_subjects(self) -> DataFrame:
+        """This filters out all subjects that does not have a UKÄ classification code"""
+        return self.dataframe[self.__has_uka_code__()]
+
+    def uka_subjects_with_specific_code_level(
+        self, level: UKACodeLevel = None
+    ) -> DataFrame:
+        """This returns all subjects that have a UKÄ classification
+        code level specified by LEVEL"""
+        return self.dataframe[self.__has_uka_code__() & self.__has_level__(level)]
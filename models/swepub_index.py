@@ -0,0 +1,338 @@
+import logging
+import mmap
+import os
+import time
+from array import array
+from hashlib import blake2b
+from typing import Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from helpers.identifiers import (
+    identifier_key_text,
+    normalize_identifier,
+    normalizers,
+)
+from helpers.json_decoding import DecodeError
+from models.input_readers import input_reader_for, read_chunks
+from models.swepub.article import SwepubArticle, identifier_attributes
+from models.swepub.schema import decode_record
+
+logger = logging.getLogger(__name__)
+
+# Every line of the decompressed cache, in the order of the file.
+# The id of the article on the line is a slice of the id text file.
+line_dtype = np.dtype(
+    [
+        ("offset", "<u8"),
+        ("length", "<u4"),
+        ("id_offset", "<u8"),
+        ("id_length", "<u2"),
+    ]
+)
+# The keys of the article ids and identifiers sorted for binary search
+key_dtype = np.dtype([("key", "<u8"), ("line", "<u4")])
+
+
+def key_of(text: str) -> int:
+    """Returns a 64 bit hash of the text that is stable between runs"""
+    return int.from_bytes(blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def keys_of(texts: Iterable[str]) -> np.ndarray:
+    return np.fromiter((key_of(text) for text in texts), dtype="<u8")
+
+
+class SwepubIndex:
+    """Random access to the articles in SwePub by their @id.
+
+    The dump is decompressed once into a plain JSONL cache next to
+    small numpy files: the offset and length of every line, the
+    sorted hashes of the article ids and the sorted hashes of the
+    normalized identifiers like DOI and PMID. They are memory-mapped so
+    opening the index reads nothing and a lookup touches only a few pages"""
+
+    cache_path: str
+
+    def __init__(self, cache_path: str = "swepub.jsonl"):
+        self.cache_path = cache_path
+        self.__cache__ = None
+        self.__lines__ = None
+        self.__keys__ = None
+        self.__identifiers__ = None
+        self.__id_text__ = None
+
+    @property
+    def lines_path(self) -> str:
+        return f"{self.cache_path}.lines.npy"
+
+    @property
+    def ids_path(self) -> str:
+        return f"{self.cache_path}.ids.npy"
+
+    @property
+    def identifiers_path(self) -> str:
+        return f"{self.cache_path}.identifiers.npy"
+
+    @property
+    def id_text_path(self) -> str:
+        return f"{self.cache_path}.ids.txt"
+
+    def __open__(self):
+        if self.__cache__ is None:
+            if not os.path.exists(self.ids_path):
+                raise FileNotFoundError(
+                    f"no index found for {self.cache_path}, build it first"
+                )
+            self.__cache__ = self.__map__(self.cache_path)
+            self.__lines__ = np.load(self.lines_path, mmap_mode="r")
+            self.__keys__ = np.load(self.ids_path, mmap_mode="r")
+            self.__identifiers__ = np.load(self.identifiers_path, mmap_mode="r")
+            self.__id_text__ = self.__map__(self.id_text_path)
+
+    @staticmethod
+    def __map__(path: str):
+        """Memory-maps the file for reading, slices of it are bytes"""
+        if os.path.getsize(path) == 0:
+            # Empty files cannot be mapped
+            return b""
+        with open(path, "rb") as f:
+            # The map stays valid after the file is closed
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self.__cache__ is not None:
+            for mapped in (self.__cache__, self.__id_text__):
+                if isinstance(mapped, mmap.mmap):
+                    mapped.close()
+            self.__cache__ = None
+            self.__lines__ = None
+            self.__keys__ = None
+            self.__identifiers__ = None
+            self.__id_text__ = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        self.__open__()
+        return len(self.__lines__)
+
+    def get_line(self, line_number: int) -> bytes:
+        """Returns the line with this number counting from 1 like the Extractor"""
+        self.__open__()
+        line = self.__lines__[line_number - 1]
+        offset = int(line["offset"])
+        return self.__cache__[offset : offset + int(line["length"])]
+
+    def get_id(self, line_number: int) -> str:
+        """Returns the article id on the line without parsing it"""
+        self.__open__()
+        line = self.__lines__[line_number - 1]
+        offset = int(line["id_offset"])
+        return self.__id_text__[offset : offset + int(line["id_length"])].decode()
+
+    def find_line_numbers(self, ids: Iterable[str]) -> np.ndarray:
+        """Returns the line number of every id or 0 if it is not in the index"""
+        self.__open__()
+        keys = keys_of(ids)
+        if len(self.__keys__) == 0:
+            return np.zeros(len(keys), dtype="<u4")
+        positions = np.searchsorted(self.__keys__["key"], keys)
+        # Keys larger than all in the index end up after the last position
+        positions = np.minimum(positions, len(self.__keys__) - 1)
+        found = self.__keys__[positions]
+        return np.where(found["key"] == keys, found["line"], 0)
+
+    def find_identifiers(
+        self, identifier_type: str, values: Iterable[Any]
+    ) -> pd.DataFrame:
+        """Joins the values with the identifier index.
+
+        identifier_type is the SwePub type like "DOI" or the article
+        attribute like "doi". Returns one row with the value, line_number
+        and id for every article that has the identifier. Values that are
+        not found get no row and values found in several articles get
+        one row per article. The match is on 64 bit hashes of the
+        normalized values so false matches are practically impossible"""
+        self.__open__()
+        identifier_type = self.__identifier_type__(identifier_type)
+        values = list(values)
+        keys = keys_of(
+            (
+                identifier_key_text(identifier_type, normalized)
+                if (normalized := normalize_identifier(identifier_type, value))
+                is not None
+                else ""
+            )
+            for value in values
+        )
+        index_keys = self.__identifiers__["key"]
+        first = np.searchsorted(index_keys, keys, side="left")
+        last = np.searchsorted(index_keys, keys, side="right")
+        counts = last - first
+        value_positions = np.repeat(np.arange(len(values)), counts)
+        # The positions in the index of all matches of every value
+        index_positions = np.repeat(
+            first - np.cumsum(counts) + counts, counts
+        ) + np.arange(counts.sum())
+        line_numbers = self.__identifiers__["line"][index_positions]
+        lines = self.__lines__[line_numbers - 1]
+        id_text = self.__id_text__
+        return pd.DataFrame(
+            dict(
+                value=[values[position] for position in value_positions],
+                line_number=line_numbers.astype("int64"),
+                id=[
+                    id_text[offset : offset + length].decode()
+                    for offset, length in zip(
+                        lines["id_offset"].tolist(), lines["id_length"].tolist()
+                    )
+                ],
+            )
+        )
+
+    def get_articles_by_identifier(
+        self, identifier_type: str, value: Any
+    ) -> List[SwepubArticle]:
+        """Returns all articles that have this identifier"""
+        return [
+            SwepubArticle(raw_data=self.get_line(line_number))
+            for line_number in self.find_identifiers(identifier_type, [value])[
+                "line_number"
+            ]
+        ]
+
+    @staticmethod
+    def __identifier_type__(identifier_type: str) -> str:
+        if identifier_type in normalizers:
+            return identifier_type
+        for swepub_type, attribute in identifier_attributes.items():
+            if attribute == identifier_type and swepub_type in normalizers:
+                return swepub_type
+        raise ValueError(
+            f"identifier type {identifier_type} is not indexed, "
+            f"choose one of {list(normalizers)}"
+        )
+
+    def get_articles(
+        self,
+        ids: Iterable[str],
+        fields: Optional[Sequence[str]] = None,
+        lazy: bool = False,
+    ) -> List[Optional[SwepubArticle]]:
+        """Returns the articles in the order of the ids, None for those not found.
+        fields and lazy are passed on to SwepubArticle.
+
+        The lines are read in the order of the file to keep the reads sequential"""
+        ids = list(ids)
+        line_numbers = self.find_line_numbers(ids)
+        articles: List[Optional[SwepubArticle]] = [None] * len(ids)
+        for index in np.argsort(line_numbers, kind="stable"):
+            line_number = int(line_numbers[index])
+            if line_number == 0:
+                continue
+            article = SwepubArticle(
+                raw_data=self.get_line(line_number), fields=fields, lazy=lazy
+            )
+            # Two ids could in theory have the same hash
+            if article.id == ids[index]:
+                articles[index] = article
+            else:
+                logger.warning(f"Hash collision between {ids[index]} and {article.id}")
+        return articles
+
+    def get_article(
+        self, id: str, fields: Optional[Sequence[str]] = None, lazy: bool = False
+    ) -> Optional[SwepubArticle]:
+        return self.get_articles([id], fields=fields, lazy=lazy)[0]
+
+    @staticmethod
+    def __sorted_keys__(keys: array, lines: array) -> np.ndarray:
+        sorted_keys = np.empty(len(keys), dtype=key_dtype)
+        sorted_keys["key"] = np.frombuffer(keys, dtype="<u8")
+        sorted_keys["line"] = np.asarray(lines, dtype="<u4")
+        # A stable sort keeps the lines of duplicated keys in order
+        sorted_keys.sort(order="key", kind="stable")
+        return sorted_keys
+
+    def build(self, zipfile_path: str, show_progress_every_x_line: int = 100000):
+        """Decompress the dump to the cache and index every line.
+        The dump can be any of the formats of models.input_readers"""
+        self.close()
+        start = time.time()
+        offsets = array("Q")
+        lengths = array("L")
+        id_offsets = array("Q")
+        id_lengths = array("L")
+        keys = array("Q")
+        key_lines = array("L")
+        identifier_keys = array("Q")
+        identifier_lines = array("L")
+        id_offset = 0
+        offset = 0
+        line_number = 0
+        with open(self.cache_path, "wb") as cache, open(
+            self.id_text_path, "wb"
+        ) as id_text:
+            for chunk in read_chunks(input_reader_for(zipfile_path)):
+                for line in chunk.lines:
+                    line_number += 1
+                    if not line.endswith(b"\n"):
+                        # Keep the lines separated if a member lacks the last newline
+                        line += b"\n"
+                    cache.write(line)
+                    offsets.append(offset)
+                    lengths.append(len(line))
+                    offset += len(line)
+                    try:
+                        master = decode_record(line)["master"]
+                        id = master["@id"]
+                    except (DecodeError, KeyError, TypeError):
+                        logger.error(f"Found no id on line {line_number}")
+                        id_offsets.append(id_offset)
+                        id_lengths.append(0)
+                    else:
+                        encoded_id = id.encode()
+                        id_text.write(encoded_id)
+                        id_offsets.append(id_offset)
+                        id_lengths.append(len(encoded_id))
+                        id_offset += len(encoded_id)
+                        keys.append(key_of(id))
+                        key_lines.append(line_number)
+                        for item in master.get("identifiedBy", []):
+                            identifier_type = item.get("@type")
+                            normalized = normalize_identifier(
+                                identifier_type, item.get("value")
+                            )
+                            if normalized is not None:
+                                identifier_keys.append(
+                                    key_of(
+                                        identifier_key_text(identifier_type, normalized)
+                                    )
+                                )
+                                identifier_lines.append(line_number)
+                    if line_number % show_progress_every_x_line == 0:
+                        print(
+                            f"count:{line_number} duration:{round(time.time() - start)}s",
+                            flush=True,
+                        )
+        lines = np.empty(len(offsets), dtype=line_dtype)
+        lines["offset"] = np.frombuffer(offsets, dtype="<u8")
+        lines["length"] = np.asarray(lengths, dtype="<u4")
+        lines["id_offset"] = np.frombuffer(id_offsets, dtype="<u8")
+        lines["id_length"] = np.asarray(id_lengths, dtype="<u2")
+        np.save(self.lines_path, lines)
+        ids = self.__sorted_keys__(keys, key_lines)
+        np.save(self.ids_path, ids)
+        identifiers = self.__sorted_keys__(identifier_keys, identifier_lines)
+        np.save(self.identifiers_path, identifiers)
+        print(
+            f"indexed {len(ids)} ids and {len(identifiers)} identifiers on {line_number} lines "
+            f"in {round(time.time() - start)}s",
+            flush=True,
+        )
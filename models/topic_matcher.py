@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd  # type: ignore
+import requests
+from pydantic import BaseModel
+from wikibaseintegrator.wbi_exceptions import SearchError  # type: ignore
+
+import config
+from helpers.caching import add_many_search_results, searched_topics
+
+logger = logging.getLogger(__name__)
+
+# A topic is a (label, ISO 639-2 language code) pair
+Topic = Tuple[str, str]
+
+# The Wikimedia language codes of the languages that are common in SwePub.
+# Other languages are searched in English with fallback to all languages.
+wikimedia_language_codes = dict(
+    eng="en",
+    swe="sv",
+    nor="nb",
+    nob="nb",
+    nno="nn",
+    dan="da",
+    fin="fi",
+    ice="is",
+    ger="de",
+    fre="fr",
+    spa="es",
+    ita="it",
+    por="pt",
+    dut="nl",
+    pol="pl",
+    rus="ru",
+    chi="zh",
+    jpn="ja",
+)
+default_search_language = "en"
+# HTTP status codes that are worth another try
+retry_statuses = {429, 500, 502, 503, 504}
+# MediaWiki API error codes that are worth another try
+retry_error_codes = {"maxlag", "ratelimited"}
+
+
+def search_parameters(label: str, language: str) -> Dict[str, Any]:
+    """Returns the wbsearchentities parameters for the topic"""
+    # A CirrusSearch query could exclude albums, scientific articles
+    # and journals with -haswbstatement:P31=Q482994 etc. but wbsearchentities
+    # is cheaper and almost always right when it finds one item.
+    return {
+        "action": "wbsearchentities",
+        "search": label,
+        "site": "enwiki",
+        "language": wikimedia_language_codes.get(language, default_search_language),
+        "type": "item",
+        "limit": 1,
+        "format": "json",
+    }
+
+
+def parse_search_results(search_results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Returns the interesting part of every search result"""
+    if search_results["success"] != 1:
+        raise SearchError("Wikibase API wbsearchentities failed")
+    results = []
+    for i in search_results["search"]:
+        results.append(
+            {
+                "id": i["id"],
+                "label": i["label"],
+                "match": i["match"],
+                "description": i["description"] if "description" in i else None,
+                "aliases": i["aliases"] if "aliases" in i else None,
+            }
+        )
+    return results
+
+
+def subjects_from_articles(articles: pd.DataFrame) -> pd.DataFrame:
+    """Returns one row per subject of the articles in the pickle.
+
+    The subjects are SwepubSubject objects or with flat_export=True dictionaries"""
+    rows = []
+    for subjects in articles["subjects"].dropna():
+        for subject in subjects:
+            if isinstance(subject, dict):
+                rows.append(subject)
+            else:
+                rows.append(
+                    dict(
+                        label=subject.label,
+                        language_code=(
+                            subject.language_code.code
+                            if subject.language_code is not None
+                            else None
+                        ),
+                        uka_scheme=subject.uka_scheme,
+                    )
+                )
+    return pd.DataFrame(rows, columns=["label", "language_code", "uka_scheme"])
+
+
+def distinct_topics(subjects: pd.DataFrame) -> List[Topic]:
+    """Returns the distinct (label, language) pairs of the non-UKÄ subjects
+
+    subjects is the subjects table of the parquet output"""
+    # We don't match UKÄ labels because we have a property proposal
+    # underway and manual import/matching
+    topics = subjects.loc[
+        subjects["label"].notna() & ~subjects["uka_scheme"].astype(bool),
+        ["label", "language_code"],
+    ]
+    topics = topics.fillna({"language_code": "und"}).drop_duplicates()
+    return list(topics.itertuples(index=False, name=None))
+
+
+class TokenBucket:
+    """Allows rate requests per second on average and bursts of up to capacity"""
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TopicMatcher(BaseModel):
+    """Searches Wikidata for the distinct topics of the whole dump
+    before or after parsing instead of once per subject during parsing.
+
+    The searches run concurrently on an asyncio event loop with at most
+    concurrency requests in flight, a token bucket rate limit and retries
+    with exponential backoff. The results are stored in the SQLite cache
+    where SwepubSubject finds them when config.lookup_topics_in_wd is True"""
+
+    api_url: str = "https://www.wikidata.org/w/api.php"
+    concurrency: int = 8
+    requests_per_second: float = 5.0
+    burst: int = 10
+    max_retries: int = 5
+    backoff_seconds: float = 1.0
+    timeout_seconds: float = 30
+    # Ask the API to refuse us when the database replicas lag behind
+    maxlag: Optional[int] = 5
+    # Number of results written to the cache in one transaction
+    cache_batch_size: int = 100
+    show_progress_every_x_topic: int = 1000
+
+    def match(self, topics: Iterable[Topic]) -> Dict[Topic, List[Dict[str, Any]]]:
+        """Searches for the topics that are not in the cache yet.
+
+        Returns the results of the topics that were searched now.
+        Topics that failed after all retries are left out of the cache
+        so that the next run tries them again"""
+        if self.concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        cached = searched_topics()
+        # dict.fromkeys deduplicates and keeps the order
+        pending = [topic for topic in dict.fromkeys(topics) if topic not in cached]
+        print(
+            f"searching for {len(pending)} topics, "
+            f"{len(cached)} are already in the cache",
+            flush=True,
+        )
+        return asyncio.run(self.__search_all__(pending))
+
+    async def __search_all__(
+        self, topics: List[Topic]
+    ) -> Dict[Topic, List[Dict[str, Any]]]:
+        start = time.time()
+        bucket = TokenBucket(rate=self.requests_per_second, capacity=self.burst)
+        found: Dict[Topic, List[Dict[str, Any]]] = {}
+        unsaved: List[Tuple[str, str, List[Dict[str, Any]]]] = []
+        failed = 0
+        # The workers share one iterator so every topic is searched once
+        remaining: Iterator[Topic] = iter(topics)
+        with requests.Session() as session, ThreadPoolExecutor(
+            max_workers=self.concurrency
+        ) as executor:
+            session.headers["User-Agent"] = config.user_agent
+
+            async def worker():
+                nonlocal failed
+                for topic in remaining:
+                    results = await self.__search__(
+                        topic=topic, session=session, executor=executor, bucket=bucket
+                    )
+                    if results is None:
+                        failed += 1
+                        continue
+                    found[topic] = results
+                    unsaved.append((topic[0], topic[1], results))
+                    if len(unsaved) >= self.cache_batch_size:
+                        add_many_search_results(unsaved)
+                        unsaved.clear()
+                    if len(found) % self.show_progress_every_x_topic == 0:
+                        print(
+                            f"count:{len(found)} of {len(topics)} "
+                            f"duration:{round(time.time() - start)}s failed:{failed}",
+                            flush=True,
+                        )
+
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+            finally:
+                # Keep what we got even if we were interrupted
+                add_many_search_results(unsaved)
+        print(
+            f"searched {len(found)} topics in {round(time.time() - start)}s, "
+            f"{failed} failed",
+            flush=True,
+        )
+        return found
+
+    async def __search__(
+        self,
+        topic: Topic,
+        session: requests.Session,
+        executor: ThreadPoolExecutor,
+        bucket: TokenBucket,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Returns the results or None if the search failed"""
+        label, language = topic
+        parameters = search_parameters(label=label, language=language)
+        if self.maxlag is not None:
+            parameters["maxlag"] = self.maxlag
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff_seconds * 2**attempt
+            await bucket.acquire()
+            try:
+                # requests blocks so it runs in the thread pool
+                response = await loop.run_in_executor(
+                    executor,
+                    partial(
+                        session.get,
+                        self.api_url,
+                        params=parameters,
+                        timeout=self.timeout_seconds,
+                    ),
+                )
+            except requests.RequestException as e:
+                logger.warning(f"Searching for '{label}' failed with {e}")
+            else:
+                retry_after = response.headers.get("Retry-After")
+                if retry_after is not None and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                if response.status_code in retry_statuses:
+                    logger.warning(
+                        f"Got status {response.status_code} when searching for '{label}'"
+                    )
+                elif response.status_code != 200:
+                    logger.error(
+                        f"Got status {response.status_code} when searching for '{label}'"
+                    )
+                    return None
+                else:
+                    try:
+                        data = response.json()
+                    except ValueError:
+                        # E.g. an HTML error page of a proxy, worth another try
+                        logger.warning(
+                            f"Got a body that is not JSON when searching for '{label}'"
+                        )
+                    else:
+                        error = data.get("error") if isinstance(data, dict) else None
+                        if error is None:
+                            try:
+                                return parse_search_results(data)
+                            except (SearchError, KeyError, TypeError) as e:
+                                logger.error(
+                                    f"Got malformed results for '{label}': {e!r}"
+                                )
+                                return None
+                        if error.get("code") not in retry_error_codes:
+                            logger.error(f"Searching for '{label}' failed with {error}")
+                            return None
+                        logger.warning(
+                            f"Got {error.get('code')} when searching for '{label}'"
+                        )
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
+        logger.error(
+            f"Gave up searching for '{label}' after {self.max_retries} retries"
+        )
+        return None
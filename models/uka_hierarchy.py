@@ -0,0 +1,157 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd  # type: ignore
+from pandas import DataFrame  # type: ignore
+from pydantic import BaseModel
+
+from models.swedish_higher_education_authority import UKACodeLevel
+from models.swepub.subjects_table import SwepubSubjectsTable, no_uka_code
+
+# UKÄ 2016 codes nest by their digits: 10201 (level 5) is under
+# 102 (level 3) which is under 1 (level 1). Every step up removes two digits
+# so parents are found with integer division instead of string slicing.
+
+
+def uka_code_levels(codes: np.ndarray) -> np.ndarray:
+    """Returns the level of every code as int8, 0 for no code"""
+    codes = np.asarray(codes)
+    levels = np.zeros(len(codes), dtype=np.int8)
+    levels[(codes > 0) & (codes < 10)] = 1
+    levels[(codes >= 100) & (codes < 1000)] = 3
+    levels[(codes >= 10000) & (codes < 100000)] = 5
+    return levels
+
+
+def uka_codes_at_level(codes: np.ndarray, level: UKACodeLevel) -> np.ndarray:
+    """Returns the ancestor of every code at the level
+
+    Codes at the level are returned as they are. Codes above the level
+    and missing codes give 0."""
+    codes = np.asarray(codes).astype(np.int32, copy=False)
+    levels = uka_code_levels(codes)
+    # Two digits less for every level we go up
+    divisors = 10 ** np.clip(levels.astype(np.int32) - level.value, 0, None)
+    return np.where(levels >= level.value, codes // divisors, no_uka_code).astype(
+        np.int32
+    )
+
+
+class UKAHierarchy(BaseModel):
+    """The UKÄ 2016 codes seen in the dump with their parents and labels,
+    and rollups of the number of articles per code
+
+    The rollups count distinct articles so an article with two level 5
+    codes under the same level 3 code counts once for that level 3 code.
+    Results are cached on the object because dashboards ask the same
+    questions again and again"""
+
+    subjects: SwepubSubjectsTable
+    # Needs the article id and an organization column, like the
+    # affiliations table of the parquet output
+    affiliations: Optional[DataFrame] = None
+    codes: Optional[DataFrame] = None
+    results: Dict[Any, Any] = {}
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def __uka_rows__(self) -> DataFrame:
+        df = self.subjects.dataframe
+        return df[df["uka_code"].to_numpy() != no_uka_code]
+
+    def __articles_and_codes__(self, level: UKACodeLevel) -> DataFrame:
+        """Returns the distinct (article number, code at the level) pairs.
+        The article numbers are the codes of the categorical id column"""
+        key = ("articles_and_codes", level)
+        if key not in self.results:
+            df = self.subjects.dataframe
+            codes = uka_codes_at_level(df["uka_code"].to_numpy(), level)
+            articles = df["id"].cat.codes.to_numpy().astype(np.int64)
+            keep = codes != no_uka_code
+            # One key per article and code so that every article counts once
+            pairs = pd.unique(articles[keep] * 100000 + codes[keep])
+            self.results[key] = pd.DataFrame(
+                dict(article=pairs // 100000, code=(pairs % 100000).astype(np.int32))
+            )
+        return self.results[key]
+
+    def build(self) -> DataFrame:
+        """Returns one row per code with its level, parents and most
+        common English and Swedish labels"""
+        if self.codes is None:
+            rows = self.__uka_rows__()
+            codes = np.unique(rows["uka_code"].to_numpy())
+            hierarchy = pd.DataFrame(
+                dict(
+                    code=codes,
+                    level=uka_code_levels(codes),
+                    level_1_code=uka_codes_at_level(codes, UKACodeLevel.ONE),
+                    level_3_code=uka_codes_at_level(codes, UKACodeLevel.THREE),
+                )
+            )
+            labels = (
+                rows[["uka_code", "language_code", "uka_label"]]
+                .dropna()
+                .value_counts(sort=True)
+                .reset_index()
+                .drop_duplicates(["uka_code", "language_code"])
+            )
+            for language, column in (("eng", "label"), ("swe", "swedish_label")):
+                language_labels = labels[labels["language_code"] == language]
+                hierarchy[column] = hierarchy["code"].map(
+                    pd.Series(
+                        language_labels["uka_label"].astype(str).to_numpy(),
+                        index=language_labels["uka_code"].to_numpy(),
+                    )
+                )
+            self.codes = hierarchy
+        return self.codes
+
+    def article_counts(self, level: UKACodeLevel) -> pd.Series:
+        """Returns the number of articles per code at the level"""
+        key = ("article_counts", level)
+        if key not in self.results:
+            counts = np.bincount(self.__articles_and_codes__(level)["code"].to_numpy())
+            found = np.flatnonzero(counts)
+            self.results[key] = pd.Series(
+                counts[found], index=pd.Index(found, name="code"), name="articles"
+            )
+        return self.results[key]
+
+    def article_counts_per_organization(
+        self, level: UKACodeLevel, organization_column: str = "name"
+    ) -> DataFrame:
+        """Returns the number of articles per organization and code at the level"""
+        if self.affiliations is None:
+            raise ValueError("affiliations was None")
+        key = ("article_counts_per_organization", level, organization_column)
+        if key not in self.results:
+            organizations = self.affiliations[["id", organization_column]].dropna()
+            # Number the articles like the subjects table does
+            # so that the join is on integers
+            organizations = pd.DataFrame(
+                {
+                    "article": pd.Categorical(
+                        organizations["id"],
+                        categories=self.subjects.dataframe["id"].cat.categories,
+                    ).codes,
+                    organization_column: organizations[organization_column].to_numpy(),
+                }
+            )
+            organizations = organizations[
+                organizations["article"] >= 0
+            ].drop_duplicates()
+            self.results[key] = (
+                self.__articles_and_codes__(level)
+                .merge(organizations, on="article")
+                .groupby([organization_column, "code"])
+                .size()
+                .rename("articles")
+                .reset_index()
+                .sort_values("articles", ascending=False, ignore_index=True)
+            )
+        return self.results[key]
+
+    def clear_cache(self):
+        self.results = {}
@@ -0,0 +1,73 @@
+import logging
+from pathlib import Path
+
+import click
+from wikibaseintegrator.wbi_helpers import execute_sparql_query  # type: ignore
+
+import config
+from models.language_registry import default_table_path, language_registry
+from models.language_resolver import batches
+
+logging.basicConfig(level=config.loglevel)
+logger = logging.getLogger(__name__)
+
+# The items of the ISO 639-2 codes in VALUES and their English label
+query = """
+SELECT ?code ?item ?label
+WHERE
+{{
+  VALUES ?code {{ {values} }}
+  ?item wdt:P219 ?code.
+  OPTIONAL {{ ?item rdfs:label ?label. FILTER(LANG(?label) = "en") }}
+}}
+"""
+
+
+@click.command()
+@click.option(
+    "--endpoint",
+    default="https://query.wikidata.org/sparql",
+    show_default=True,
+    help="SPARQL endpoint, e.g. a local stand-in for WDQS",
+)
+@click.option(
+    "--table",
+    default=str(default_table_path),
+    show_default=True,
+    help="Language table to update",
+)
+@click.option("--codes-per-query", default=200, show_default=True)
+def main(endpoint: str, table: str, codes_per_query: int):
+    """Refresh the offline ISO 639-2 language table from Wikidata
+
+    The codes of the table are sent in VALUES batches.
+    Codes that Wikidata does not know about keep their current entry
+    and so does the label of a code whose item has no English label"""
+    language_registry.table_path = Path(table)
+    entries = {}
+    for batch in batches(language_registry.codes(), codes_per_query):
+        values = " ".join(f'"{code}"' for code in batch)
+        result = execute_sparql_query(
+            query.format(values=values),
+            endpoint=endpoint,
+            user_agent=config.user_agent,
+        )
+        for binding in result["results"]["bindings"]:
+            code = binding["code"]["value"]
+            qid = binding["item"]["value"].replace(config.wd_prefix, "")
+            label = binding["label"]["value"] if "label" in binding else None
+            # Some codes are on more than one item. We keep the lowest QID
+            # so that the table does not change between refreshes.
+            if code in entries and int(entries[code][0][1:]) < int(qid[1:]):
+                continue
+            entries[code] = (qid, label)
+    language_registry.update(
+        (code, qid, label if label is not None else language_registry.get(code)[1])
+        for code, (qid, label) in entries.items()
+    )
+    language_registry.save()
+    print(f"Refreshed {len(entries)} languages in {language_registry.table_path}")
+
+
+if __name__ == "__main__":
+    main()
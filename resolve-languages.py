@@ -0,0 +1,63 @@
+import logging
+from typing import Set
+
+import click
+
+import config
+from helpers.json_decoding import DecodeError
+from models.input_readers import input_reader_for, read_chunks
+from models.language_registry import language_registry
+from models.language_resolver import LanguageResolver, language_codes_in_record
+from models.swepub.schema import decode_record
+
+logging.basicConfig(level=config.loglevel)
+logger = logging.getLogger(__name__)
+
+
+def language_codes_in_zipfile(zipfile_path: str) -> Set[str]:
+    """Returns the language codes of the dump in any of the input formats"""
+    codes: Set[str] = set()
+    for chunk in read_chunks(input_reader_for(zipfile_path)):
+        for line in chunk.lines:
+            try:
+                codes.update(language_codes_in_record(decode_record(line)))
+            except DecodeError:
+                logger.error(f"Could not decode a line in {chunk.member}")
+    return codes
+
+
+@click.command()
+@click.argument("zipfile_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--endpoint",
+    default="https://query.wikidata.org/sparql",
+    show_default=True,
+    help="SPARQL endpoint, e.g. a local stand-in for WDQS",
+)
+@click.option(
+    "--api-url",
+    default="https://www.wikidata.org/w/api.php",
+    show_default=True,
+    help="MediaWiki API, e.g. a local stand-in",
+)
+@click.option(
+    "--all", "resolve_all", is_flag=True, help="Also resolve codes that have a QID"
+)
+def main(zipfile_path: str, endpoint: str, api_url: str, resolve_all: bool):
+    """Resolve every language code in the dump before extracting it
+
+    The codes are looked up with a few batched requests and saved to the
+    offline language table, so the extraction does not ask Wikidata per code"""
+    codes = language_codes_in_zipfile(zipfile_path)
+    print(f"found {len(codes)} distinct language codes")
+    resolver = LanguageResolver(sparql_endpoint=endpoint, api_url=api_url)
+    if resolve_all:
+        resolved = resolver.resolve(codes)
+    else:
+        resolved = resolver.resolve_missing(codes)
+    language_registry.save()
+    print(f"resolved {len(resolved)} codes in {language_registry.table_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import logging
+from typing import Optional
+
+import click
+
+import config
+from helpers.caching import add_to_cache, read_review_queue, remove_from_review_queue
+from helpers.util import yes_no_question
+
+logging.basicConfig(level=config.loglevel)
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option("--limit", type=int, default=None, help="Review at most this many")
+@click.option("--list", "list_only", is_flag=True, help="Only list the queue")
+def main(limit: Optional[int], list_only: bool):
+    """Review the subject matches that were queued during extraction
+
+    Every distinct (label, QID) pair is asked about once, the most frequent
+    first. The decisions are stored in the cache and used by the next extraction"""
+    queue = read_review_queue(limit=limit)
+    print(f"{len(queue)} matches to review")
+    for number, (label, qid, candidate_label, description, occurrences) in enumerate(
+        queue, start=1
+    ):
+        print(
+            f"{number}/{len(queue)} '{label}' ({occurrences} occurrences) -> "
+            f"'{candidate_label}' with the description: '{description}' "
+            f"(see https://www.wikidata.org/wiki/{qid})"
+        )
+        if list_only:
+            continue
+        result = yes_no_question("Accept match?")
+        add_to_cache(label=label, qid=qid, result=result)
+        remove_from_review_queue(label=label, qid=qid)
+        logger.info(f"Match {'accepted' if result else 'rejected'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 import logging
+from typing import Optional
+
+import click
 
 import config
 from models.extractor import Extractor
-import sys
+from models.profiling import ExtractionProfiler
 
 logging.basicConfig(level=config.loglevel)
 
@@ -12,13 +15,51 @@ def extract_to_dataframes(zipfile_path):
     extractor.extract()
 
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python script_name.py <zipfile_path>")
-        sys.exit(1)
+@click.command()
+@click.argument("zipfile_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Profile the extraction and write a report to profile/ next to the output",
+)
+@click.option(
+    "--profiler",
+    type=click.Choice(["cprofile", "pyinstrument"]),
+    default="cprofile",
+    show_default=True,
+    help="pyinstrument samples with less overhead but has to be installed",
+)
+@click.option(
+    "--snapshot-every",
+    type=float,
+    default=60,
+    show_default=True,
+    help="Seconds between the tracemalloc snapshots, 0 disables them",
+)
+@click.option(
+    "--slowest",
+    default=20,
+    show_default=True,
+    help="Number of the slowest records to report",
+)
+def main(
+    zipfile_path: str,
+    profile: bool,
+    profiler: str,
+    snapshot_every: Optional[float],
+    slowest: int,
+):
+    """Extract the SwePub dump at ZIPFILE_PATH
 
-    zipfile_path = sys.argv[1]
-    extract_to_dataframes(zipfile_path)
+    The input can also be a .jsonl.gz, .jsonl.zst or .jsonl file"""
+    if not profile:
+        extract_to_dataframes(zipfile_path)
+        return
+    ExtractionProfiler(
+        profiler=profiler,
+        snapshot_every_x_seconds=snapshot_every if snapshot_every else None,
+        number_of_slowest_records=slowest,
+    ).profile(Extractor(swepub_deduplicated_zipfile_path=zipfile_path))
 
 
 if __name__ == "__main__":